@@ -0,0 +1,353 @@
+# API HTTP (JSON) sobre as queries de queries/, para integrações (laboratórios, site)
+#
+# Servidor assíncrono (FastAPI + uvicorn) com um pool de conexões do psycopg 3; as queries são as
+# mesmas constantes usadas pelo app e pelo console. Listas são paginadas por chave (?depois_de=&limite=),
+# e /<recurso>/exportar transmite a tabela inteira em NDJSON a partir de um cursor no servidor. As leituras
+# respondem com ETag derivado das versões das tabelas (manutencao.versoes_tabelas) e aceitam If-None-Match.
+#
+#   python api.py --porta 8000 --workers 4
+#   python -m ferramentas.carga_api --url http://localhost:8000 --conexoes 64 --segundos 30
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Literal, Optional
+
+import psycopg
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from pydantic import BaseModel, Field
+
+from db_config import DB_SETTINGS
+from queries import cadastros_queries, clinico_queries, financeiro_queries, manutencao_queries, vendas_queries
+
+# Tamanho do pool por processo (cada worker do uvicorn tem o seu)
+POOL_MIN = int(os.environ.get('API_POOL_MIN', 4))
+POOL_MAX = int(os.environ.get('API_POOL_MAX', 20))
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+LINHAS_POR_BLOCO_EXPORTACAO = 1000
+# Intervalo (s) entre as consolidações das versões das tabelas lidas pelos ETags
+INTERVALO_COMPACTACAO = int(os.environ.get('API_INTERVALO_COMPACTACAO', 60))
+
+# Listas completas transmitidas por /<recurso>/exportar
+EXPORTACOES = {
+    'pacientes': cadastros_queries.LISTAR_TODOS_PACIENTES,
+    'medicos': cadastros_queries.LISTAR_TODOS_MEDICOS,
+    'consultas': clinico_queries.LISTAR_TODAS_CONSULTAS,
+    'pagamentos': financeiro_queries.LISTAR_TODOS_PAGAMENTOS,
+    'produtos': vendas_queries.LISTAR_TODOS_PRODUTOS,
+}
+
+# Formas de pagamento da loja que já entram como pagas (mesma regra da página de vendas do app)
+PAGAMENTO_IMEDIATO = ('Dinheiro', 'Cartão', 'PIX')
+
+pool = AsyncConnectionPool(make_conninfo(**DB_SETTINGS), min_size=POOL_MIN, max_size=POOL_MAX,
+                           kwargs={'row_factory': dict_row}, open=False)
+
+
+async def compactar_versoes_periodicamente():
+    """
+    Consolida manutencao.alteracoes_tabelas a cada INTERVALO_COMPACTACAO segundos, para que a contagem
+    feita em cada conferência de versões continue pequena. Vários workers podem rodá-la ao mesmo tempo.
+    """
+    while True:
+        try:
+            await escrever(manutencao_queries.COMPACTAR_VERSOES)
+        except psycopg.Error as e:
+            print(f"Erro ao compactar as versões das tabelas: {e}")
+        await asyncio.sleep(INTERVALO_COMPACTACAO)
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    await pool.open()
+    compactacao = asyncio.create_task(compactar_versoes_periodicamente())
+    yield
+    compactacao.cancel()
+    await pool.close()
+
+app = FastAPI(title="API da Clínica", lifespan=ciclo_de_vida)
+
+
+# --- Modelos de entrada ---
+
+class PacienteNovo(BaseModel):
+    nome: str = Field(min_length=1, max_length=200)
+    sexo: Optional[Literal['M', 'F', 'O']] = None
+    email: Optional[str] = None
+    cpf: Optional[str] = Field(None, pattern=r'^\d{11}$')
+    telefone: Optional[str] = None
+    logradouro: Optional[str] = None
+    numero: Optional[str] = None
+    complemento: Optional[str] = None
+    bairro: Optional[str] = None
+    cidade: Optional[str] = None
+    sigla_estado: Optional[str] = Field(None, min_length=2, max_length=2)
+    cep: Optional[str] = None
+    torce_flamengo: bool = False
+    assiste_one_piece: bool = False
+    nasceu_sousa: bool = False
+
+class NovoTelefone(BaseModel):
+    telefone: str = Field(min_length=1)
+
+class NovoSalario(BaseModel):
+    salario: Decimal = Field(ge=0)
+
+class ConsultaNova(BaseModel):
+    paciente_id: int
+    medico_id: int
+    data: datetime
+    duracao_minutos: int = Field(30, ge=5, le=480)
+    motivo: Optional[str] = None
+
+class AlteracaoConsulta(BaseModel):
+    status: Literal['Agendada', 'Realizada', 'Cancelada']
+    diagnostico: Optional[str] = None
+
+class PagamentoNovo(BaseModel):
+    consulta_id: int
+    valor: Decimal = Field(gt=0)
+    metodo: Literal['Dinheiro', 'Cartão', 'Transferência', 'Seguro']
+    pago: bool = False
+    data_pagamento: Optional[datetime] = None
+
+class ItemVenda(BaseModel):
+    produto_id: int
+    quantidade: int = Field(gt=0)
+
+class VendaNova(BaseModel):
+    cliente_id: int
+    vendedor_id: int
+    forma_pagamento: Literal['Dinheiro', 'Cartão', 'Boleto', 'PIX', 'Berries']
+    itens: list[ItemVenda] = Field(min_length=1)
+
+
+# --- Acesso ao banco ---
+
+async def buscar(query, params=()):
+    async with pool.connection() as conn:
+        cur = await conn.execute(query, params)
+        return await cur.fetchall()
+
+async def buscar_um(query, params=(), recurso="Registro"):
+    linhas = await buscar(query, params)
+    if not linhas:
+        raise HTTPException(404, f"{recurso} não encontrado(a).")
+    return linhas[0]
+
+async def escrever(query, params=()):
+    """Executa uma escrita em sua própria transação; retorna (linhas afetadas, primeira linha retornada)."""
+    async with pool.connection() as conn:
+        cur = await conn.execute(query, params)
+        return cur.rowcount, (await cur.fetchone() if cur.description else None)
+
+def pagina(itens, limite, chave='id'):
+    """Resposta de lista paginada por chave: 'proximo' é o valor de depois_de para a próxima página."""
+    return {'itens': itens, 'proximo': itens[-1][chave] if len(itens) == limite else None}
+
+def versionada(*tabelas):
+    """
+    Dependência das rotas de leitura: lê as versões das tabelas antes da query e devolve um ETag fraco
+    que muda a cada alteração nelas. Se o cliente enviar If-None-Match com o mesmo ETag, responde 304
+    sem executar a query nem serializar a resposta.
+    """
+    async def conferir(request: Request, response: Response):
+        linhas = await buscar(manutencao_queries.VERSOES_TABELAS, (list(tabelas),))
+        if len(linhas) != len(tabelas):
+            return  # tabela não versionada: responde sem ETag
+        versoes = ",".join(f"{linha['tabela']}={linha['versao']}" for linha in sorted(linhas, key=lambda l: l['tabela']))
+        resumo = hashlib.sha1(f"{request.url.path}?{request.url.query}|{versoes}".encode()).hexdigest()[:24]
+        etag = f'W/"{resumo}"'
+        cabecalhos = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        recebidos = request.headers.get('if-none-match', '')
+        if any(valor.strip().removeprefix('W/') == etag.removeprefix('W/') for valor in recebidos.split(',')):
+            raise HTTPException(304, headers=cabecalhos)
+        response.headers.update(cabecalhos)
+    return Depends(conferir)
+
+@app.exception_handler(psycopg.Error)
+async def erro_banco(request: Request, erro: psycopg.Error):
+    sqlstate = erro.sqlstate or ''
+    if sqlstate.startswith('23'):    # violação de integridade (duplicado, chave estrangeira, conflito de agenda)
+        status = 409
+    elif sqlstate.startswith('22') or sqlstate == 'P0001':  # dado inválido ou RAISE das funções (ex: estoque)
+        status = 422
+    else:
+        status = 503 if isinstance(erro, psycopg.OperationalError) else 500
+    detalhe = erro.diag.message_primary if status < 500 and erro.diag.message_primary else "Erro no banco de dados."
+    return JSONResponse({'detail': detalhe}, status_code=status)
+
+
+# --- Rotas ---
+
+@app.get("/saude")
+async def saude():
+    await buscar("SELECT 1;")
+    return {'status': 'ok', 'pool': pool.get_stats()}
+
+# Registrada antes das rotas /<recurso>/{id}, que também casariam com /<recurso>/exportar
+@app.get("/{recurso}/exportar")
+async def exportar(recurso: Literal['pacientes', 'medicos', 'consultas', 'pagamentos', 'produtos']):
+    """Transmite a lista completa em NDJSON (um objeto por linha), sem carregá-la na memória."""
+    async def linhas():
+        async with pool.connection() as conn:
+            async with conn.cursor(name=f"exportar_{recurso}") as cur:
+                await cur.execute(EXPORTACOES[recurso])
+                while bloco := await cur.fetchmany(LINHAS_POR_BLOCO_EXPORTACAO):
+                    yield "".join(json.dumps(linha, ensure_ascii=False, default=str) + "\n" for linha in bloco)
+    return StreamingResponse(linhas(), media_type="application/x-ndjson")
+
+@app.get("/pacientes", dependencies=[versionada('cadastros.pacientes')])
+async def listar_pacientes(depois_de: int = 0, limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO)):
+    return pagina(await buscar(cadastros_queries.LISTAR_PACIENTES_PAGINA, (depois_de, limite)), limite)
+
+@app.get("/pacientes/busca", dependencies=[versionada('cadastros.pacientes')])
+async def pesquisar_pacientes(nome: str = Query(min_length=2)):
+    return await buscar(cadastros_queries.PESQUISAR_PACIENTE_POR_NOME, (f"%{nome}%",))
+
+@app.get("/pacientes/{paciente_id}", dependencies=[versionada('cadastros.pacientes')])
+async def exibir_paciente(paciente_id: int):
+    return await buscar_um(cadastros_queries.SELECIONAR_PACIENTE_POR_ID, (paciente_id,), "Paciente")
+
+@app.post("/pacientes", status_code=201)
+async def inserir_paciente(paciente: PacienteNovo):
+    _, linha = await escrever(cadastros_queries.INSERIR_PACIENTE, tuple(paciente.model_dump().values()))
+    return {'id': linha['id']}
+
+@app.patch("/pacientes/{paciente_id}/telefone")
+async def alterar_telefone_paciente(paciente_id: int, dados: NovoTelefone):
+    alteradas, _ = await escrever(cadastros_queries.ATUALIZAR_TELEFONE_PACIENTE, (dados.telefone, paciente_id))
+    if not alteradas:
+        raise HTTPException(404, "Paciente não encontrado(a).")
+    return {'id': paciente_id}
+
+@app.get("/medicos", dependencies=[versionada('cadastros.medicos')])
+async def listar_medicos(depois_de: int = 0, limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO)):
+    return pagina(await buscar(cadastros_queries.LISTAR_MEDICOS_PAGINA, (depois_de, limite)), limite)
+
+@app.get("/medicos/crm/{crm}", dependencies=[versionada('cadastros.medicos')])
+async def exibir_medico_por_crm(crm: str):
+    return await buscar_um(cadastros_queries.SELECIONAR_MEDICO_POR_CRM, (crm,), "Médico")
+
+@app.patch("/medicos/{medico_id}/salario")
+async def alterar_salario_medico(medico_id: int, dados: NovoSalario):
+    alteradas, _ = await escrever(cadastros_queries.ATUALIZAR_SALARIO_MEDICO, (dados.salario, medico_id))
+    if not alteradas:
+        raise HTTPException(404, "Médico não encontrado(a).")
+    return {'id': medico_id}
+
+@app.get("/consultas", dependencies=[
+    versionada('clinico.consultas', 'cadastros.pacientes', 'cadastros.medicos', 'cadastros.especialidades')])
+async def listar_consultas(
+    inicio: date,
+    fim: date,
+    status: Optional[Literal['Agendada', 'Realizada', 'Cancelada']] = None,
+    medico_id: Optional[int] = None,
+    especialidade_id: Optional[int] = None,
+    antes_data: Optional[datetime] = None,
+    antes_id: Optional[int] = None,
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+):
+    """Consultas da mais recente para a mais antiga; a próxima página usa antes_data/antes_id de 'proximo'."""
+    if (antes_data is None) != (antes_id is None):
+        raise HTTPException(422, "Informe antes_data e antes_id juntos.")
+    linhas = await buscar(clinico_queries.DETALHES_CONSULTAS,
+                          (inicio, fim, status, medico_id, especialidade_id, antes_data, antes_id, limite + 1))
+    itens = linhas[:limite]
+    proximo = {'antes_data': itens[-1]['data'], 'antes_id': itens[-1]['consulta_id']} if len(linhas) > limite else None
+    return {'itens': itens, 'proximo': proximo}
+
+@app.get("/consultas/{consulta_id}", dependencies=[versionada('clinico.consultas')])
+async def exibir_consulta(consulta_id: int):
+    consulta = await buscar_um(clinico_queries.SELECIONAR_CONSULTA_POR_ID, (consulta_id,), "Consulta")
+    consulta.pop('busca', None)  # tsvector interno da busca textual
+    return consulta
+
+@app.post("/consultas", status_code=201)
+async def agendar_consulta(consulta: ConsultaNova):
+    _, linha = await escrever(clinico_queries.INSERIR_CONSULTA, (
+        consulta.paciente_id, consulta.medico_id, consulta.data, consulta.duracao_minutos, consulta.motivo, 'Agendada'))
+    return {'id': linha['id']}
+
+@app.patch("/consultas/{consulta_id}")
+async def alterar_consulta(consulta_id: int, dados: AlteracaoConsulta):
+    alteradas, _ = await escrever(clinico_queries.ATUALIZAR_CONSULTA, (dados.status, dados.diagnostico, consulta_id))
+    if not alteradas:
+        raise HTTPException(404, "Consulta não encontrado(a).")
+    return {'id': consulta_id}
+
+@app.get("/pagamentos", dependencies=[versionada('financeiro.pagamentos')])
+async def listar_pagamentos(depois_de: int = 0, limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO)):
+    return pagina(await buscar(financeiro_queries.LISTAR_PAGAMENTOS_PAGINA, (depois_de, limite)), limite)
+
+@app.get("/pagamentos/{pagamento_id}", dependencies=[versionada('financeiro.pagamentos')])
+async def exibir_pagamento(pagamento_id: int):
+    return await buscar_um(financeiro_queries.SELECIONAR_PAGAMENTO_POR_ID, (pagamento_id,), "Pagamento")
+
+@app.post("/pagamentos", status_code=201)
+async def lancar_pagamento(pagamento: PagamentoNovo):
+    data_pagamento = pagamento.data_pagamento or (datetime.now() if pagamento.pago else None)
+    _, linha = await escrever(financeiro_queries.INSERIR_PAGAMENTO, (
+        pagamento.consulta_id, pagamento.valor, pagamento.metodo, pagamento.pago, data_pagamento))
+    return {'id': linha['id']}
+
+@app.post("/pagamentos/{pagamento_id}/quitar")
+async def quitar_pagamento(pagamento_id: int):
+    alteradas, _ = await escrever(financeiro_queries.ATUALIZAR_STATUS_PAGAMENTO, (pagamento_id,))
+    if not alteradas:
+        raise HTTPException(404, "Pagamento não encontrado(a).")
+    return {'id': pagamento_id}
+
+@app.get("/produtos", dependencies=[versionada('vendas.catalogo_produtos')])
+async def listar_produtos(depois_de: int = 0, limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO)):
+    return pagina(await buscar(vendas_queries.LISTAR_PRODUTOS_PAGINA, (depois_de, limite)), limite)
+
+@app.get("/produtos/busca", dependencies=[versionada('vendas.catalogo_produtos')])
+async def pesquisar_produtos(nome: str = Query(min_length=2)):
+    return await buscar(vendas_queries.BUSCAR_PRODUTOS_POR_NOME, (f"%{nome}%",))
+
+@app.get("/produtos/{produto_id}", dependencies=[versionada('vendas.produtos')])
+async def exibir_produto(produto_id: int):
+    return await buscar_um(vendas_queries.SELECIONAR_PRODUTO_POR_ID, (produto_id,), "Produto")
+
+@app.post("/vendas", status_code=201)
+async def efetivar_venda(venda: VendaNova):
+    """
+    Registra a venda pela vendas.efetivar_compra (estoque, desconto e pagamento em uma transação).
+    O preço de cada item é sempre o atual do catálogo, nunca um valor enviado pelo cliente.
+    """
+    ids = sorted({item.produto_id for item in venda.itens})
+    precos = {linha['produto_id']: linha['preco'] for linha in await buscar(vendas_queries.PRECOS_PRODUTOS_ATIVOS, (ids,))}
+    faltando = [produto_id for produto_id in ids if produto_id not in precos]
+    if faltando:
+        raise HTTPException(422, f"Produto(s) inexistente(s) ou inativo(s): {faltando}")
+
+    itens = [{'produto_id': item.produto_id, 'quantidade': item.quantidade, 'preco_unitario': float(precos[item.produto_id])}
+             for item in venda.itens]
+    status_pagamento = "Confirmado" if venda.forma_pagamento in PAGAMENTO_IMEDIATO else "Pendente"
+    _, linha = await escrever(vendas_queries.CHAMAR_EFETIVAR_COMPRA, (
+        venda.cliente_id, venda.vendedor_id, venda.forma_pagamento, json.dumps(itens), status_pagamento))
+    return {'venda_id': next(iter(linha.values()))}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API HTTP da clínica.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processos do servidor, cada um com seu pool (padrão: um por CPU).")
+    args = parser.parse_args()
+    uvicorn.run("api:app", host=args.host, port=args.porta, workers=args.workers, log_level="warning", access_log=False)
@@ -1,9 +1,16 @@
 import streamlit as st
 import pandas as pd
-from db_manager import DatabaseManager
-from queries import cadastros_queries, clinico_queries, financeiro_queries, vendas_queries
-from datetime import datetime
+from db_manager import DatabaseManager, InvalidacaoTabela, LEITURAS_ENTIDADES
+from ouvinte_db import OuvinteNotificacoes, MonitorEstoqueBaixo, InvalidadorCache, CachePorPaciente
+from conciliacao import conciliar_arquivo
+from queries import cadastros_queries, clinico_queries, financeiro_queries, vendas_queries, manutencao_queries
+from datetime import datetime, timedelta
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
 import json
+import re
+import threading
+from collections import OrderedDict
 import altair as alt
 
 st.set_page_config(page_title="Gestão da Clínica", layout="wide")
@@ -23,10 +30,58 @@ def get_db_manager():
     """
     db = DatabaseManager()
     db.connect()
+    if db.conn:
+        # Garante as partições mensais dos próximos meses (vendas e consultas)
+        db.execute_query(manutencao_queries.GARANTIR_PARTICOES)
     return db
 
 db_manager = get_db_manager()
 
+# Intervalo (s) entre as consolidações das versões das tabelas
+INTERVALO_COMPACTACAO = 60
+
+def compactar_versoes(conn):
+    with conn.cursor() as cur:
+        cur.execute(manutencao_queries.COMPACTAR_VERSOES)
+
+@st.cache_resource
+def get_ouvinte_db():
+    """
+    Inicia, uma única vez por processo, a thread que escuta as notificações do banco
+    (LISTEN/NOTIFY) e os consumidores que dependem dela.
+    """
+    ouvinte = OuvinteNotificacoes()
+    monitor_estoque = MonitorEstoqueBaixo(ouvinte)
+    invalidador = InvalidadorCache(ouvinte)
+    cache_linha_do_tempo = CachePorPaciente(ouvinte)
+    # Mantém curta a contagem de alterações lida a cada conferência de versões
+    ouvinte.a_cada(INTERVALO_COMPACTACAO, compactar_versoes)
+    # Nomes de médicos, especialidades e produtos aparecem em todas as linhas do tempo
+    invalidador.registrar(cache_linha_do_tempo, ['cadastros.medicos', 'cadastros.especialidades', 'vendas.produtos'])
+    ouvinte.iniciar()
+    return ouvinte, monitor_estoque, invalidador, cache_linha_do_tempo
+
+ouvinte_db, monitor_estoque_baixo, invalidador_cache, cache_linha_do_tempo = get_ouvinte_db()
+
+# Alterações feitas por outros processos também descartam os registros do cache de entidades
+for tabela_entidade in {tabela for tabela, _ in LEITURAS_ENTIDADES.values()}:
+    invalidador_cache.registrar(InvalidacaoTabela(db_manager.cache_entidades, tabela_entidade), [tabela_entidade])
+
+def tabelas_da_query(query):
+    """Retorna as tabelas ('schema.tabela') citadas em uma query."""
+    return set(re.findall(r'\b(?:cadastros|clinico|financeiro|vendas)\.\w+', query))
+
+def cache_invalidado_por(*tabelas, ttl=3600):
+    """
+    Equivalente a @st.cache_data, mas o cache também é limpo, em milissegundos, sempre que
+    alguma das tabelas for alterada por qualquer processo. Por isso o TTL pode ser longo.
+    """
+    def decorador(funcao):
+        funcao_cache = st.cache_data(ttl=ttl)(funcao)
+        invalidador_cache.registrar(funcao_cache, tabelas)
+        return funcao_cache
+    return decorador
+
 def safe_remover(id_remocao, remover_query, check_query, tipo_registo):
     """
     Função para remoção segura, verificando dependências antes de apagar.
@@ -49,8 +104,30 @@ def safe_remover(id_remocao, remover_query, check_query, tipo_registo):
         st.error(f"Falha ao remover o(a) {tipo_registo}.")
         return False
 
-def carregar_dados_para_selectbox(query, id_col_index=0, nome_col_index=1):
+@cache_invalidado_por('cadastros.pacientes')
+def cliente_tem_desconto(cliente_id):
+    """
+    Consulta (com cache) se o cliente tem direito ao desconto.
+    Usa a mesma função do banco chamada por vendas.efetivar_compra.
+    """
+    resultado, _ = db_manager.fetch_query(cadastros_queries.VERIFICAR_DESCONTO_CLIENTE, (cliente_id,))
+    return bool(resultado and resultado[0][0])
+
+@st.cache_data(ttl=3600)
+def buscar_opcoes_selectbox(query):
+    """Linhas das listas de seleção, em cache até alguma tabela da query ser alterada."""
     dados, _ = db_manager.fetch_query(query)
+    if dados is None:
+        # Erro na consulta: não mantém o resultado vazio em cache
+        raise RuntimeError("Falha ao carregar as opções.")
+    return dados
+
+def carregar_dados_para_selectbox(query, id_col_index=0, nome_col_index=1):
+    invalidador_cache.registrar(buscar_opcoes_selectbox, tabelas_da_query(query))
+    try:
+        dados = buscar_opcoes_selectbox(query)
+    except RuntimeError:
+        dados = None
     if not dados:
         return {}, ["Nenhum item encontrado"]
     
@@ -58,6 +135,230 @@ def carregar_dados_para_selectbox(query, id_col_index=0, nome_col_index=1):
     opcoes = [f"{id} - {nome}" for id, nome in mapeamento.items()]
     return mapeamento, opcoes
 
+def linhas_editadas(df_original, df_editado, colunas):
+    """
+    Compara a tabela editada com a original (ambas com a coluna 'id') e retorna as linhas
+    alteradas como tuplas (id, *colunas editadas, *colunas originais), prontas para um UPDATE em
+    lote que confere se o banco ainda tem os valores originais.
+    """
+    original = df_original.set_index('id')[colunas]
+    editado = df_editado.set_index('id')[colunas]
+    iguais = (original == editado) | (original.isna() & editado.isna())
+    alteradas = ~iguais.all(axis=1)
+    # Converte os tipos do numpy/pandas para tipos Python, que o psycopg2 sabe adaptar
+    def valores(linha):
+        return tuple(None if pd.isna(v) else (v.item() if hasattr(v, 'item') else v) for v in linha)
+    return [
+        (int(registro_id), *valores(linha_editada), *valores(linha_original))
+        for registro_id, linha_editada, linha_original in zip(
+            editado.index[alteradas], editado[alteradas].itertuples(index=False), original[alteradas].itertuples(index=False))
+    ]
+
+def editor_em_lote(df, colunas_editaveis, query_lote, chave, column_config=None):
+    """
+    Mostra df em uma tabela editável (apenas colunas_editaveis) e grava todas as linhas
+    alteradas de uma vez, com um único UPDATE em lote e uma única transação. Linhas que outro
+    usuário alterou depois de a tabela ser carregada não são gravadas e são listadas em um aviso.
+    """
+    conflitos = st.session_state.pop(f"{chave}_conflitos", None)
+    if conflitos:
+        st.warning(f"{len(conflitos)} registro(s) foram alterados por outro usuário e não foram salvos "
+                   f"(id: {', '.join(map(str, conflitos))}). Confira os valores atuais e edite novamente.")
+    # Colunas NUMERIC chegam como Decimal, que nunca é igual ao float devolvido pelo editor
+    df = df.apply(lambda col: pd.to_numeric(col) if col.map(lambda v: isinstance(v, Decimal)).any() else col)
+    df_editado = st.data_editor(
+        df, key=chave, use_container_width=True, hide_index=True, num_rows="fixed",
+        disabled=[c for c in df.columns if c not in colunas_editaveis], column_config=column_config,
+    )
+    alteracoes = linhas_editadas(df, df_editado, colunas_editaveis)
+    if st.button(f"Salvar alterações ({len(alteracoes)})", key=f"{chave}_salvar", disabled=not alteracoes):
+        gravadas = db_manager.execute_batch(query_lote, alteracoes, fetch=True)
+        if gravadas is None:
+            st.error("Falha ao salvar. Nenhuma alteração foi gravada.")
+        else:
+            st.success(f"{len(gravadas)} registro(s) atualizado(s).")
+            # Mostrado após a recarga, já com os valores atuais na tabela
+            st.session_state[f"{chave}_conflitos"] = sorted({linha[0] for linha in alteracoes} - {linha[0] for linha in gravadas})
+            # Descarta as edições já gravadas, para a tabela ser recarregada do banco
+            del st.session_state[chave]
+            st.rerun()
+
+@st.fragment(run_every="5s")
+def painel_estoque_baixo():
+    """
+    Alerta de produtos abaixo do ponto de reposição. Atualiza sozinho a cada 5 segundos
+    a partir da lista em memória mantida pelas notificações do banco (sem consultar o banco).
+    """
+    produtos = monitor_estoque_baixo.listar()
+    if produtos:
+        st.warning(f"⚠️ {len(produtos)} produto(s) abaixo do ponto de reposição!")
+        df_baixo = pd.DataFrame(produtos, columns=['id', 'nome', 'quantidade', 'ponto_reposicao'])
+        st.dataframe(df_baixo, use_container_width=True, hide_index=True)
+    else:
+        st.success("✅ Nenhum produto abaixo do ponto de reposição.")
+
+DIAS_SEMANA = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+HORARIOS_AGENDA = [f"{h:02d}:{m:02d}" for h in range(8, 18) for m in (0, 30)]
+
+def consultas_da_semana(db, medico_id, inicio_semana):
+    """Consultas do médico na semana (ou None em caso de erro), pela conexão informada."""
+    inicio = datetime.combine(inicio_semana, datetime.min.time())
+    consultas, _ = db.fetch_query(clinico_queries.AGENDA_MEDICO_POR_PERIODO, (medico_id, inicio, inicio + timedelta(days=7)))
+    return consultas
+
+class PrefetchAgenda:
+    """
+    Carrega em segundo plano as semanas vizinhas da agenda, em uma única thread com conexão própria:
+    a conexão do app não é usada fora da thread do script, então um erro aqui (e o rollback que ele
+    faz) não afeta a recarga em andamento. As semanas carregadas ficam em memória até serem usadas
+    por agenda_semana_medico ou descartadas pelo InvalidadorCache (método clear).
+    """
+
+    def __init__(self, max_semanas=200):
+        self.max_semanas = max_semanas
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch-agenda")
+        self._db = None  # criado na própria thread de prefetch
+        self._semanas = OrderedDict()
+        self._versao = 0
+        self._lock = threading.Lock()
+
+    def agendar(self, medico_id, inicio_semana):
+        self._executor.submit(self._carregar, medico_id, inicio_semana)
+
+    def _carregar(self, medico_id, inicio_semana):
+        with self._lock:
+            if (medico_id, inicio_semana) in self._semanas:
+                return
+            versao = self._versao
+        if self._db is None or not self._db.conn or self._db.conn.closed:
+            self._db = DatabaseManager(cache_entidades=False)
+            self._db.connect()
+            if not self._db.conn:
+                return
+        consultas = consultas_da_semana(self._db, medico_id, inicio_semana)
+        with self._lock:
+            # Se a agenda foi invalidada durante a leitura, o resultado pode já estar desatualizado
+            if consultas is None or versao != self._versao:
+                return
+            self._semanas[medico_id, inicio_semana] = consultas
+            while len(self._semanas) > self.max_semanas:
+                self._semanas.popitem(last=False)
+
+    def retirar(self, medico_id, inicio_semana):
+        """Retorna (e remove) as consultas já carregadas da semana, ou None."""
+        with self._lock:
+            return self._semanas.pop((medico_id, inicio_semana), None)
+
+    def clear(self):
+        with self._lock:
+            self._versao += 1
+            self._semanas.clear()
+
+@st.cache_resource
+def get_prefetch_agenda():
+    prefetch = PrefetchAgenda()
+    invalidador_cache.registrar(prefetch, ['clinico.consultas', 'cadastros.pacientes'])
+    return prefetch
+
+@cache_invalidado_por('clinico.consultas', 'cadastros.pacientes')
+def agenda_semana_medico(medico_id, inicio_semana):
+    """
+    Grade (horário x dia) de uma semana da agenda do médico, já montada para exibição.
+    Lê só a janela da semana (ou a que o prefetch já carregou); fica em cache até alguma
+    consulta ou paciente ser alterado.
+    """
+    consultas = get_prefetch_agenda().retirar(medico_id, inicio_semana)
+    if consultas is None:
+        consultas = consultas_da_semana(db_manager, medico_id, inicio_semana)
+    if consultas is None:
+        # Erro na consulta: não mantém a semana vazia em cache
+        raise RuntimeError("Falha ao carregar a agenda.")
+
+    colunas = [f"{DIAS_SEMANA[i]} {inicio_semana + timedelta(days=i):%d/%m}" for i in range(7)]
+    celulas = {}
+    for _, data, duracao, status, paciente in consultas:
+        # Horários fora da grade (ex: 07:15) ganham uma linha própria, arredondada para a meia hora
+        linha = f"{data.hour:02d}:{30 if data.minute >= 30 else 0:02d}"
+        texto = f"{data:%H:%M}-{data + timedelta(minutes=duracao):%H:%M} {paciente} ({status})"
+        celulas.setdefault((linha, colunas[data.weekday()]), []).append(texto)
+
+    horarios = sorted(set(HORARIOS_AGENDA) | {linha for linha, _ in celulas})
+    grade = pd.DataFrame('', index=horarios, columns=colunas)
+    for (linha, coluna), textos in celulas.items():
+        grade.loc[linha, coluna] = " / ".join(textos)
+    # Domingo só aparece quando há consultas nele
+    if not (grade[colunas[6]] != '').any():
+        grade = grade.drop(columns=colunas[6])
+    return grade, len(consultas)
+
+TAMANHO_PAGINA_CONSULTAS = 50
+
+@cache_invalidado_por('clinico.consultas', 'cadastros.pacientes', 'cadastros.medicos', 'cadastros.especialidades')
+def pagina_relatorio_consultas(filtros, cursor):
+    """
+    Uma página do relatório de consultas, mais uma consulta para indicar se há próxima página.
+    filtros = (início, fim, status, medico_id, especialidade_id); cursor = (data, id) da última
+    consulta da página anterior, ou (None, None) para a primeira.
+    """
+    dados, desc = db_manager.fetch_query(clinico_queries.DETALHES_CONSULTAS, (*filtros, *cursor, TAMANHO_PAGINA_CONSULTAS + 1))
+    if dados is None:
+        raise RuntimeError("Falha ao carregar as consultas.")
+    return dados, [d[0] for d in desc]
+
+TAMANHO_PAGINA_BUSCA = 20
+
+@cache_invalidado_por('clinico.consultas', 'clinico.receitas', 'cadastros.pacientes', 'cadastros.medicos')
+def buscar_texto_clinico(termos, pagina):
+    """Uma página da busca textual clínica, mais um resultado para indicar se há próxima página."""
+    resultados, _ = db_manager.fetch_query(clinico_queries.BUSCAR_TEXTO_CLINICO, (termos, TAMANHO_PAGINA_BUSCA + 1, pagina * TAMANHO_PAGINA_BUSCA))
+    if resultados is None:
+        raise RuntimeError("Falha ao executar a busca.")
+    return resultados
+
+TAMANHO_PAGINA_LINHA_DO_TEMPO = 50
+
+def linha_do_tempo_paciente(paciente_id, pagina):
+    """
+    Uma página da linha do tempo do paciente (documento JSON montado pelo banco em uma única query).
+    Fica em cache até o histórico desse paciente ser alterado por qualquer processo.
+    """
+    def carregar():
+        resultado, _ = db_manager.fetch_query(clinico_queries.LINHA_DO_TEMPO_PACIENTE, (paciente_id, TAMANHO_PAGINA_LINHA_DO_TEMPO, pagina * TAMANHO_PAGINA_LINHA_DO_TEMPO))
+        if not resultado:
+            raise RuntimeError("Falha ao carregar a linha do tempo.")
+        return resultado[0][0]
+    return cache_linha_do_tempo.obter(paciente_id, pagina, carregar)
+
+@cache_invalidado_por('financeiro.pagamentos', 'cadastros.pacientes', 'cadastros.medicos', 'cadastros.especialidades')
+def aging_recebiveis(data_referencia):
+    """
+    Antiguidade dos recebíveis em aberto (uma única agregação no banco). A data de referência faz
+    parte da chave do cache, então as faixas avançam sozinhas na virada do dia.
+    """
+    dados, desc = db_manager.fetch_query(financeiro_queries.AGING_RECEBIVEIS, (data_referencia,))
+    if dados is None:
+        raise RuntimeError("Falha ao calcular os recebíveis.")
+    return pd.DataFrame(dados, columns=[d[0] for d in desc])
+
+@cache_invalidado_por('clinico.indicadores_diarios', 'cadastros.medicos', 'cadastros.especialidades')
+def indicadores_clinicos(inicio, fim):
+    """
+    Indicadores do período (por médico, por especialidade e total) e a série diária para o gráfico.
+    Lê só a tabela diária mantida pelo banco: o custo depende do período, não do histórico.
+    """
+    grupos, desc_grupos = db_manager.fetch_query(clinico_queries.INDICADORES_POR_PERIODO, (inicio, fim))
+    serie, desc_serie = db_manager.fetch_query(clinico_queries.INDICADORES_SERIE_DIARIA, (inicio, fim))
+    if grupos is None or serie is None:
+        raise RuntimeError("Falha ao carregar os indicadores.")
+    return (pd.DataFrame(grupos, columns=[d[0] for d in desc_grupos]),
+            pd.DataFrame(serie, columns=[d[0] for d in desc_serie]))
+
+def prefetch_semanas_vizinhas(medico_id, inicio_semana):
+    """Carrega em segundo plano a semana anterior e a seguinte, para a navegação não esperar o banco."""
+    prefetch = get_prefetch_agenda()
+    for deslocamento in (7, -7):
+        prefetch.agendar(medico_id, inicio_semana + timedelta(days=deslocamento))
+
 # --- PÁGINA DE CADASTROS ---
 def pagina_cadastros():
     st.header("Módulo de Cadastros")
@@ -116,20 +417,11 @@ def pagina_cadastros():
 
         if pacientes:
             df_pacientes = pd.DataFrame(pacientes, columns=[d[0] for d in desc])
-            st.dataframe(df_pacientes, use_container_width=True)
+            st.caption("Edite os telefones diretamente na tabela e salve todas as alterações de uma vez.")
+            editor_em_lote(df_pacientes, ['telefone'], cadastros_queries.ATUALIZAR_TELEFONES_PACIENTES_EM_LOTE, "editor_pacientes")
 
             st.markdown("---")
-            col_alt, col_rem, col_desc = st.columns(3)
-            with col_alt:
-                st.subheader("Alterar Telefone")
-                id_alt_pac = st.number_input("ID do Paciente", min_value=1, step=1, key="id_alt_pac")
-                novo_tel = st.text_input("Novo Telefone", key="tel_pac")
-                if st.button("Alterar Telefone"):
-                    if db_manager.execute_query(cadastros_queries.ATUALIZAR_TELEFONE_PACIENTE, (novo_tel, id_alt_pac)):
-                        st.success(f"Telefone do paciente ID {id_alt_pac} alterado!")
-                        st.rerun()
-                    else:
-                        st.error("Falha ao alterar. Verifique se o ID do paciente existe.")
+            col_rem, col_desc = st.columns(2)
             with col_rem:
                 st.subheader("Remover Paciente")
                 id_rem_pac = st.number_input("ID do Paciente", min_value=1, step=1, key="id_rem_pac")
@@ -172,11 +464,19 @@ def pagina_cadastros():
                         if st.button("Salvar Critérios de Desconto"):
                             dados_update = (torce_flamengo_atual, assiste_one_piece_atual, nasceu_sousa_atual, pac_id_desc)
                             if db_manager.execute_query(cadastros_queries.ATUALIZAR_CRITERIOS_DESCONTO_PACIENTE, dados_update):
+                                cliente_tem_desconto.clear()
                                 st.success("Critérios de desconto atualizados com sucesso!")
                                 st.rerun()
         else:
             st.info("Nenhum paciente encontrado.")
 
+        with st.expander("📣 Clientes Elegíveis a Desconto (Campanhas)"):
+            elegiveis, desc_eleg = db_manager.fetch_query(cadastros_queries.LISTAR_CLIENTES_COM_DESCONTO)
+            if elegiveis:
+                st.dataframe(pd.DataFrame(elegiveis, columns=[d[0] for d in desc_eleg]), use_container_width=True)
+            else:
+                st.info("Nenhum cliente elegível a desconto.")
+
     # --- SEPARADOR DE MÉDICOS ---
     with tab_medicos:
         st.subheader("Gerenciamento de Médicos")
@@ -239,15 +539,14 @@ def pagina_cadastros():
         col_alt_salario, col_rem_med = st.columns(2)
 
         with col_alt_salario:
-            st.subheader("Alterar Salário")
-            id_med_salario = st.number_input("ID do Médico", min_value=1, step=1, key="id_med_salario")
-            novo_salario = st.number_input("Novo Salário", min_value=0.0, format="%.2f", key="novo_salario")
-            if st.button("Alterar Salário"):
-                if db_manager.execute_query(cadastros_queries.ATUALIZAR_SALARIO_MEDICO, (novo_salario, id_med_salario)):
-                    st.success("Salário atualizado com sucesso!")
-                    st.rerun()
-                else:
-                    st.error("Falha ao atualizar. Verifique o ID do médico.")
+            st.subheader("Alterar Salários")
+            salarios, desc_sal = db_manager.fetch_query(cadastros_queries.LISTAR_SALARIOS_MEDICOS)
+            if salarios:
+                df_salarios = pd.DataFrame(salarios, columns=[d[0] for d in desc_sal])
+                editor_em_lote(df_salarios, ['salario'], cadastros_queries.ATUALIZAR_SALARIOS_MEDICOS_EM_LOTE, "editor_salarios",
+                               column_config={'salario': st.column_config.NumberColumn("Salário (R$)", min_value=0.0, format="%.2f")})
+            else:
+                st.info("Nenhum médico cadastrado.")
         
         with col_rem_med:
             st.subheader("Remover Médico")
@@ -386,26 +685,12 @@ def pagina_cadastros():
 
         if especialidades:
             df_espec = pd.DataFrame(especialidades, columns=[d[0] for d in desc])
-            st.dataframe(df_espec, use_container_width=True)
+            st.caption("Marque ou desmarque 'Ativa' na tabela e salve todas as alterações de uma vez.")
+            editor_em_lote(df_espec, ['especialidade_ativa'], cadastros_queries.ATUALIZAR_STATUS_ESPECIALIDADES_EM_LOTE, "editor_especialidades",
+                           column_config={'especialidade_ativa': st.column_config.CheckboxColumn("Ativa")})
             
             st.markdown("---")
-            col_alt_status, col_rem_esp = st.columns(2)
-
-            with col_alt_status:
-                st.subheader("Alterar Status (Ativa/Inativa)")
-                id_alt_status = st.number_input("ID da Especialidade", min_value=1, step=1, key="id_alt_status_esp")
-                espec_data, _ = db_manager.fetch_query(cadastros_queries.SELECIONAR_ESPECIALIDADE_POR_ID, (id_alt_status,))
-                if espec_data:
-                    status_atual = espec_data[0][2]
-                    novo_status = st.selectbox("Novo Status", [True, False], index=0 if status_atual else 1, format_func=lambda x: "Ativa" if x else "Inativa")
-                    if st.button("Alterar Status"):
-                        if db_manager.execute_query(cadastros_queries.ATUALIZAR_STATUS_ESPECIALIDADE, (novo_status, id_alt_status)):
-                            st.success("Status atualizado com sucesso!")
-                            st.rerun()
-                        else:
-                            st.error("Falha ao atualizar o status.")
-                else:
-                    st.info("Digite um ID válido para alterar o status.")
+            col_rem_esp, _ = st.columns(2)
 
             with col_rem_esp:
                 st.subheader("Remover Especialidade")
@@ -501,7 +786,7 @@ def pagina_cadastros():
 def pagina_clinico():
     st.header("Módulo Clínico")
 
-    tab_consultas, tab_receitas = st.tabs(["Consultas", "Receitas"])
+    tab_consultas, tab_agenda, tab_busca, tab_receitas, tab_indicadores = st.tabs(["Consultas", "Agenda Semanal", "Busca Textual", "Receitas", "Indicadores"])
 
     with tab_consultas:
         st.subheader("Gerenciamento de Consultas")
@@ -515,6 +800,7 @@ def pagina_clinico():
                 medico_selecionado = st.selectbox("Médico*", medicos_opts)
                 data_consulta = st.date_input("Data da Consulta")
                 hora_consulta = st.time_input("Hora da Consulta")
+                duracao_consulta = st.number_input("Duração (minutos)", min_value=5, max_value=480, value=30, step=5)
                 motivo = st.text_area("Motivo da Consulta")
                 
                 if st.form_submit_button("Agendar Consulta"):
@@ -524,12 +810,48 @@ def pagina_clinico():
                         paciente_id = int(paciente_selecionado.split(" - ")[0])
                         medico_id = int(medico_selecionado.split(" - ")[0])
                         data_hora_completa = datetime.combine(data_consulta, hora_consulta)
-                        dados = (paciente_id, medico_id, data_hora_completa, motivo, 'Agendada')
+                        dados = (paciente_id, medico_id, data_hora_completa, duracao_consulta, motivo, 'Agendada')
                         res = db_manager.execute_and_fetch_one(clinico_queries.INSERIR_CONSULTA, dados)
                         if res: 
                             st.success(f"Consulta agendada com ID {res[0]}")
                         else: 
-                            st.error("Falha ao agendar consulta.")
+                            st.error("Falha ao agendar consulta. O médico pode já ter outra consulta nesse horário; use a busca de horários livres.")
+
+        with st.expander("🔎 Buscar Horários Livres"):
+            _, especialidades_opts_livres = carregar_dados_para_selectbox(cadastros_queries.LISTAR_TODAS_ESPECIALIDADES)
+            col_esp, col_janela, col_duracao = st.columns([2, 2, 1])
+            with col_esp:
+                especialidade_livre = st.selectbox("Especialidade", especialidades_opts_livres, key="esp_livre")
+            with col_janela:
+                janela_livre = st.date_input("Janela de datas", value=(datetime.now().date(), datetime.now().date() + timedelta(days=14)), key="janela_livre")
+            with col_duracao:
+                duracao_livre = st.number_input("Duração (min)", min_value=5, max_value=480, value=30, step=5, key="duracao_livre")
+
+            if st.button("Buscar Horários") and "Nenhum" not in especialidade_livre and len(janela_livre) == 2:
+                especialidade_id_livre = int(especialidade_livre.split(" - ")[0])
+                # Não começa no passado: a janela só é considerada a partir de agora
+                inicio_janela = max(datetime.combine(janela_livre[0], datetime.min.time()), datetime.now())
+                fim_janela = datetime.combine(janela_livre[1] + timedelta(days=1), datetime.min.time())
+                horarios, _ = db_manager.fetch_query(clinico_queries.BUSCAR_HORARIOS_LIVRES, (especialidade_id_livre, inicio_janela, fim_janela, duracao_livre, 10))
+                st.session_state.horarios_livres = {'horarios': horarios or [], 'duracao': duracao_livre}
+
+            resultado_livres = st.session_state.get('horarios_livres')
+            if resultado_livres is not None:
+                if not resultado_livres['horarios']:
+                    st.info("Nenhum horário livre nessa janela.")
+                else:
+                    opcoes_horario = {f"{h[2]:%d/%m/%Y %H:%M} - {h[1]}": h for h in resultado_livres['horarios']}
+                    horario_escolhido = st.radio("Horários disponíveis (mais cedo primeiro):", list(opcoes_horario.keys()), key="horario_livre_sel")
+                    paciente_livre = st.selectbox("Paciente", pacientes_opts, key="paciente_livre")
+                    if st.button("Agendar neste horário") and "Nenhum" not in paciente_livre:
+                        medico_id_livre, _, inicio_livre, _ = opcoes_horario[horario_escolhido]
+                        dados = (int(paciente_livre.split(" - ")[0]), medico_id_livre, inicio_livre, resultado_livres['duracao'], None, 'Agendada')
+                        res = db_manager.execute_and_fetch_one(clinico_queries.INSERIR_CONSULTA, dados)
+                        if res:
+                            st.success(f"Consulta agendada com ID {res[0]}")
+                            st.session_state.horarios_livres = None
+                        else:
+                            st.error("O horário acabou de ser ocupado. Busque novamente.")
 
         st.subheader("Consultas Agendadas")
         
@@ -537,11 +859,48 @@ def pagina_clinico():
         
         if pesquisa_consulta_paciente:
             consultas, desc = db_manager.fetch_query(clinico_queries.PESQUISAR_CONSULTA_POR_NOME_PACIENTE, (f"%{pesquisa_consulta_paciente}%",))
+            colunas_consultas = [d[0] for d in desc] if desc else []
         else:
-            consultas, desc = db_manager.fetch_query(clinico_queries.DETALHES_CONSULTAS)
+            hoje = datetime.now().date()
+            _, especialidades_opts_rel = carregar_dados_para_selectbox(cadastros_queries.LISTAR_TODAS_ESPECIALIDADES)
+            col_periodo, col_status, col_medico, col_esp = st.columns([2, 1, 2, 2])
+            periodo_consultas = col_periodo.date_input("Período", value=(hoje - timedelta(days=30), hoje + timedelta(days=30)), key="periodo_consultas")
+            status_filtro = col_status.selectbox("Status", ["Todos", "Agendada", "Realizada", "Cancelada"], key="status_consultas")
+            medico_filtro = col_medico.selectbox("Médico", ["Todos"] + [m for m in medicos_opts if "Nenhum" not in m], key="medico_consultas")
+            esp_filtro = col_esp.selectbox("Especialidade", ["Todas"] + [e for e in especialidades_opts_rel if "Nenhum" not in e], key="especialidade_consultas")
+
+            inicio_rel, fim_rel = periodo_consultas if len(periodo_consultas) == 2 else (periodo_consultas[0], periodo_consultas[0])
+            filtros = (inicio_rel, fim_rel,
+                       None if status_filtro == "Todos" else status_filtro,
+                       None if medico_filtro == "Todos" else int(medico_filtro.split(" - ")[0]),
+                       None if esp_filtro == "Todas" else int(esp_filtro.split(" - ")[0]))
+
+            # Pilha com o cursor (data, id) do início de cada página visitada; volta à primeira ao mudar os filtros
+            if st.session_state.get('filtros_consultas') != filtros:
+                st.session_state.filtros_consultas = filtros
+                st.session_state.cursores_consultas = [(None, None)]
+            cursores = st.session_state.cursores_consultas
+
+            try:
+                consultas, colunas_consultas = pagina_relatorio_consultas(filtros, cursores[-1])
+            except RuntimeError:
+                st.error("Falha ao carregar as consultas.")
+                consultas, colunas_consultas = None, []
+
+            if consultas:
+                tem_proxima = len(consultas) > TAMANHO_PAGINA_CONSULTAS
+                consultas = consultas[:TAMANHO_PAGINA_CONSULTAS]
+                col_ant_rel, col_pag_rel, col_prox_rel = st.columns([1, 2, 1])
+                if col_ant_rel.button("◀ Mais recentes", disabled=len(cursores) == 1, key="consultas_anterior"):
+                    cursores.pop()
+                    st.rerun()
+                col_pag_rel.caption(f"Página {len(cursores)}")
+                if col_prox_rel.button("Mais antigas ▶", disabled=not tem_proxima, key="consultas_proxima"):
+                    cursores.append((consultas[-1][1], consultas[-1][0]))
+                    st.rerun()
 
         if consultas:
-            df_consultas = pd.DataFrame(consultas, columns=[d[0] for d in desc])
+            df_consultas = pd.DataFrame(consultas, columns=colunas_consultas)
             st.dataframe(df_consultas, use_container_width=True)
 
             st.markdown("---")
@@ -558,6 +917,75 @@ def pagina_clinico():
         else:
             st.info("Nenhuma consulta encontrada.")
 
+    with tab_agenda:
+        st.subheader("Agenda Semanal por Médico")
+
+        if 'semana_agenda' not in st.session_state:
+            hoje = datetime.now().date()
+            st.session_state.semana_agenda = hoje - timedelta(days=hoje.weekday())
+
+        def mudar_semana(dias):
+            if dias:
+                st.session_state.semana_agenda += timedelta(days=dias)
+            else:
+                hoje = datetime.now().date()
+                st.session_state.semana_agenda = hoje - timedelta(days=hoje.weekday())
+
+        medico_agenda = st.selectbox("Médico", medicos_opts, key="medico_agenda")
+        col_ant, col_hoje, col_prox = st.columns(3)
+        col_ant.button("◀ Semana anterior", on_click=mudar_semana, args=(-7,), use_container_width=True)
+        col_hoje.button("Semana atual", on_click=mudar_semana, args=(0,), use_container_width=True)
+        col_prox.button("Próxima semana ▶", on_click=mudar_semana, args=(7,), use_container_width=True)
+
+        if "Nenhum" in medico_agenda:
+            st.info("Nenhum médico cadastrado.")
+        else:
+            medico_id_agenda = int(medico_agenda.split(" - ")[0])
+            semana = st.session_state.semana_agenda
+            try:
+                grade, total_semana = agenda_semana_medico(medico_id_agenda, semana)
+            except RuntimeError:
+                st.error("Falha ao carregar a agenda.")
+            else:
+                st.caption(f"Semana de {semana:%d/%m/%Y} a {semana + timedelta(days=6):%d/%m/%Y} — {total_semana} consulta(s)")
+                st.dataframe(grade, use_container_width=True, height=35 * (len(grade) + 1) + 3)
+                prefetch_semanas_vizinhas(medico_id_agenda, semana)
+
+    with tab_busca:
+        st.subheader("Busca em Motivos, Diagnósticos e Receitas")
+
+        def nova_busca():
+            st.session_state.pagina_busca = 0
+
+        termos_busca = st.text_input("Sintoma, diagnóstico ou medicamento (ex: dor de cabeça -febre, dipirona OR paracetamol):", key="termos_busca", on_change=nova_busca)
+        if 'pagina_busca' not in st.session_state:
+            st.session_state.pagina_busca = 0
+
+        if termos_busca.strip():
+            pagina = st.session_state.pagina_busca
+            try:
+                resultados_busca = buscar_texto_clinico(termos_busca.strip(), pagina)
+            except RuntimeError:
+                st.error("Falha ao executar a busca.")
+                resultados_busca = None
+
+            if resultados_busca is not None and not resultados_busca:
+                st.info("Nenhum resultado encontrado.")
+            elif resultados_busca:
+                tem_proxima = len(resultados_busca) > TAMANHO_PAGINA_BUSCA
+                for tipo, consulta_id, receita_id, data, paciente, medico, relevancia, trecho in resultados_busca[:TAMANHO_PAGINA_BUSCA]:
+                    origem = f"Receita {receita_id} (consulta {consulta_id})" if receita_id else f"Consulta {consulta_id}"
+                    st.markdown(f"**{origem}** · {data:%d/%m/%Y %H:%M} · {paciente} · {medico}  \n{trecho}")
+
+                col_ant_busca, col_pag_busca, col_prox_busca = st.columns([1, 2, 1])
+                if col_ant_busca.button("◀ Anterior", disabled=pagina == 0, key="busca_anterior"):
+                    st.session_state.pagina_busca -= 1
+                    st.rerun()
+                col_pag_busca.caption(f"Página {pagina + 1}")
+                if col_prox_busca.button("Próxima ▶", disabled=not tem_proxima, key="busca_proxima"):
+                    st.session_state.pagina_busca += 1
+                    st.rerun()
+
     with tab_receitas:
         st.subheader("Visualização de Receitas")
         
@@ -574,11 +1002,157 @@ def pagina_clinico():
         else:
             st.info("Nenhuma receita encontrada.")
 
+    with tab_indicadores:
+        st.subheader("📈 Indicadores de Consultas e Faturamento")
+
+        hoje = datetime.now().date()
+        periodo = st.date_input("Período", value=(hoje.replace(day=1), hoje), key="periodo_indicadores")
+        if len(periodo) != 2:
+            st.info("Selecione a data final do período.")
+        else:
+            inicio_periodo, fim_periodo = periodo
+            try:
+                df_indicadores, df_serie = indicadores_clinicos(inicio_periodo, fim_periodo)
+            except RuntimeError:
+                st.error("Falha ao carregar os indicadores.")
+                df_indicadores = None
+
+            # O total (grupo vazio do GROUPING SETS) sempre existe; sem consultas, suas somas são nulas
+            total = df_indicadores[df_indicadores['agrupamento'] == 'Total'].iloc[0] if df_indicadores is not None else None
+            if total is not None and pd.isna(total['consultas']):
+                st.info("Nenhuma consulta no período.")
+            elif total is not None:
+                col_cons, col_real, col_canc, col_fat, col_rec = st.columns(5)
+                col_cons.metric("Consultas", f"{total['consultas']:,}")
+                col_real.metric("Realizadas", f"{total['realizadas']:,}")
+                col_canc.metric("Cancelamento", f"{total['taxa_cancelamento'] or 0:.1f}%", f"{total['canceladas']:,} cancelada(s)", delta_color="off")
+                col_fat.metric("Faturado", f"R$ {total['valor_faturado']:,.2f}")
+                col_rec.metric("Recebido", f"R$ {total['valor_recebido']:,.2f}")
+
+                df_grafico = df_serie.melt(id_vars='dia', value_vars=['consultas', 'canceladas'], var_name='tipo', value_name='quantidade')
+                grafico = alt.Chart(df_grafico).mark_line(point=True).encode(
+                    x=alt.X('dia', type='temporal', title='Dia'),
+                    y=alt.Y('quantidade', type='quantitative', title='Consultas'),
+                    color=alt.Color('tipo', type='nominal', title=None),
+                    tooltip=['dia', 'tipo', 'quantidade']
+                )
+                st.altair_chart(grafico, use_container_width=True)
+
+                agrupamento_ind = st.radio("Detalhar por:", ["Especialidade", "Médico"], horizontal=True, key="agrupamento_indicadores")
+                df_grupo_ind = df_indicadores[df_indicadores['agrupamento'] == agrupamento_ind].drop(columns=['agrupamento'])
+                if agrupamento_ind == "Especialidade":
+                    df_grupo_ind = df_grupo_ind.drop(columns=['medico'])
+                st.dataframe(df_grupo_ind.rename(columns={'medico': 'médico', 'taxa_cancelamento': 'cancelamento (%)',
+                                                          'valor_faturado': 'faturado (R$)', 'valor_recebido': 'recebido (R$)'}),
+                             use_container_width=True, hide_index=True)
+
+            with st.expander("🔄 Recalcular indicadores do período"):
+                st.caption("Os indicadores são atualizados automaticamente a cada alteração de consultas e pagamentos. "
+                           "Recalcule apenas após cargas feitas por fora da aplicação com os triggers desabilitados.")
+                if st.button("Recalcular", key="recalcular_indicadores"):
+                    res = db_manager.execute_and_fetch_one(manutencao_queries.RECALCULAR_INDICADORES, (inicio_periodo, fim_periodo))
+                    if res is not None:
+                        st.success(f"{res[0]} linha(s) diária(s) recalculada(s).")
+                    else:
+                        st.error("Falha ao recalcular os indicadores.")
+
+
+# --- PÁGINA DE HISTÓRICO DO PACIENTE ---
+def pagina_historico_paciente():
+    st.header("Histórico do Paciente")
+
+    _, pacientes_opts = carregar_dados_para_selectbox(cadastros_queries.LISTAR_TODOS_PACIENTES)
+    paciente_historico = st.selectbox("Paciente", pacientes_opts, key="paciente_historico")
+    if "Nenhum" in paciente_historico:
+        st.info("Nenhum paciente cadastrado.")
+        return
+    paciente_id = int(paciente_historico.split(" - ")[0])
+
+    # Volta para a primeira página ao trocar de paciente
+    if st.session_state.get('historico_paciente_id') != paciente_id:
+        st.session_state.historico_paciente_id = paciente_id
+        st.session_state.pagina_historico = 0
+    pagina = st.session_state.pagina_historico
+
+    try:
+        documento = linha_do_tempo_paciente(paciente_id, pagina)
+    except RuntimeError:
+        st.error("Falha ao carregar o histórico do paciente.")
+        return
+    paciente = documento['paciente']
+    if not paciente:
+        st.warning("Paciente não encontrado.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Paciente", paciente['nome'])
+    col2.metric("CPF", paciente['cpf'] or "-")
+    col3.metric("Eventos no histórico", documento['total_eventos'])
+    st.caption(f"{paciente['email'] or '-'} · {paciente['telefone'] or '-'} · {paciente['cidade'] or '-'}/{paciente['sigla_estado'] or '-'}"
+               + (" · 🎉 tem desconto" if paciente['tem_desconto'] else ""))
+    st.divider()
+
+    icones = {'consulta': '🩺', 'receita': '💊', 'pagamento': '💳', 'compra': '🛒'}
+    if not documento['eventos']:
+        st.info("Nenhum evento no histórico deste paciente.")
+    for evento in documento['eventos']:
+        data_evento = datetime.fromisoformat(evento['data']).strftime('%d/%m/%Y %H:%M')
+        if evento['tipo'] == 'consulta':
+            resumo = f"Consulta #{evento['consulta_id']} com {evento['medico']} ({evento['especialidade']}) — {evento['status']}"
+            detalhes = " · ".join(filter(None, [evento['motivo'], evento['diagnostico']]))
+        elif evento['tipo'] == 'receita':
+            resumo = f"Receita #{evento['receita_id']}: {evento['medicamento']} {evento['dosagem'] or ''}"
+            detalhes = evento['instrucoes']
+        elif evento['tipo'] == 'pagamento':
+            resumo = f"Pagamento #{evento['pagamento_id']} da consulta #{evento['consulta_id']}: R$ {evento['valor']:.2f} ({evento['metodo']})"
+            detalhes = "Pago" if evento['pago'] else "Pendente"
+        else:
+            resumo = f"Compra #{evento['venda_id']}: R$ {evento['total_liquido']:.2f} ({evento['forma_pagamento']}, {evento['status_pagamento']})"
+            detalhes = ", ".join(f"{item['quantidade']}x {item['produto']}" for item in evento['itens'] or [])
+        st.markdown(f"{icones[evento['tipo']]} **{data_evento}** — {resumo}")
+        if detalhes:
+            st.caption(detalhes)
+
+    total_paginas = max(1, -(-documento['total_eventos'] // TAMANHO_PAGINA_LINHA_DO_TEMPO))
+    col_ant, col_pag, col_prox = st.columns([1, 2, 1])
+    if col_ant.button("◀ Mais recentes", disabled=pagina == 0):
+        st.session_state.pagina_historico -= 1
+        st.rerun()
+    col_pag.caption(f"Página {pagina + 1} de {total_paginas}")
+    if col_prox.button("Mais antigos ▶", disabled=pagina + 1 >= total_paginas):
+        st.session_state.pagina_historico += 1
+        st.rerun()
+
 
 # --- PÁGINA FINANCEIRA ---
 def pagina_financeiro():
     st.header("Módulo Financeiro")
 
+    st.subheader("📊 Contas a Receber por Antiguidade")
+    try:
+        df_aging = aging_recebiveis(datetime.now().date())
+    except RuntimeError:
+        st.error("Falha ao calcular os recebíveis em aberto.")
+        df_aging = None
+
+    if df_aging is not None:
+        faixas = {'dias_0_30': '0–30 dias', 'dias_31_60': '31–60 dias', 'dias_61_90': '61–90 dias', 'dias_90_mais': '90+ dias'}
+        # O total (grupo vazio do GROUPING SETS) sempre existe, com 0 títulos quando não há nada em aberto
+        total_aging = df_aging[df_aging['agrupamento'] == 'Total'].iloc[0]
+        if total_aging['titulos'] == 0:
+            st.success("Não há recebíveis em aberto.")
+        else:
+            colunas_metricas = st.columns(len(faixas) + 1)
+            for coluna_metrica, (campo, rotulo) in zip(colunas_metricas, faixas.items()):
+                coluna_metrica.metric(rotulo, f"R$ {total_aging[campo]:,.2f}")
+            colunas_metricas[-1].metric("Total em aberto", f"R$ {total_aging['total']:,.2f}", f"{total_aging['titulos']} título(s)", delta_color="off")
+
+            agrupamento = st.radio("Agrupar por:", ["Paciente", "Especialidade", "Método"], horizontal=True, key="agrupamento_aging")
+            df_grupo = df_aging[df_aging['agrupamento'] == agrupamento].drop(columns=['agrupamento'])
+            st.dataframe(df_grupo.rename(columns={**faixas, 'grupo': agrupamento, 'titulos': 'títulos', 'dias_mais_antigo': 'dias (mais antigo)'}),
+                         use_container_width=True, hide_index=True)
+
+    st.markdown("---")
     st.subheader("Gerenciamento de Pagamentos")
     
     _, consultas_opts = carregar_dados_para_selectbox(clinico_queries.LISTAR_TODAS_CONSULTAS, 0, 1)
@@ -601,6 +1175,28 @@ def pagina_financeiro():
                     if res: st.success(f"Pagamento lançado com ID {res[0]}")
                     else: st.error("Falha ao lançar pagamento.")
 
+    with st.expander("🏦 Conciliar Arquivo de Liquidação (banco/adquirente)"):
+        st.caption("CSV com cabeçalho e as colunas consulta_id, valor, data_pagamento e, opcionalmente, metodo. "
+                   "Cada linha quita o pagamento em aberto da mesma consulta e valor; todo o arquivo é conciliado em uma única transação.")
+        arquivo_liquidacao = st.file_uploader("Arquivo de liquidação", type=["csv", "txt"], key="arquivo_liquidacao")
+        col_delim, col_dias = st.columns(2)
+        delimitador = col_delim.selectbox("Separador", [",", ";"], key="delimitador_liquidacao")
+        dias_antecedencia = col_dias.number_input("Aceitar liquidações até N dias antes da consulta", min_value=0, max_value=365, value=30, key="dias_antecedencia")
+
+        if st.button("Conciliar Arquivo") and arquivo_liquidacao is not None:
+            with st.spinner("Conciliando..."):
+                linhas_lidas, nao_conciliadas, desc_conc = conciliar_arquivo(db_manager, arquivo_liquidacao, dias_antecedencia, delimitador)
+            if linhas_lidas is None:
+                st.error("Falha na conciliação: verifique o cabeçalho e o formato do arquivo. Nenhum pagamento foi alterado.")
+            else:
+                st.success(f"{linhas_lidas - len(nao_conciliadas)} de {linhas_lidas} linha(s) conciliada(s).")
+                if nao_conciliadas:
+                    df_nao_conc = pd.DataFrame(nao_conciliadas, columns=[d[0] for d in desc_conc])
+                    st.warning(f"{len(nao_conciliadas)} linha(s) não conciliada(s):")
+                    st.dataframe(df_nao_conc, use_container_width=True, hide_index=True)
+                    st.download_button("Baixar não conciliadas (CSV)", df_nao_conc.to_csv(index=False).encode('utf-8'),
+                                       file_name="nao_conciliadas.csv", mime="text/csv")
+
     st.subheader("Todos os Pagamentos")
     pagamentos, desc = db_manager.fetch_query(financeiro_queries.LISTAR_TODOS_PAGAMENTOS)
     if pagamentos:
@@ -630,6 +1226,8 @@ def pagina_vendas():
     tab_produtos, tab_venda, tab_relatorios = st.tabs(["Produtos e Estoque", "Realizar Venda", "Relatórios de Vendas"])
 
     with tab_produtos:
+        painel_estoque_baixo()
+
         st.subheader("Gerenciamento de Produtos")
         
         col_cad_prod, col_cad_cat = st.columns(2)
@@ -716,6 +1314,78 @@ def pagina_vendas():
                                 st.rerun()
                             else:
                                 st.error("Falha ao atualizar o produto.")    
+        with st.expander("📝 Editar Vários Produtos"):
+            produtos_edicao, desc_edicao = db_manager.fetch_query(vendas_queries.LISTAR_PRODUTOS_PARA_EDICAO)
+            if produtos_edicao:
+                categorias_map_lote, _ = carregar_dados_para_selectbox(vendas_queries.LISTAR_CATEGORIAS)
+                df_produtos_edicao = pd.DataFrame(produtos_edicao, columns=[d[0] for d in desc_edicao])
+                editor_em_lote(
+                    df_produtos_edicao, ['nome', 'descricao', 'preco', 'categoria_id', 'fabricado_em_mari'],
+                    vendas_queries.ATUALIZAR_PRODUTOS_EM_LOTE, "editor_produtos",
+                    column_config={
+                        'nome': st.column_config.TextColumn("Nome", required=True),
+                        'preco': st.column_config.NumberColumn("Preço (R$)", min_value=0.01, format="%.2f", required=True),
+                        'categoria_id': st.column_config.SelectboxColumn(
+                            "Categoria", options=list(categorias_map_lote),
+                            help=", ".join(f"{cat_id} = {nome}" for cat_id, nome in categorias_map_lote.items())),
+                        'fabricado_em_mari': st.column_config.CheckboxColumn("Fabricado em Mari?"),
+                    },
+                )
+            else:
+                st.info("Nenhum produto para editar.")
+        with st.expander("💲 Reajuste de Preços em Lote"):
+            _, cat_opts_reajuste = carregar_dados_para_selectbox(vendas_queries.LISTAR_CATEGORIAS)
+            with st.form("reajuste_precos_form"):
+                col_filtros, col_regra = st.columns(2)
+                with col_filtros:
+                    st.write("**Produtos**")
+                    cat_reajuste = st.selectbox("Categoria", ["Todas"] + [o for o in cat_opts_reajuste if "Nenhum" not in o])
+                    mari_reajuste = st.radio("Fabricados em Mari", ["Todos", "Somente de Mari", "Exceto de Mari"], horizontal=True)
+                    col_min, col_max = st.columns(2)
+                    preco_min_reajuste = col_min.number_input("Preço mínimo (0 = sem limite)", min_value=0.0, format="%.2f")
+                    preco_max_reajuste = col_max.number_input("Preço máximo (0 = sem limite)", min_value=0.0, format="%.2f")
+                with col_regra:
+                    st.write("**Reajuste**")
+                    tipo_reajuste = st.radio("Tipo", ["percentual", "valor"], horizontal=True,
+                                             format_func=lambda t: "Percentual (%)" if t == "percentual" else "Valor fixo (R$)")
+                    valor_reajuste = st.number_input("Ajuste (negativo para reduzir)", value=10.0, format="%.2f")
+                    arredondamento_reajuste = st.selectbox("Arredondamento", ["centavos", "inteiro", "final_90"],
+                                                           format_func={'centavos': "Centavos", 'inteiro': "Real inteiro",
+                                                                        'final_90': "Final ,90"}.get)
+                if st.form_submit_button("Pré-visualizar"):
+                    st.session_state.reajuste_precos = (
+                        None if cat_reajuste == "Todas" else int(cat_reajuste.split(" - ")[0]),
+                        {"Todos": None, "Somente de Mari": True, "Exceto de Mari": False}[mari_reajuste],
+                        preco_min_reajuste or None,
+                        preco_max_reajuste or None,
+                        tipo_reajuste,
+                        valor_reajuste,
+                        arredondamento_reajuste,
+                    )
+
+            params_reajuste = st.session_state.get('reajuste_precos')
+            if params_reajuste:
+                previa, desc_previa = db_manager.fetch_query(vendas_queries.PREVIA_REAJUSTE_PRECOS, params_reajuste)
+                if not previa:
+                    st.info("Nenhum produto ativo atende aos filtros.")
+                else:
+                    df_previa = pd.DataFrame(previa, columns=[d[0] for d in desc_previa])
+                    alterados = df_previa[df_previa['diferenca'] != 0]
+                    col_qtd, col_antes, col_depois = st.columns(3)
+                    col_qtd.metric("Preços alterados", f"{len(alterados)} de {len(df_previa)}")
+                    col_antes.metric("Soma dos preços atuais", f"R$ {df_previa['preco_atual'].sum():,.2f}")
+                    col_depois.metric("Soma dos novos preços", f"R$ {df_previa['preco_novo'].sum():,.2f}")
+                    st.dataframe(df_previa, use_container_width=True, hide_index=True)
+
+                    if (df_previa['preco_novo'] < 0).any():
+                        st.error("O reajuste deixaria preços negativos. Ajuste os filtros ou o valor.")
+                    elif st.button(f"Aplicar reajuste a {len(alterados)} produto(s)", type="primary", disabled=alterados.empty):
+                        resultado = db_manager.execute_and_fetch_one(vendas_queries.REAJUSTAR_PRECOS, params_reajuste)
+                        if resultado is None:
+                            st.error("Falha ao aplicar o reajuste. Nenhum preço foi alterado.")
+                        else:
+                            del st.session_state.reajuste_precos
+                            st.success(f"Reajuste aplicado: {resultado[0]} preço(s) alterado(s).")
         with st.expander("🗑️ Remover Produto"):
             # Carrega os produtos para o selectbox
             _, produtos_opts_rem = carregar_dados_para_selectbox("SELECT id, nome FROM vendas.produtos WHERE ativo=TRUE ORDER BY nome;")
@@ -766,13 +1436,13 @@ def pagina_vendas():
             st.markdown("---")
             tipo_filtro = st.radio(
                 "Filtros Adicionais:",
-                ["Listar Todos", "Por Categoria", "Fabricados em Mari", "Estoque Baixo (< 5)"],
+                ["Listar Todos", "Por Categoria", "Fabricados em Mari", "Estoque Baixo"],
                 horizontal=True,
                 key="filtro_produtos"
             )
 
             if tipo_filtro == "Listar Todos":
-                estoque, desc_est = db_manager.fetch_query(vendas_queries.LISTAR_TODOS_PRODUTOS)
+                estoque, desc_est = db_manager.fetch_versionado(vendas_queries.LISTAR_TODOS_PRODUTOS)
             
             elif tipo_filtro == "Por Categoria":
                 _, cat_opts_filter = carregar_dados_para_selectbox(vendas_queries.LISTAR_CATEGORIAS)
@@ -786,7 +1456,7 @@ def pagina_vendas():
             elif tipo_filtro == "Fabricados em Mari":
                 estoque, desc_est = db_manager.fetch_query(vendas_queries.BUSCAR_PRODUTOS_FAB_MARI)
 
-            elif tipo_filtro == "Estoque Baixo (< 5)":
+            elif tipo_filtro == "Estoque Baixo":
                 estoque, desc_est = db_manager.fetch_query(vendas_queries.BUSCAR_PRODUTOS_ESTOQUE_BAIXO)
 
         # Exibe os resultados
@@ -840,6 +1510,18 @@ def pagina_vendas():
                         else:
                             st.error("Falha ao atualizar o estoque.")
 
+            # Ponto de reposição: abaixo dele o produto entra no alerta de estoque baixo
+            with st.expander("🔔 Definir Ponto de Reposição"):
+                with st.form("ponto_reposicao_form"):
+                    produto_selecionado_ponto = st.selectbox("Produto", produtos_opts_update, key="prod_ponto_select")
+                    novo_ponto = st.number_input("Ponto de Reposição (unidades)", min_value=0, value=5, step=1)
+                    if st.form_submit_button("Salvar Ponto de Reposição"):
+                        produto_id_ponto = int(produto_selecionado_ponto.split(" - ")[0])
+                        if db_manager.execute_query(vendas_queries.ATUALIZAR_PONTO_REPOSICAO, (novo_ponto, produto_id_ponto)):
+                            st.success(f"Ponto de reposição do produto ID {produto_id_ponto} definido para {novo_ponto} unidades.")
+                        else:
+                            st.error("Falha ao atualizar o ponto de reposição.")
+
     with tab_venda:
         st.subheader("Nova Venda")
 
@@ -940,10 +1622,8 @@ def pagina_vendas():
 
             if "Nenhum" not in cliente_sel:
                 cliente_id = int(cliente_sel.split(" - ")[0])
-                # Verifica se o cliente tem desconto usando a nova query
-                resultado_desconto, _ = db_manager.fetch_query(cadastros_queries.VERIFICAR_DESCONTO_CLIENTE, (cliente_id,))
-                
-                if resultado_desconto and resultado_desconto[0][0] is True:
+                # Verifica se o cliente tem desconto (consulta em cache, mesma regra da procedure)
+                if cliente_tem_desconto(cliente_id):
                     desconto_aplicado = total_carrinho * 0.10
                     total_liquido = total_carrinho - desconto_aplicado
                     st.success("🎉 Desconto de 10% aplicado para este cliente!")
@@ -991,7 +1671,11 @@ def pagina_vendas():
     with tab_relatorios:
         st.subheader("Dashboard de Vendas Mensal por Vendedor")
         
-        relatorio, desc_rel = db_manager.fetch_query(vendas_queries.REL_VENDAS_POR_VENDEDOR_MES)
+        # A view não é versionada; o resultado vale enquanto as tabelas que ela lê não mudarem
+        relatorio, desc_rel = db_manager.fetch_versionado(
+            vendas_queries.REL_VENDAS_POR_VENDEDOR_MES,
+            tabelas=('vendas.vendas', 'vendas.itens_venda', 'cadastros.funcionarios'),
+        )
         
         if not relatorio:
             st.info("Ainda não há dados de vendas para exibir.")
@@ -1085,7 +1769,7 @@ def pagina_cliente():
 
         # --- 1. Exibir Dados Cadastrais ---
         st.subheader("Meus Dados Cadastrais")
-        dados_cliente, desc_cliente = db_manager.fetch_query(cadastros_queries.CONSULTAR_DADOS_CLIENTE, (cliente_id,))
+        dados_cliente, desc_cliente = db_manager.fetch_versionado(cadastros_queries.CONSULTAR_DADOS_CLIENTE, (cliente_id,))
         
         if dados_cliente:
             cliente_info = pd.DataFrame(dados_cliente, columns=[d[0] for d in desc_cliente]).iloc[0]
@@ -1098,9 +1782,7 @@ def pagina_cliente():
             # --- Lógica para exibir status de desconto ---
             st.write("") # Adiciona um espaço
             
-            tem_desconto = cliente_info['torce_flamengo'] or cliente_info['assiste_one_piece'] or cliente_info['nasceu_sousa']
-            
-            if tem_desconto:
+            if cliente_info['tem_desconto']:
                 st.success("🎉 **Status:** Você tem direito a 10% de desconto em suas compras!")
                 
                 # Lista os motivos do desconto
@@ -1120,7 +1802,7 @@ def pagina_cliente():
 
         # --- 2. Exibir Histórico de Pedidos ---
         st.subheader("Meus Pedidos")
-        pedidos_cliente, desc_pedidos = db_manager.fetch_query(cadastros_queries.CONSULTAR_PEDIDOS_CLIENTE, (cliente_id,))
+        pedidos_cliente, desc_pedidos = db_manager.fetch_versionado(cadastros_queries.CONSULTAR_PEDIDOS_CLIENTE, (cliente_id,))
         
         if not pedidos_cliente:
             st.info("Você ainda não realizou nenhum pedido.")
@@ -1137,7 +1819,7 @@ def pagina_cliente():
                     st.write(f"**Status:** {row['status_pagamento']}")
                     
                     # Busca os itens detalhados do pedido
-                    itens_pedido, desc_itens = db_manager.fetch_query(vendas_queries.DETALHAR_ITENS_PEDIDO_CLIENTE, (row['venda_id'],))
+                    itens_pedido, desc_itens = db_manager.fetch_versionado(vendas_queries.DETALHAR_ITENS_PEDIDO_CLIENTE, (row['venda_id'], row['data']))
                     if itens_pedido:
                         df_itens = pd.DataFrame(itens_pedido, columns=[d[0] for d in desc_itens])
                         st.dataframe(df_itens, use_container_width=True)
@@ -1155,6 +1837,7 @@ def main():
         paginas = {
             "Cadastros": pagina_cadastros,
             "Clínico": pagina_clinico,
+            "Histórico do Paciente": pagina_historico_paciente,
             "Financeiro": pagina_financeiro,
             "Vendas": pagina_vendas,
         }
@@ -1169,6 +1852,10 @@ def main():
         pagina_cliente()
 
     st.sidebar.divider()
+    stats_cache = db_manager.cache_entidades.estatisticas()
+    st.sidebar.caption(f"Cache de registros: {stats_cache['taxa_acerto']:.0%} de acertos "
+                       f"({stats_cache['acertos']}/{stats_cache['acertos'] + stats_cache['falhas']} leituras, "
+                       f"{stats_cache['entradas']} em memória)")
     st.sidebar.info("Projeto de Banco de Dados\n\nDesenvolvido com Python, Streamlit e PostgreSQL.")
 
 # --- PONTO DE ENTRADA DA APLICAÇÃO ---
@@ -0,0 +1,67 @@
+# Conciliação em lote de pagamentos a partir de arquivos de liquidação (banco/adquirente)
+#
+# O arquivo é um CSV com cabeçalho e as colunas consulta_id, valor e data_pagamento
+# (AAAA-MM-DD ou AAAA-MM-DD HH:MM), além da coluna opcional metodo; a ordem das colunas é livre.
+# As linhas são enviadas ao banco via COPY, sem passar por Python linha a linha, e a
+# conciliação inteira (carga, quitação e relatório) acontece em uma única transação.
+
+import psycopg2
+from psycopg2 import sql
+
+from queries import financeiro_queries
+
+COLUNAS_OBRIGATORIAS = ('consulta_id', 'valor', 'data_pagamento')
+COLUNAS_OPCIONAIS = ('metodo',)
+
+
+def ler_cabecalho(arquivo, delimitador=','):
+    """Lê a primeira linha do arquivo (texto ou binário) e retorna a lista de colunas normalizada."""
+    linha = arquivo.readline()
+    if isinstance(linha, bytes):
+        linha = linha.decode('utf-8-sig')
+    colunas = [coluna.strip().strip('"').lower() for coluna in linha.lstrip('\ufeff').split(delimitador)]
+
+    faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in colunas]
+    desconhecidas = [c for c in colunas if c not in COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS]
+    if faltando or desconhecidas or len(set(colunas)) != len(colunas):
+        raise ValueError(f"Cabeçalho inválido: {', '.join(colunas)}. "
+                         f"Esperado: {', '.join(COLUNAS_OBRIGATORIAS)} e, opcionalmente, {', '.join(COLUNAS_OPCIONAIS)}.")
+    return colunas
+
+
+def conciliar_arquivo(db, arquivo, dias_antecedencia=30, delimitador=','):
+    """
+    Concilia um arquivo de liquidação (objeto de arquivo aberto, texto ou binário) com os
+    pagamentos em aberto. Retorna (linhas lidas, linhas não conciliadas, descrição das colunas),
+    ou (None, None, None) em caso de erro, sem quitar nenhum pagamento.
+    """
+    if not db.conn:
+        print("Não há conexão com o banco.")
+        return None, None, None
+
+    try:
+        colunas = ler_cabecalho(arquivo, delimitador)
+    except ValueError as e:
+        print(f"Erro ao ler o arquivo de liquidação: {e}")
+        return None, None, None
+
+    copy = sql.SQL("COPY conciliacao_extrato ({}) FROM STDIN WITH (FORMAT csv, DELIMITER {})").format(
+        sql.SQL(', ').join(map(sql.Identifier, colunas)), sql.Literal(delimitador))
+    try:
+        with db.conn.cursor() as cur:
+            cur.execute(financeiro_queries.PREPARAR_CONCILIACAO)
+            # O restante do arquivo (após o cabeçalho) é transmitido direto para o COPY
+            cur.copy_expert(copy.as_string(db.conn), arquivo)
+            linhas_lidas = cur.rowcount
+            cur.execute(financeiro_queries.CONCILIAR_EXTRATO, (dias_antecedencia,))
+            nao_conciliadas = cur.fetchall()
+            description = cur.description
+        db.conn.commit()
+        return linhas_lidas, nao_conciliadas, description
+    except psycopg2.Error as e:
+        print(f"Erro ao conciliar pagamentos: {e}")
+        db.conn.rollback()
+        return None, None, None
+    finally:
+        # A quitação acontece dentro de financeiro.conciliar_extrato, lida pelo cursor acima
+        db.invalidar_cache_tabelas('financeiro.pagamentos')
@@ -1,19 +1,210 @@
 # Classe para gerenciar a conexão e as operações
 
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 from db_config import DB_SETTINGS
+from queries import cadastros_queries, clinico_queries, financeiro_queries, manutencao_queries, vendas_queries
+
+# Leituras de um único registro que passam pelo cache de entidades: query -> (tabela, coluna da chave).
+# O primeiro parâmetro da query é o valor da chave.
+LEITURAS_ENTIDADES = {
+    cadastros_queries.SELECIONAR_PACIENTE_POR_ID: ('cadastros.pacientes', 'id'),
+    cadastros_queries.SELECIONAR_MEDICO_POR_CRM: ('cadastros.medicos', 'crm'),
+    cadastros_queries.SELECIONAR_FUNCIONARIO_POR_ID: ('cadastros.funcionarios', 'id'),
+    cadastros_queries.SELECIONAR_ESPECIALIDADE_POR_ID: ('cadastros.especialidades', 'id'),
+    cadastros_queries.SELECIONAR_PERFIL_ACESSO_POR_ID: ('cadastros.perfis_acesso', 'id'),
+    clinico_queries.SELECIONAR_CONSULTA_POR_ID: ('clinico.consultas', 'id'),
+    clinico_queries.SELECIONAR_RECEITA_POR_ID: ('clinico.receitas', 'id'),
+    financeiro_queries.SELECIONAR_PAGAMENTO_POR_ID: ('financeiro.pagamentos', 'id'),
+    vendas_queries.SELECIONAR_PRODUTO_POR_ID: ('vendas.produtos', 'id'),
+}
+
+# Tabela alterada por uma escrita e, nos ATUALIZAR_*/REMOVER_* (WHERE id = %s no fim), a chave afetada
+_TABELA_ESCRITA = re.compile(r'\b(?:UPDATE|INSERT\s+INTO|DELETE\s+FROM|TRUNCATE)\s+(\w+\.\w+)', re.IGNORECASE)
+_ESCRITA_POR_ID = re.compile(r'\bWHERE\s+id\s*=\s*%s\s*;?\s*$', re.IGNORECASE)
+
+# Tabelas ('schema.tabela') citadas em uma query, usadas para saber quais versões conferir
+_TABELA_CITADA = re.compile(r'\b(?:cadastros|clinico|financeiro|vendas)\.\w+')
+
+# Tabelas cujas linhas também mudam quando a tabela da chave é alterada: chaves estrangeiras com
+# ON DELETE CASCADE / SET NULL ou ON UPDATE CASCADE e tabelas mantidas por triggers (schema_clinica.sql)
+DEPENDENTES_ESCRITA = {
+    'cadastros.pacientes': ('clinico.consultas',),
+    'cadastros.funcionarios': ('clinico.consultas',),
+    'clinico.consultas': ('clinico.receitas', 'financeiro.pagamentos'),
+    'vendas.vendas': ('vendas.itens_venda',),
+    'vendas.categorias': ('vendas.produtos', 'vendas.catalogo_produtos'),
+    'vendas.produtos': ('vendas.estoque', 'vendas.catalogo_produtos'),
+    'vendas.estoque': ('vendas.catalogo_produtos',),
+}
+
+# Funções do banco chamadas por escritas (SELECT schema.funcao(...)) e as tabelas que elas alteram.
+# Uma função que não está aqui descarta o cache de entidades inteiro.
+FUNCOES_ESCRITA = {
+    'vendas.efetivar_compra': ('vendas.vendas', 'vendas.itens_venda', 'vendas.estoque'),
+    'vendas.reajustar_precos': ('vendas.produtos',),
+    'financeiro.preparar_conciliacao': (),
+    'financeiro.conciliar_extrato': ('financeiro.pagamentos',),
+    'clinico.recalcular_indicadores': ('clinico.indicadores_diarios',),
+    'manutencao.garantir_particoes': (),
+    'manutencao.compactar_versoes': (),
+}
+_FUNCAO_CHAMADA = re.compile(r'\b(?:SELECT|CALL)\s+(?:\*\s+FROM\s+)?(\w+\.\w+)\s*\(', re.IGNORECASE)
+
+# Nomes únicos para os cursores no servidor abertos por stream_query
+_numeros_cursores = itertools.count(1)
+
+
+class CacheEntidades:
+    """
+    Cache em memória, limitado a max_entradas e com TTL, dos registros lidos pelas queries de
+    LEITURAS_ENTIDADES, indexado por (tabela, coluna, valor). As escritas feitas pelo próprio
+    DatabaseManager descartam o registro alterado (ou a tabela inteira, quando a chave não é
+    conhecida); alterações de outros processos valem após o TTL, ou antes, se o cache for
+    registrado no InvalidadorCache.
+    """
+
+    def __init__(self, max_entradas=1000, ttl=60):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._versao = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    def obter(self, chave):
+        """Retorna (encontrado, valor, versão); a versão deve ser repassada a guardar()."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self._dados.move_to_end(chave)
+                self.acertos += 1
+                return True, entrada[1], self._versao
+            if entrada is not None:
+                del self._dados[chave]
+            self.falhas += 1
+            return False, None, self._versao
+
+    def guardar(self, chave, valor, versao):
+        with self._lock:
+            # Se algo foi invalidado durante a leitura, o valor pode já estar desatualizado
+            if versao != self._versao:
+                return
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def invalidar(self, tabela, registro_id=None):
+        """
+        Descarta os registros da tabela. Com registro_id, descarta só o registro com esse id
+        (e os lidos por outra coluna, como o CRM, cujo id não está na chave).
+        """
+        with self._lock:
+            self._versao += 1
+            for chave in list(self._dados):
+                if chave[0] == tabela and (registro_id is None or chave[1] != 'id' or chave[2] == registro_id):
+                    del self._dados[chave]
+                    self.invalidacoes += 1
+
+    def clear(self):
+        """Descarta todas as entradas (mesma interface dos caches do Streamlit)."""
+        with self._lock:
+            self._versao += 1
+            self._dados.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'entradas': len(self._dados),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'invalidacoes': self.invalidacoes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+
+class CacheVersionado:
+    """
+    Cache em memória, limitado a max_entradas, de resultados de queries indexados por (query, parâmetros)
+    e carimbados com as versões das tabelas lidas (manutencao.versoes_tabelas). Um resultado só é
+    devolvido se as versões atuais forem as mesmas do carimbo, então não há TTL nem risco de servir
+    dados alterados por outro processo.
+    """
+
+    def __init__(self, max_entradas=256):
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, versoes):
+        """Retorna (encontrado, valor) para a chave, se ela foi guardada com as mesmas versões."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None and entrada[0] == versoes:
+                self._dados.move_to_end(chave)
+                self.acertos += 1
+                return True, entrada[1]
+            self.falhas += 1
+            return False, None
+
+    def guardar(self, chave, versoes, valor):
+        with self._lock:
+            self._dados[chave] = (versoes, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+
+class InvalidacaoTabela:
+    """
+    Adaptador que expõe clear() para uma única tabela do CacheEntidades, para registro no
+    InvalidadorCache (que limpa o objeto inteiro a cada notificação da tabela).
+    """
+
+    def __init__(self, cache, tabela):
+        self.cache = cache
+        self.tabela = tabela
+
+    def clear(self):
+        self.cache.invalidar(self.tabela)
+
+    def __repr__(self):
+        return f"InvalidacaoTabela({self.tabela})"
 
 class DatabaseManager:
     """Gerencia a conexão e as operações com o banco de dados PostgreSQL."""
 
-    def __init__(self):
+    def __init__(self, settings=None, cache_entidades=True):
+        # Permite apontar para outro banco (ex: base de testes de carga); o padrão é o de db_config.py
+        self.settings = settings or DB_SETTINGS
         self.conn = None
+        # Ferramentas de medição desligam o cache para que toda leitura vá ao banco
+        self.cache_entidades = CacheEntidades() if cache_entidades else None
+        self.cache_versionado = CacheVersionado() if cache_entidades else None
+        # Com True, as escritas são desfeitas em vez de confirmadas (ex: benchmark de queries de escrita)
+        self.desfazer_escritas = False
 
     def connect(self):
         """Estabelece a conexão com o banco de dados."""
         try:
-            self.conn = psycopg2.connect(**DB_SETTINGS)
+            self.conn = psycopg2.connect(**self.settings)
             print("Conexão com o banco de dados bem-sucedida!")
         except psycopg2.OperationalError as e:
             print(f"Erro ao conectar com o banco de dados: {e}")
@@ -34,12 +225,38 @@ class DatabaseManager:
         try:
             with self.conn.cursor() as cur:
                 cur.execute(query, params or ())
-                self.conn.commit()
+                self._encerrar_escrita()
                 return True
         except psycopg2.Error as e:
             print(f"Erro ao executar query: {e}")
             self.conn.rollback()
             return False
+        finally:
+            self._invalidar_cache(query, params)
+
+    def execute_batch(self, query, lista_params, fetch=False):
+        """
+        Executa uma query com 'VALUES %s' (ex: UPDATE ... FROM (VALUES %s)) para todas as linhas
+        de lista_params em um único comando e uma única transação: ou todas as linhas são
+        aplicadas, ou nenhuma. Retorna o número de linhas afetadas (ou, com fetch=True, as linhas
+        do RETURNING), ou None em caso de erro.
+        """
+        if not self.conn:
+            print("Não há conexão com o banco.")
+            return None
+
+        try:
+            with self.conn.cursor() as cur:
+                retornadas = execute_values(cur, query, lista_params, page_size=max(len(lista_params), 1), fetch=fetch)
+                linhas_afetadas = cur.rowcount
+                self._encerrar_escrita()
+                return retornadas if fetch else linhas_afetadas
+        except psycopg2.Error as e:
+            print(f"Erro ao executar lote: {e}")
+            self.conn.rollback()
+            return None
+        finally:
+            self._invalidar_cache(query, None)
 
     def fetch_query(self, query, params=None):
         """Executa uma query SELECT e retorna os resultados E a descrição das colunas."""
@@ -47,17 +264,92 @@ class DatabaseManager:
             print("Não há conexão com o banco.")
             return None, None
 
+        entidade = LEITURAS_ENTIDADES.get(query) if self.cache_entidades and params and isinstance(query, str) else None
+        if entidade:
+            # A chave é normalizada como texto: o console passa o id digitado, e o app, inteiros
+            chave = (*entidade, str(params[0]).strip())
+            encontrado, valor, versao = self.cache_entidades.obter(chave)
+            if encontrado:
+                return list(valor[0]), valor[1]
+
         try:
             with self.conn.cursor() as cur:
                 cur.execute(query, params or ())
                 resultados = cur.fetchall()
                 description = cur.description 
+                if entidade and resultados:
+                    self.cache_entidades.guardar(chave, (resultados, description), versao)
                 return resultados, description 
         except psycopg2.Error as e:
             print(f"Erro ao buscar dados: {e}")
             self.conn.rollback()
             return None, None
     
+    def versoes_tabelas(self, tabelas):
+        """
+        Retorna as versões atuais das tabelas como uma tupla ordenada de (tabela, versão), em uma única
+        consulta à chave primária de manutencao.versoes_tabelas. Retorna None em caso de erro ou se alguma
+        tabela não for versionada (ex: uma view), caso em que o resultado não deve ser guardado em cache.
+        """
+        tabelas = sorted(set(tabelas))
+        if not tabelas:
+            return None
+        resultados, _ = self.fetch_query(manutencao_queries.VERSOES_TABELAS, (tabelas,))
+        if resultados is None or len(resultados) != len(tabelas):
+            return None
+        return tuple(sorted(resultados))
+
+    def fetch_versionado(self, query, params=None, tabelas=None):
+        """
+        Igual a fetch_query, mas guarda o resultado e, enquanto as versões das tabelas lidas não mudarem,
+        responde com ele depois de uma única leitura das versões. As tabelas são as citadas na query;
+        informe-as em tabelas quando a query ler por uma view ou função.
+        """
+        versoes = None
+        if self.cache_versionado is not None and isinstance(query, str):
+            versoes = self.versoes_tabelas(tabelas or _TABELA_CITADA.findall(query))
+        if versoes is None:
+            return self.fetch_query(query, params)
+
+        chave = (query, tuple(params or ()))
+        encontrado, valor = self.cache_versionado.obter(chave, versoes)
+        if encontrado:
+            return list(valor[0]), valor[1]
+
+        # As versões foram lidas antes dos dados: se uma alteração for confirmada entre as duas leituras,
+        # o resultado fica guardado com a versão antiga e é descartado na próxima conferência
+        resultados, description = self.fetch_query(query, params)
+        if resultados is not None:
+            self.cache_versionado.guardar(chave, versoes, (resultados, description))
+        return resultados, description
+
+    def stream_query(self, query, params=None, tamanho_lote=1000):
+        """
+        Executa uma query SELECT em um cursor no servidor e entrega o resultado em lotes de até
+        tamanho_lote linhas, gerando (description, linhas), sem carregar tudo na memória.
+        Se o consumidor parar antes do fim, o cursor é fechado. Em caso de erro, mostra a
+        mensagem e encerra sem gerar mais lotes.
+        """
+        if not self.conn:
+            print("Não há conexão com o banco.")
+            return
+
+        try:
+            with self.conn.cursor(name=f"leitura_{next(_numeros_cursores)}") as cur:
+                cur.itersize = tamanho_lote
+                cur.execute(query, params or ())
+                while True:
+                    linhas = cur.fetchmany(tamanho_lote)
+                    if not linhas:
+                        break
+                    yield cur.description, linhas
+        except psycopg2.Error as e:
+            print(f"Erro ao buscar dados: {e}")
+        finally:
+            # O cursor no servidor só existe dentro de uma transação; encerra a que ele abriu
+            if not self.conn.closed:
+                self.conn.rollback()
+
     def execute_and_fetch_one(self, query, params=None):
         """Executa uma query que modifica dados e retorna o primeiro resultado (ex: RETURNING id)."""
         if not self.conn:
@@ -68,9 +360,62 @@ class DatabaseManager:
             with self.conn.cursor() as cur:
                 cur.execute(query, params or ())
                 result = cur.fetchone() # Pega o primeiro (e único) resultado retornado
-                self.conn.commit()      # Salva a alteração no banco
+                self._encerrar_escrita() # Salva a alteração no banco
                 return result
         except psycopg2.Error as e:
             print(f"Erro ao executar e buscar dados: {e}")
             self.conn.rollback() # Desfaz a alteração em caso de erro
             return None
+        finally:
+            self._invalidar_cache(query, params)
+
+    def _encerrar_escrita(self):
+        """Confirma a transação da escrita, ou a desfaz se desfazer_escritas estiver ligado."""
+        if self.desfazer_escritas:
+            self.conn.rollback()
+        else:
+            self.conn.commit()
+
+    def invalidar_cache_tabelas(self, *tabelas):
+        """
+        Descarta do cache de entidades os registros das tabelas e das que dependem delas
+        (DEPENDENTES_ESCRITA). Use após escritas feitas fora de execute_* (ex: COPY na conciliação).
+        """
+        if self.cache_entidades:
+            for tabela in _com_dependentes(tabelas):
+                self.cache_entidades.invalidar(tabela)
+
+    def _invalidar_cache(self, query, params):
+        """Descarta do cache de entidades os registros que a escrita pode ter alterado."""
+        if not self.cache_entidades:
+            return
+        if not isinstance(query, str):
+            self.cache_entidades.clear()
+            return
+
+        tabelas = {tabela.lower() for tabela in _TABELA_ESCRITA.findall(query)}
+        for funcao in _FUNCAO_CHAMADA.findall(query):
+            if funcao.lower() not in FUNCOES_ESCRITA:
+                self.cache_entidades.clear()
+                return
+            tabelas.update(FUNCOES_ESCRITA[funcao.lower()])
+
+        registro_id = None
+        if len(tabelas) == 1 and params and _ESCRITA_POR_ID.search(query):
+            registro_id = str(params[-1]).strip()
+        for tabela in tabelas:
+            self.cache_entidades.invalidar(tabela, registro_id)
+        # Linhas de outras tabelas alteradas em cascata não têm o mesmo id: descarta as tabelas inteiras
+        for tabela in _com_dependentes(tabelas) - tabelas:
+            self.cache_entidades.invalidar(tabela)
+
+
+def _com_dependentes(tabelas):
+    """As tabelas informadas mais todas as que dependem delas, direta ou indiretamente."""
+    resultado, pendentes = set(), list(tabelas)
+    while pendentes:
+        tabela = pendentes.pop()
+        if tabela not in resultado:
+            resultado.add(tabela)
+            pendentes.extend(DEPENDENTES_ESCRITA.get(tabela, ()))
+    return resultado
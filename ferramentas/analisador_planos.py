@@ -0,0 +1,223 @@
+# Analisador de planos de execução das queries do projeto (consultor de índices).
+#
+# Executa EXPLAIN (FORMAT JSON) em todas as constantes SQL de queries/*_queries.py com
+# parâmetros representativos e aponta:
+#   - varreduras sequenciais (Seq Scan) em tabelas grandes;
+#   - chaves estrangeiras sem índice na tabela que as referencia;
+#   - ordenações que transbordam para disco (com --analyze).
+# Os planos são salvos como "golden snapshots" em planos_golden.json; execuções seguintes
+# comparam com eles e falham (código de saída 1) se algum plano regredir.
+#
+# Uso (idealmente contra uma base ampliada por ferramentas.gerador_dados):
+#   python -m ferramentas.analisador_planos --banco clinica_carga
+#   python -m ferramentas.analisador_planos --banco clinica_carga --atualizar-golden
+
+import argparse
+import json
+import os
+import sys
+
+from db_config import DB_SETTINGS
+from db_manager import DatabaseManager
+from ferramentas.catalogo_queries import listar_queries, parametros_para, eh_leitura
+
+ARQUIVO_GOLDEN = os.path.join(os.path.dirname(__file__), 'planos_golden.json')
+SCHEMAS_DO_PROJETO = ('cadastros', 'clinico', 'financeiro', 'vendas')
+
+# Tamanho estimado de cada relação e a tabela raiz de cada partição
+QUERY_TAMANHO_RELACOES = """
+    SELECT n.nspname, c.relname,
+           COALESCE(pg_partition_root(c.oid), c.oid)::regclass::text AS tabela_raiz,
+           GREATEST(c.reltuples, 0)::bigint AS linhas
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p') AND n.nspname = ANY(%s);
+"""
+
+# Chaves estrangeiras cujas colunas não são o prefixo de nenhum índice da tabela
+QUERY_FKS_SEM_INDICE = """
+    SELECT DISTINCT c.conrelid::regclass::text AS tabela,
+           (SELECT string_agg(a.attname, ', ' ORDER BY k.ord)
+              FROM unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+              JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum) AS colunas,
+           c.confrelid::regclass::text AS referencia
+    FROM pg_constraint c
+    WHERE c.contype = 'f'
+      AND c.conparentid = 0
+      AND c.connamespace::regnamespace::text = ANY(%s)
+      AND NOT EXISTS (
+          SELECT 1
+          FROM pg_index i
+          WHERE i.indrelid = c.conrelid
+            AND (string_to_array(i.indkey::text, ' ')::int2[])[1:array_length(c.conkey, 1)] @> c.conkey
+      )
+    ORDER BY 1, 2;
+"""
+
+
+def carregar_relacoes(db):
+    """Mapeia 'schema.relacao' -> (tabela raiz, linhas estimadas)."""
+    resultados, _ = db.fetch_query(QUERY_TAMANHO_RELACOES, (list(SCHEMAS_DO_PROJETO),))
+    return {f"{schema}.{nome}": (raiz, linhas) for schema, nome, raiz, linhas in resultados or []}
+
+
+def explicar(db, nome, sql, params, analyze):
+    """Retorna o plano (JSON) da query ou None em caso de erro."""
+    opcoes = "ANALYZE, BUFFERS, VERBOSE, FORMAT JSON" if analyze and eh_leitura(nome, sql) else "VERBOSE, FORMAT JSON"
+    resultado, _ = db.fetch_query(f"EXPLAIN ({opcoes}) {sql}", params)
+    # EXPLAIN nunca deve deixar efeitos: descarta a transação aberta
+    db.conn.rollback()
+    if not resultado:
+        return None
+    plano = resultado[0][0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return plano[0]['Plan']
+
+
+def normalizar_plano(no, relacoes):
+    """
+    Reduz o plano à sua "forma": tipos de nó, tabelas e índices, sem custos nem estimativas.
+    Partições são substituídas pela tabela raiz e filhos repetidos de um Append são agrupados,
+    para que o snapshot não mude apenas porque uma nova partição mensal foi criada.
+    """
+    forma = {'no': no['Node Type']}
+    if 'Relation Name' in no:
+        chave = f"{no.get('Schema', 'public')}.{no['Relation Name']}"
+        forma['tabela'] = relacoes.get(chave, (chave, 0))[0]
+    if 'Index Name' in no:
+        forma['indice'] = no['Index Name']
+    if 'Join Type' in no:
+        forma['juncao'] = no['Join Type']
+
+    filhos = [normalizar_plano(filho, relacoes) for filho in no.get('Plans', [])]
+    if no['Node Type'] in ('Append', 'Merge Append'):
+        unicos = {json.dumps(filho, sort_keys=True): filho for filho in filhos}
+        filhos = [unicos[chave] for chave in sorted(unicos)]
+    if filhos:
+        forma['filhos'] = filhos
+    return forma
+
+
+def diagnosticar(no, relacoes, limiar_linhas, achados=None):
+    """Percorre o plano bruto e coleta varreduras sequenciais grandes, índices usados e ordenações em disco."""
+    if achados is None:
+        achados = {'seq_scans_grandes': set(), 'indices': set(), 'sorts_em_disco': 0}
+
+    if no['Node Type'] == 'Seq Scan':
+        chave = f"{no.get('Schema', 'public')}.{no['Relation Name']}"
+        raiz, linhas = relacoes.get(chave, (chave, 0))
+        if linhas >= limiar_linhas:
+            achados['seq_scans_grandes'].add(raiz)
+    if 'Index Name' in no:
+        achados['indices'].add(no['Index Name'])
+    if no['Node Type'] == 'Sort' and (no.get('Sort Space Type') == 'Disk' or 'external' in no.get('Sort Method', '')):
+        achados['sorts_em_disco'] += 1
+
+    for filho in no.get('Plans', []):
+        diagnosticar(filho, relacoes, limiar_linhas, achados)
+    return achados
+
+
+def comparar_com_golden(atual, golden):
+    """Retorna (regressões, mudanças) entre o snapshot atual e o golden de uma query."""
+    regressoes, mudancas = [], []
+    novos_seq = set(atual['seq_scans_grandes']) - set(golden['seq_scans_grandes'])
+    if novos_seq:
+        regressoes.append(f"novo Seq Scan em tabela grande: {', '.join(sorted(novos_seq))}")
+    indices_perdidos = set(golden['indices']) - set(atual['indices'])
+    if indices_perdidos:
+        regressoes.append(f"deixou de usar o(s) índice(s): {', '.join(sorted(indices_perdidos))}")
+    if atual['sorts_em_disco'] > golden['sorts_em_disco']:
+        regressoes.append("ordenação passou a transbordar para disco")
+    if not regressoes and atual['forma'] != golden['forma']:
+        mudancas.append("forma do plano mudou (sem regressão detectada)")
+    return regressoes, mudancas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analisa os planos de execução das queries do projeto.")
+    parser.add_argument('--banco', help="Nome do banco a analisar (padrão: o de db_config.py).")
+    parser.add_argument('--modulo', action='append', help="Restringe a um módulo (cadastros, clinico, financeiro, vendas).")
+    parser.add_argument('--limiar-linhas', type=int, default=10000,
+                        help="Tamanho a partir do qual um Seq Scan é sinalizado (padrão: 10000 linhas).")
+    parser.add_argument('--analyze', action='store_true',
+                        help="Usa EXPLAIN ANALYZE nas queries de leitura para detectar ordenações em disco.")
+    parser.add_argument('--atualizar-golden', action='store_true',
+                        help="Grava os planos atuais como novos snapshots de referência.")
+    args = parser.parse_args()
+
+    db = DatabaseManager(dict(DB_SETTINGS, dbname=args.banco) if args.banco else None)
+    db.connect()
+    if not db.conn:
+        sys.exit(2)
+
+    relacoes = carregar_relacoes(db)
+    golden = {}
+    if os.path.exists(ARQUIVO_GOLDEN):
+        with open(ARQUIVO_GOLDEN, encoding='utf-8') as f:
+            golden = json.load(f)
+
+    snapshots = {}
+    total_regressoes = 0
+    print(f"\n--- PLANOS DE EXECUÇÃO (limiar: {args.limiar_linhas} linhas) ---")
+    for modulo, nome, sql in listar_queries(args.modulo):
+        chave = f"{modulo}.{nome}"
+        params = parametros_para(nome, sql)
+        if params is None:
+            print(f"[AVISO] {chave}: sem parâmetros de exemplo em catalogo_queries.PARAMETROS_EXEMPLO, ignorada.")
+            continue
+
+        plano = explicar(db, nome, sql, params, args.analyze)
+        if plano is None:
+            print(f"[ERRO]  {chave}: não foi possível obter o plano.")
+            continue
+
+        achados = diagnosticar(plano, relacoes, args.limiar_linhas)
+        snapshot = {
+            'forma': normalizar_plano(plano, relacoes),
+            'seq_scans_grandes': sorted(achados['seq_scans_grandes']),
+            'indices': sorted(achados['indices']),
+            'sorts_em_disco': achados['sorts_em_disco'],
+        }
+        snapshots[chave] = snapshot
+
+        alertas = []
+        if snapshot['seq_scans_grandes']:
+            alertas.append(f"Seq Scan em {', '.join(snapshot['seq_scans_grandes'])}")
+        if snapshot['sorts_em_disco']:
+            alertas.append(f"{snapshot['sorts_em_disco']} ordenação(ões) em disco")
+        indices = ', '.join(snapshot['indices']) or 'nenhum índice'
+        print(f"{'[ALERTA]' if alertas else '[OK]    '} {chave}: {'; '.join(alertas) or indices}")
+
+        if not args.atualizar_golden and chave in golden:
+            regressoes, mudancas = comparar_com_golden(snapshot, golden[chave])
+            for r in regressoes:
+                print(f"    REGRESSÃO: {r}")
+            for m in mudancas:
+                print(f"    {m}")
+            total_regressoes += len(regressoes)
+
+    print("\n--- CHAVES ESTRANGEIRAS SEM ÍNDICE ---")
+    fks, _ = db.fetch_query(QUERY_FKS_SEM_INDICE, (list(SCHEMAS_DO_PROJETO),))
+    if fks:
+        for tabela, colunas, referencia in fks:
+            print(f"[ALERTA] {tabela} ({colunas}) -> {referencia}: crie um índice em ({colunas}).")
+    else:
+        print("Todas as chaves estrangeiras possuem índice.")
+    db.disconnect()
+
+    if args.atualizar_golden:
+        golden.update(snapshots)
+        with open(ARQUIVO_GOLDEN, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\nSnapshots gravados em {ARQUIVO_GOLDEN} ({len(snapshots)} queries).")
+    elif total_regressoes:
+        print(f"\n{total_regressoes} regressão(ões) de plano encontrada(s).")
+        sys.exit(1)
+    else:
+        print("\nNenhuma regressão de plano em relação aos snapshots.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# Suíte de microbenchmarks das queries do projeto.
+#
+# Executa cada constante SQL de queries/*_queries.py através do DatabaseManager, com os
+# parâmetros de catalogo_queries, e mede por query:
+#   - distribuição de latência (p50, p95, p99, máx) em várias iterações;
+#   - linhas por segundo;
+#   - pico de memória Python alocado durante uma chamada (tracemalloc).
+# Os resultados são comparados com as baselines de baselines_benchmark.json, separadas por
+# banco, e o processo termina com código 1 se alguma query ficar mais lenta que o limiar ou
+# passar a retornar um resultado diferente.
+#
+# Queries de escrita (INSERT/UPDATE/DELETE e procedures) só rodam com --incluir-escrita e sempre
+# dentro de uma transação desfeita ao final, sem alterar o banco.
+#
+# Uso (bancos gerados por ferramentas.gerador_dados com semente fixa, em escalas crescentes):
+#   python -m ferramentas.benchmark_queries --bancos clinica_10k clinica_1m --atualizar-baseline
+#   python -m ferramentas.benchmark_queries --bancos clinica_10k clinica_1m --limiar 0.2
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+from db_config import DB_SETTINGS
+from db_manager import DatabaseManager
+from ferramentas.catalogo_queries import listar_queries, parametros_para, eh_leitura
+
+ARQUIVO_BASELINES = os.path.join(os.path.dirname(__file__), 'baselines_benchmark.json')
+
+
+def percentil(valores_ordenados, p):
+    """Percentil (0-100) por interpolação linear de uma lista já ordenada."""
+    if len(valores_ordenados) == 1:
+        return valores_ordenados[0]
+    posicao = (len(valores_ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[inferior] + (valores_ordenados[superior] - valores_ordenados[inferior]) * (posicao - inferior)
+
+
+def assinatura_resultado(resultados):
+    """Hash do resultado independente da ordem das linhas (queries sem ORDER BY não têm ordem garantida)."""
+    linhas = sorted(repr(linha) for linha in resultados)
+    return hashlib.sha1('\n'.join(linhas).encode('utf-8')).hexdigest()[:16]
+
+
+def executar_leitura(db, sql, params):
+    """Executa uma query de leitura pelo DatabaseManager e devolve as linhas (None em caso de erro)."""
+    resultados, _ = db.fetch_query(sql, params)
+    # Encerra a transação de leitura aberta pelo psycopg2 para não acumular snapshots
+    if db.conn:
+        db.conn.rollback()
+    return resultados
+
+
+def executar_escrita(db, sql, params):
+    """
+    Executa uma query de escrita pelo DatabaseManager, como o app, com as escritas desfeitas em vez de
+    confirmadas (desfazer_escritas). Devolve a linha retornada (RETURNING ou função) ou o sucesso.
+    """
+    if re.search(r'\bRETURNING\b', sql, re.IGNORECASE) or sql.lstrip().upper().startswith('SELECT'):
+        linha = db.execute_and_fetch_one(sql, params)
+        return None if linha is None else [linha]
+    return [(True,)] if db.execute_query(sql, params) else None
+
+
+def medir_query(db, nome, sql, params, iteracoes, aquecimento):
+    """Executa a query várias vezes e retorna as métricas, ou None se ela falhar."""
+    executar = executar_leitura if eh_leitura(nome, sql) else executar_escrita
+
+    resultados = None
+    for _ in range(aquecimento):
+        resultados = executar(db, sql, params)
+        if resultados is None:
+            return None
+
+    tempos = []
+    for _ in range(iteracoes):
+        inicio = time.perf_counter()
+        resultados = executar(db, sql, params)
+        tempos.append(time.perf_counter() - inicio)
+        if resultados is None:
+            return None
+
+    # A memória é medida em uma chamada separada: o tracemalloc distorce a latência
+    tracemalloc.start()
+    executar(db, sql, params)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tempos.sort()
+    media = statistics.fmean(tempos)
+    return {
+        'p50_ms': round(percentil(tempos, 50) * 1000, 3),
+        'p95_ms': round(percentil(tempos, 95) * 1000, 3),
+        'p99_ms': round(percentil(tempos, 99) * 1000, 3),
+        'max_ms': round(tempos[-1] * 1000, 3),
+        'linhas': len(resultados),
+        'linhas_por_s': round(len(resultados) / media, 1) if media else 0.0,
+        'pico_memoria_kb': round(pico / 1024, 1),
+        'assinatura': assinatura_resultado(resultados),
+    }
+
+
+def comparar_com_baseline(atual, baseline, limiar):
+    """Retorna a lista de regressões da medição atual em relação à baseline."""
+    regressoes = []
+    for metrica in ('p50_ms', 'p95_ms'):
+        # Ignora variações abaixo de 0,5 ms, que são ruído em queries muito rápidas
+        if atual[metrica] > baseline[metrica] * (1 + limiar) and atual[metrica] - baseline[metrica] > 0.5:
+            regressoes.append(f"{metrica} {baseline[metrica]:.2f} -> {atual[metrica]:.2f}")
+    if atual['pico_memoria_kb'] > baseline['pico_memoria_kb'] * (1 + limiar) + 64:
+        regressoes.append(f"memória {baseline['pico_memoria_kb']:.0f} KB -> {atual['pico_memoria_kb']:.0f} KB")
+    if atual['assinatura'] != baseline['assinatura']:
+        regressoes.append(f"resultado mudou ({baseline['linhas']} -> {atual['linhas']} linhas)")
+    return regressoes
+
+
+def executar_suite(banco, args, baselines):
+    """Roda a suíte em um banco e devolve (medições, número de regressões)."""
+    db = DatabaseManager(dict(DB_SETTINGS, dbname=banco) if banco else None, cache_entidades=False)
+    db.desfazer_escritas = True
+    db.connect()
+    if not db.conn:
+        return {}, 0
+
+    rotulo = banco or DB_SETTINGS['dbname']
+    baseline_banco = baselines.get(rotulo, {})
+    medicoes, total_regressoes = {}, 0
+
+    print(f"\n--- BENCHMARK: {rotulo} ({args.iteracoes} iterações, limiar {args.limiar:.0%}) ---")
+    print(f"{'query':<55} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'linhas/s':>12} {'pico KB':>9}")
+    for modulo, nome, sql in listar_queries(args.modulo):
+        chave = f"{modulo}.{nome}"
+        params = parametros_para(nome, sql)
+        if params is None:
+            print(f"[AVISO] {chave}: sem parâmetros de exemplo em catalogo_queries.PARAMETROS_EXEMPLO, ignorada.")
+            continue
+        if not eh_leitura(nome, sql) and not args.incluir_escrita:
+            continue
+
+        metricas = medir_query(db, nome, sql, params, args.iteracoes, args.aquecimento)
+        if metricas is None:
+            print(f"[ERRO]  {chave}: a query falhou, sem medição.")
+            continue
+        medicoes[chave] = metricas
+        print(f"{chave:<55} {metricas['p50_ms']:>9.2f} {metricas['p95_ms']:>9.2f} {metricas['p99_ms']:>9.2f} "
+              f"{metricas['linhas_por_s']:>12,.0f} {metricas['pico_memoria_kb']:>9.1f}")
+
+        if not args.atualizar_baseline and chave in baseline_banco:
+            for r in comparar_com_baseline(metricas, baseline_banco[chave], args.limiar):
+                print(f"    REGRESSÃO: {r}")
+                total_regressoes += 1
+
+    db.disconnect()
+    return medicoes, total_regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks das queries do projeto.")
+    parser.add_argument('--bancos', nargs='+', default=[None],
+                        help="Bancos a medir, do menor para o maior (padrão: o de db_config.py).")
+    parser.add_argument('--modulo', action='append', help="Restringe a um módulo (cadastros, clinico, financeiro, vendas).")
+    parser.add_argument('--iteracoes', type=int, default=30, help="Execuções medidas por query (padrão: 30).")
+    parser.add_argument('--aquecimento', type=int, default=3, help="Execuções descartadas antes da medição (padrão: 3).")
+    parser.add_argument('--limiar', type=float, default=0.20,
+                        help="Aumento relativo de latência/memória considerado regressão (padrão: 0.20 = 20%%).")
+    parser.add_argument('--incluir-escrita', action='store_true',
+                        help="Mede também as queries de escrita (sempre desfeitas com ROLLBACK).")
+    parser.add_argument('--atualizar-baseline', action='store_true',
+                        help="Grava as medições atuais como novas baselines.")
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(ARQUIVO_BASELINES):
+        with open(ARQUIVO_BASELINES, encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    total_regressoes = 0
+    for banco in args.bancos:
+        medicoes, regressoes = executar_suite(banco, args, baselines)
+        total_regressoes += regressoes
+        if args.atualizar_baseline and medicoes:
+            baselines.setdefault(banco or DB_SETTINGS['dbname'], {}).update(medicoes)
+
+    if args.atualizar_baseline:
+        with open(ARQUIVO_BASELINES, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\nBaselines gravadas em {ARQUIVO_BASELINES}.")
+    elif total_regressoes:
+        print(f"\n{total_regressoes} regressão(ões) de desempenho encontrada(s).")
+        sys.exit(1)
+    else:
+        print("\nNenhuma regressão de desempenho em relação às baselines.")
+
+
+if __name__ == "__main__":
+    main()
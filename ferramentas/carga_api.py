@@ -0,0 +1,103 @@
+# Teste de carga local da API HTTP (api.py)
+#
+# Abre N conexões HTTP/1.1 persistentes e, durante o tempo pedido, cada uma repete requisições GET
+# sorteadas entre as rotas informadas. Ao final, mostra requisições por segundo, latências
+# (p50/p95/p99) e erros. Usa apenas a biblioteca padrão, para não competir com o servidor por CPU
+# mais do que o necessário; rode-o em outro terminal, na mesma máquina.
+#
+#   python api.py --workers 4
+#   python -m ferramentas.carga_api --url http://localhost:8000 --conexoes 64 --segundos 30
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+ROTAS_PADRAO = [
+    '/pacientes/1',
+    '/pacientes?limite=50',
+    '/medicos?limite=50',
+    '/produtos?limite=50',
+    '/produtos/busca?nome=vita',
+    '/pagamentos/1',
+    '/consultas?inicio=2025-09-01&fim=2025-10-31&limite=50',
+]
+
+
+async def requisitar(leitor, escritor, host, rota):
+    """Envia um GET na conexão aberta e lê a resposta inteira; retorna o status HTTP."""
+    escritor.write(f"GET {rota} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode())
+    await escritor.drain()
+
+    status = int((await leitor.readline()).split()[1])
+    cabecalhos = {}
+    while (linha := await leitor.readline()) not in (b'\r\n', b''):
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+    if 'content-length' in cabecalhos:
+        await leitor.readexactly(int(cabecalhos['content-length']))
+    elif cabecalhos.get('transfer-encoding') == 'chunked':
+        while (tamanho := int((await leitor.readline()).strip(), 16)) > 0:
+            await leitor.readexactly(tamanho + 2)
+        await leitor.readline()
+    return status
+
+
+async def conexao(host, porta, rotas, fim, latencias, erros):
+    leitor = escritor = None
+    while time.perf_counter() < fim:
+        rota = random.choice(rotas)
+        inicio = time.perf_counter()
+        try:
+            if escritor is None:
+                leitor, escritor = await asyncio.open_connection(host, porta)
+            status = await requisitar(leitor, escritor, f"{host}:{porta}", rota)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+            erros[type(e).__name__] += 1
+            if escritor is not None:
+                escritor.close()
+            leitor = escritor = None
+            continue
+        latencias.append(time.perf_counter() - inicio)
+        if status >= 400:
+            erros[f"HTTP {status}"] += 1
+    if escritor is not None:
+        escritor.close()
+
+
+async def executar(args):
+    url = urlsplit(args.url)
+    rotas = args.rota or ROTAS_PADRAO
+    latencias, erros = [], Counter()
+    inicio = time.perf_counter()
+    fim = inicio + args.segundos
+    await asyncio.gather(*(conexao(url.hostname, url.port or 80, rotas, fim, latencias, erros)
+                           for _ in range(args.conexoes)))
+    duracao = time.perf_counter() - inicio
+
+    print(f"{len(latencias)} requisições em {duracao:.1f}s com {args.conexoes} conexões: "
+          f"{len(latencias) / duracao:,.0f} req/s")
+    if len(latencias) >= 2:
+        quantis = statistics.quantiles(latencias, n=100)
+        print(f"latência (ms): p50 {quantis[49] * 1000:.2f} | p95 {quantis[94] * 1000:.2f} | p99 {quantis[98] * 1000:.2f}")
+    if erros:
+        print("erros: " + ", ".join(f"{tipo}: {n}" for tipo, n in erros.most_common()))
+    return 1 if erros else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga local da API HTTP.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="Endereço da API (padrão: http://127.0.0.1:8000).")
+    parser.add_argument('--conexoes', type=int, default=32, help="Conexões simultâneas (padrão: 32).")
+    parser.add_argument('--segundos', type=float, default=10, help="Duração do teste (padrão: 10).")
+    parser.add_argument('--rota', action='append',
+                        help="Rota GET a exercitar (pode repetir; padrão: uma mistura de leituras da API).")
+    raise SystemExit(asyncio.run(executar(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+# Teste de carga do app Streamlit (app.py) sem navegador
+#
+# Simula N usuários com sessões abertas ao mesmo tempo em um único processo, cada um com a sua sessão
+# do app (AppTest do Streamlit), repetindo um roteiro de interações até o fim do tempo pedido. Os roteiros
+# cobrem a pesquisa de pacientes, o carrinho e a efetivação de uma venda, o dashboard de vendas e o portal
+# do cliente. Ao final, mostra por página e interação:
+#   - latência de cada recarga do script (p50/p95/p99);
+#   - comandos SQL enviados ao banco por recarga (contados no cursor do psycopg2);
+#   - erros (exceções exibidas pelo app ou widgets que não apareceram);
+# e o crescimento da memória do processo por sessão aberta. Todas as sessões dividem o mesmo processo,
+# conexão e caches, como no `streamlit run`.
+#
+# Limitação: o AppTest não pode rodar recargas em paralelo (cada at.run() troca o Runtime global do
+# Streamlit e altera opções de configuração do processo), então as sessões se revezam, uma recarga por
+# vez, em rodízio. As latências medem o custo de cada recarga com N sessões abertas e caches
+# compartilhados, não a disputa entre recargas simultâneas; recargas/s é a vazão de um processo
+# atendendo uma recarga por vez. Para medir concorrência real, rode vários processos desta ferramenta
+# ou use o app com `streamlit run` e um gerador de carga HTTP/WebSocket.
+#
+# O roteiro "venda" efetiva compras de verdade; use um banco de testes (ferramentas.gerador_dados)
+# ou --somente-leitura, que esvazia o carrinho em vez de finalizar a venda.
+#
+#   python -m ferramentas.carga_app --banco clinica_carga --usuarios 10 --segundos 60
+#   python -m ferramentas.carga_app --banco clinica_carga --cenario portal --cenario dashboard --usuarios 30
+
+import argparse
+import os
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+
+import psycopg2.extensions
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.testing.v1 import AppTest
+
+from db_config import DB_SETTINGS
+from db_manager import DatabaseManager
+
+ARQUIVO_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# Chave do session_state em que cada sessão acumula os comandos SQL que enviou
+CHAVE_COMANDOS = '_carga_comandos_sql'
+
+# Rótulos dos widgets usados pelos roteiros (os mesmos do app.py)
+RADIO_MODO = "Selecione o modo de visualização:"
+RADIO_MODULOS = "Navegue pelos Módulos"
+TERMOS_PESQUISA = ['Maria', 'José', 'Ana', 'Silva', 'Souza', 'Lima', 'Oliveira', 'Santos']
+
+
+class CursorContado(psycopg2.extensions.cursor):
+    """Cursor que conta cada comando na sessão do Streamlit que o executou."""
+
+    def execute(self, query, vars=None):
+        contar_comando()
+        return super().execute(query, vars)
+
+
+_comandos_sem_sessao = Counter()
+
+def contar_comando():
+    # Threads sem contexto do Streamlit (ouvinte de notificações, pools de threads) ficam fora das sessões
+    if get_script_run_ctx(suppress_warning=True) is None:
+        _comandos_sem_sessao['comandos'] += 1
+        return
+    st.session_state[CHAVE_COMANDOS] = st.session_state.get(CHAVE_COMANDOS, 0) + 1
+
+def instrumentar_conexoes():
+    """Faz toda conexão aberta pelo DatabaseManager (inclusive a do app) usar o CursorContado."""
+    conectar_original = DatabaseManager.connect
+
+    def conectar(self):
+        conectar_original(self)
+        if self.conn:
+            self.conn.cursor_factory = CursorContado
+
+    DatabaseManager.connect = conectar
+
+
+def memoria_processo():
+    """Memória residente atual do processo, em bytes (no Linux); nos demais sistemas, o pico."""
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource  # indisponível no Windows
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# --- Roteiros ---
+
+class WidgetAusente(Exception):
+    pass
+
+def por_rotulo(widgets, rotulo, obrigatorio=True):
+    """Primeiro widget da lista com o rótulo informado."""
+    for widget in widgets:
+        if widget.label == rotulo:
+            return widget
+    if obrigatorio:
+        raise WidgetAusente(rotulo)
+    return None
+
+def opcoes_validas(widget):
+    return [opcao for opcao in widget.options if "Nenhum" not in opcao and "Selecione" not in opcao]
+
+def abrir_modulo(modulo):
+    def preparar(at, sessao):
+        por_rotulo(at.radio, RADIO_MODO).set_value("Funcionário")
+        modulos = por_rotulo(at.radio, RADIO_MODULOS, obrigatorio=False)
+        if modulos is not None:
+            modulos.set_value(modulo)
+        return True
+    return preparar
+
+def pesquisar_paciente(at, sessao):
+    at.text_input(key="search_pac").set_value(sessao.aleatorio.choice(TERMOS_PESQUISA))
+    return True
+
+def limpar_pesquisa(at, sessao):
+    at.text_input(key="search_pac").set_value("")
+    return True
+
+def escolher_produto(at, sessao):
+    seletor = por_rotulo(at.selectbox, "Adicionar Produto")
+    opcoes = opcoes_validas(seletor)
+    if not opcoes:
+        return False
+    seletor.set_value(sessao.aleatorio.choice(opcoes))
+    return True
+
+def adicionar_ao_carrinho(at, sessao):
+    # O botão só aparece quando o produto escolhido tem estoque
+    botao = por_rotulo(at.button, "Adicionar ao Carrinho", obrigatorio=False)
+    if botao is None:
+        return False
+    botao.click()
+    return True
+
+def finalizar_carrinho(at, sessao):
+    if sessao.somente_leitura:
+        botao = por_rotulo(at.button, "Limpar Carrinho", obrigatorio=False)
+    else:
+        botao = por_rotulo(at.button, "Efetivar Compra", obrigatorio=False)
+        if botao is not None:
+            por_rotulo(at.selectbox, "Forma de Pagamento").set_value('PIX')
+    if botao is None:
+        return False
+    botao.click()
+    return True
+
+def filtrar(rotulo):
+    def preparar(at, sessao):
+        filtro = por_rotulo(at.multiselect, rotulo, obrigatorio=False)
+        if filtro is None or not filtro.options:
+            return False  # sem vendas, o dashboard não mostra filtros
+        quantidade = sessao.aleatorio.randint(1, len(filtro.options))
+        filtro.set_value(sessao.aleatorio.sample(list(filtro.options), quantidade))
+        return True
+    return preparar
+
+def abrir_portal(at, sessao):
+    por_rotulo(at.radio, RADIO_MODO).set_value("Cliente")
+    return True
+
+def selecionar_cliente(at, sessao):
+    seletor = por_rotulo(at.selectbox, "Para começar, selecione seu nome na lista:")
+    opcoes = opcoes_validas(seletor)
+    if not opcoes:
+        return False
+    seletor.set_value(sessao.aleatorio.choice(opcoes))
+    return True
+
+# Roteiro -> (página do app, [(interação, função que prepara os widgets antes da recarga)]).
+# A função retorna False quando a interação não se aplica ao estado atual (ex: produto sem estoque).
+CENARIOS = {
+    'pacientes': ('Cadastros', [
+        ('abrir', abrir_modulo('Cadastros')),
+        ('pesquisar', pesquisar_paciente),
+        ('limpar pesquisa', limpar_pesquisa),
+    ]),
+    'venda': ('Vendas', [
+        ('abrir', abrir_modulo('Vendas')),
+        ('escolher produto', escolher_produto),
+        ('adicionar ao carrinho', adicionar_ao_carrinho),
+        ('finalizar', finalizar_carrinho),
+    ]),
+    'dashboard': ('Vendas', [
+        ('abrir', abrir_modulo('Vendas')),
+        ('filtrar mês', filtrar("Filtrar por Mês:")),
+        ('filtrar vendedor', filtrar("Filtrar por Vendedor:")),
+    ]),
+    'portal': ('Portal do Cliente', [
+        ('abrir', abrir_portal),
+        ('selecionar cliente', selecionar_cliente),
+        ('trocar de cliente', selecionar_cliente),
+    ]),
+}
+
+
+# --- Execução ---
+
+class Sessao:
+    """Um usuário simulado: a sua sessão do app e as medições de cada recarga."""
+
+    def __init__(self, cenario, semente, somente_leitura, timeout):
+        self.cenario = cenario
+        self.aleatorio = random.Random(semente)
+        self.somente_leitura = somente_leitura
+        self.at = AppTest.from_file(ARQUIVO_APP, default_timeout=timeout)
+        # (página, interação) -> listas de latências e de comandos por recarga
+        self.latencias = defaultdict(list)
+        self.comandos = defaultdict(list)
+        self.erros = Counter()
+
+    def comandos_acumulados(self):
+        try:
+            return self.at.session_state[CHAVE_COMANDOS]
+        except KeyError:
+            return 0
+
+    def recarregar(self, pagina, interacao):
+        antes = self.comandos_acumulados()
+        inicio = time.perf_counter()
+        self.at.run()
+        self.latencias[pagina, interacao].append(time.perf_counter() - inicio)
+        self.comandos[pagina, interacao].append(self.comandos_acumulados() - antes)
+        if self.at.exception:
+            self.erros[f"{pagina} / {interacao}: {self.at.exception[0].message.splitlines()[0]}"] += 1
+
+    def passos(self):
+        """Gerador que executa o roteiro em ciclo, parando após cada interação para a próxima sessão."""
+        self.recarregar('Sessão', 'primeira carga')
+        yield
+        pagina, passos = CENARIOS[self.cenario]
+        while True:
+            for interacao, preparar in passos:
+                try:
+                    aplicavel = preparar(self.at, self)
+                except WidgetAusente as e:
+                    self.erros[f"{pagina} / {interacao}: widget '{e}' não encontrado"] += 1
+                    aplicavel = False
+                if aplicavel:
+                    self.recarregar(pagina, interacao)
+                yield
+
+
+def executar_rodizio(sessoes, fim, falhas):
+    """Alterna as sessões, uma interação de cada vez, até o fim do tempo (ver a limitação no topo)."""
+    ativas = [sessao.passos() for sessao in sessoes]
+    while ativas and time.perf_counter() < fim:
+        for passos in list(ativas):
+            try:
+                next(passos)
+            except Exception as e:  # o relatório deve sair mesmo se um usuário simulado parar
+                falhas[type(e).__name__] += 1
+                ativas.remove(passos)
+            if time.perf_counter() >= fim:
+                break
+
+
+def formatar_ms(segundos):
+    return f"{segundos * 1000:8.1f}"
+
+def relatorio(sessoes, duracao, memoria_inicial, memoria_final, falhas):
+    latencias, comandos, erros = defaultdict(list), defaultdict(list), Counter()
+    for sessao in sessoes:
+        for chave, valores in sessao.latencias.items():
+            latencias[chave].extend(valores)
+            comandos[chave].extend(sessao.comandos[chave])
+        erros.update(sessao.erros)
+
+    total = sum(len(valores) for valores in latencias.values())
+    print(f"{total} recargas em {duracao:.1f}s com {len(sessoes)} usuários: {total / duracao:,.1f} recargas/s")
+    print(f"{'página / interação':<42} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL/recarga':>11}")
+    for (pagina, interacao), valores in sorted(latencias.items()):
+        if len(valores) >= 2:
+            quantis = statistics.quantiles(valores, n=100)
+            p50, p95, p99 = quantis[49], quantis[94], quantis[98]
+        else:
+            p50 = p95 = p99 = valores[0]
+        print(f"{pagina + ' / ' + interacao:<42} {len(valores):>6} {formatar_ms(p50)} {formatar_ms(p95)} "
+              f"{formatar_ms(p99)} {statistics.mean(comandos[pagina, interacao]):>11.1f}")
+    if _comandos_sem_sessao['comandos']:
+        print(f"comandos SQL fora das sessões (threads do app e do ouvinte): {_comandos_sem_sessao['comandos']}")
+
+    crescimento = memoria_final - memoria_inicial
+    print(f"memória do processo: {memoria_inicial / 2**20:.0f} MiB -> {memoria_final / 2**20:.0f} MiB "
+          f"({crescimento / max(len(sessoes), 1) / 2**20:+.1f} MiB por sessão)")
+    erros.update(falhas)
+    if erros:
+        print("erros: " + ", ".join(f"{tipo}: {n}" for tipo, n in erros.most_common()))
+    return 1 if erros else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do app Streamlit com usuários simulados.")
+    parser.add_argument('--banco', help="Banco a usar (padrão: o de db_config.py).")
+    parser.add_argument('--usuarios', type=int, default=5, help="Sessões abertas ao mesmo tempo (padrão: 5).")
+    parser.add_argument('--segundos', type=float, default=30, help="Duração do teste (padrão: 30).")
+    parser.add_argument('--cenario', action='append', choices=sorted(CENARIOS),
+                        help="Roteiro a simular (pode repetir; os usuários são divididos entre eles; padrão: todos).")
+    parser.add_argument('--somente-leitura', action='store_true',
+                        help="No roteiro de venda, esvazia o carrinho em vez de efetivar a compra.")
+    parser.add_argument('--timeout', type=float, default=60, help="Tempo máximo de uma recarga, em segundos (padrão: 60).")
+    parser.add_argument('--semente', type=int, default=42, help="Semente das escolhas dos usuários (padrão: 42).")
+    args = parser.parse_args()
+
+    if args.usuarios < 1:
+        parser.error("--usuarios deve ser pelo menos 1.")
+    if args.banco:
+        # O app lê a conexão de db_config.py; a alteração vale para todas as sessões deste processo
+        DB_SETTINGS['dbname'] = args.banco
+    instrumentar_conexoes()
+
+    cenarios = args.cenario or sorted(CENARIOS)
+    sessoes = [Sessao(cenarios[i % len(cenarios)], args.semente + i, args.somente_leitura, args.timeout)
+               for i in range(args.usuarios)]
+
+    # A primeira recarga do processo abre a conexão e preenche os caches compartilhados; fica fora da medição
+    AppTest.from_file(ARQUIVO_APP, default_timeout=args.timeout).run()
+    memoria_inicial = memoria_processo()
+
+    falhas = Counter()
+    inicio = time.perf_counter()
+    fim = inicio + args.segundos
+    executar_rodizio(sessoes, fim, falhas)
+    duracao = time.perf_counter() - inicio
+
+    # As sessões continuam vivas até aqui, como abas abertas no navegador
+    raise SystemExit(relatorio(sessoes, duracao, memoria_inicial, memoria_processo(), falhas))
+
+
+if __name__ == "__main__":
+    main()
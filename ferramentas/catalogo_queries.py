@@ -0,0 +1,147 @@
+# Catálogo das queries do projeto, compartilhado pelas ferramentas de análise de desempenho.
+# Descobre todas as constantes SQL dos módulos em queries/ e associa a cada uma
+# parâmetros representativos para que possam ser executadas (ou explicadas) automaticamente.
+
+import json
+from datetime import datetime, timedelta
+
+from queries import cadastros_queries, clinico_queries, financeiro_queries, vendas_queries
+
+MODULOS_QUERIES = {
+    'cadastros': cadastros_queries,
+    'clinico': clinico_queries,
+    'financeiro': financeiro_queries,
+    'vendas': vendas_queries,
+}
+
+_AGORA = datetime(2025, 10, 15, 10, 0)
+
+# Parâmetros representativos de cada query. Os IDs apontam para registros que existem tanto
+# nos dados de exemplo de schema_clinica.sql quanto nas bases geradas por ferramentas.gerador_dados.
+# Queries sem parâmetros não precisam estar aqui.
+PARAMETROS_EXEMPLO = {
+    # --- cadastros: pacientes ---
+    'INSERIR_PACIENTE': ('Paciente Benchmark', 'F', 'benchmark@clinica.com', '99999999999', '83900000000',
+                         'Rua A', '1', None, 'Centro', 'João Pessoa', 'PB', '58000000', False, True, False),
+    'ATUALIZAR_TELEFONE_PACIENTE': ('83911112222', 1),
+    # Lotes (VALUES %s): uma linha de exemplo, que o psycopg2 adapta como (id, ..., valores originais)
+    'ATUALIZAR_TELEFONES_PACIENTES_EM_LOTE': ((1, '83911112222', '83900000000'),),
+    'PESQUISAR_PACIENTE_POR_NOME': ('%Silva%',),
+    'REMOVER_PACIENTE': (1,),
+    'SELECIONAR_PACIENTE_POR_ID': (1,),
+    'LISTAR_PACIENTES_PAGINA': (0, 100),
+    'CONSULTAR_DADOS_CLIENTE': (1,),
+    'CONSULTAR_PEDIDOS_CLIENTE': (1,),
+    'VERIFICAR_DESCONTO_CLIENTE': (1,),
+    'ATUALIZAR_CRITERIOS_DESCONTO_PACIENTE': (True, False, False, 1),
+    # --- cadastros: médicos ---
+    'INSERIR_MEDICO': ('Dr. Benchmark', '83922223333', 'dr.benchmark@clinica.com', 'CRM-PB 99999', 15000.00, 1,
+                       'Rua B', '2', None, 'Centro', 'João Pessoa', 'PB', '58000000'),
+    'ATUALIZAR_SALARIO_MEDICO': (16000.00, 1),
+    'ATUALIZAR_SALARIOS_MEDICOS_EM_LOTE': ((1, 16000.00, 15000.00),),
+    'PESQUISAR_MEDICO_POR_NOME': ('%Silva%',),
+    'PESQUISAR_MEDICO_POR_ESPECIALIDADE': ('%Cardio%',),
+    'REMOVER_MEDICO': (1,),
+    'SELECIONAR_MEDICO_POR_CRM': ('CRM-RJ 1981',),
+    'LISTAR_MEDICOS_PAGINA': (0, 100),
+    # --- cadastros: funcionários ---
+    'INSERIR_FUNCIONARIO': ('Funcionário Benchmark', '83933334444', 'func.benchmark@clinica.com', 3000.00,
+                            'Recepcionista', 'CLT', 2),
+    'ATUALIZAR_PERFIL_ACESSO_FUNCIONARIO': (2, 1),
+    'PESQUISAR_FUNCIONARIO_POR_NOME': ('%Silva%',),
+    'PESQUISAR_FUNCIONARIO_POR_TIPO_DE_CONTRATO': ('CLT',),
+    'REMOVER_FUNCIONARIO': (1,),
+    'SELECIONAR_FUNCIONARIO_POR_ID': (1,),
+    # --- cadastros: especialidades e perfis ---
+    'INSERIR_ESPECIALIDADE': ('Especialidade Benchmark', True),
+    'ATUALIZAR_STATUS_ESPECIALIDADE': (True, 1),
+    'ATUALIZAR_STATUS_ESPECIALIDADES_EM_LOTE': ((1, True, False),),
+    'PESQUISAR_ESPECIALIDADE_POR_NOME': ('%logia%',),
+    'VERIFICAR_MEDICOS_POR_ESPECIALIDADE': (1,),
+    'REMOVER_ESPECIALIDADE': (1,),
+    'SELECIONAR_ESPECIALIDADE_POR_ID': (1,),
+    'INSERIR_PERFIL_ACESSO': ('Perfil Benchmark', 'Perfil criado pelo benchmark.'),
+    'ATUALIZAR_DESCRICAO_PERFIL_ACESSO': ('Nova descrição', 1),
+    'PESQUISAR_PERFIL_ACESSO_POR_NOME': ('%a%',),
+    'VERIFICAR_FUNCIONARIOS_POR_PERFIL': (1,),
+    'REMOVER_PERFIL_ACESSO': (1,),
+    'SELECIONAR_PERFIL_ACESSO_POR_ID': (1,),
+    # --- clinico ---
+    'DETALHES_CONSULTAS': ((_AGORA - timedelta(days=30)).date(), _AGORA.date(), None, None, None, None, None, 51),
+    'INSERIR_CONSULTA': (1, 1, _AGORA, 30, 'Consulta de benchmark', 'Agendada'),
+    'BUSCAR_HORARIOS_LIVRES': (1, _AGORA, _AGORA + timedelta(days=14), 30, 10),
+    'AGENDA_MEDICO_POR_PERIODO': (1, _AGORA, _AGORA + timedelta(days=7)),
+    'BUSCAR_TEXTO_CLINICO': ('dor de cabeça', 21, 0),
+    'LINHA_DO_TEMPO_PACIENTE': (1, 50, 0),
+    'INDICADORES_POR_PERIODO': ((_AGORA - timedelta(days=30)).date(), _AGORA.date()),
+    'INDICADORES_SERIE_DIARIA': ((_AGORA - timedelta(days=30)).date(), _AGORA.date()),
+    'ATUALIZAR_CONSULTA': ('Realizada', 'Sem alterações', 1),
+    'PESQUISAR_CONSULTA_POR_NOME_PACIENTE': ('%Silva%',),
+    'REMOVER_CONSULTA': (1,),
+    'SELECIONAR_CONSULTA_POR_ID': (1,),
+    'INSERIR_RECEITA': (1, 'Dipirona', '500mg', 'Tomar de 6 em 6 horas.'),
+    'ATUALIZAR_RECEITA': ('Dipirona', '1g', 'Tomar de 8 em 8 horas.', 1),
+    'PESQUISAR_RECEITA_POR_PACIENTE': ('%Silva%',),
+    'REMOVER_RECEITA': (1,),
+    'SELECIONAR_RECEITA_POR_ID': (1,),
+    # --- financeiro ---
+    'INSERIR_PAGAMENTO': (1, 350.00, 'Cartão', False, None),
+    'ATUALIZAR_STATUS_PAGAMENTO': (1,),
+    'PESQUISAR_PAGAMENTO_POR_NOME_PACIENTE': ('%Silva%',),
+    'REMOVER_PAGAMENTO': (1,),
+    'SELECIONAR_PAGAMENTO_POR_ID': (1,),
+    'LISTAR_PAGAMENTOS_PAGINA': (0, 100),
+    'VERIFICAR_PAGAMENTO_POR_CONSULTA': (1,),
+    'AGING_RECEBIVEIS': (_AGORA.date(),),
+    'CONCILIAR_EXTRATO': (30,),
+    # --- vendas ---
+    'BUSCAR_PRODUTOS_POR_NOME': ('%vita%',),
+    'BUSCAR_PRODUTOS_POR_FAIXA_PRECO': (20.00, 80.00),
+    'BUSCAR_PRODUTOS_POR_CATEGORIA': ('Suplementos',),
+    'INSERIR_CATEGORIA': ('Categoria Benchmark',),
+    'INSERIR_PRODUTO': ('Produto Benchmark', 'Produto criado pelo benchmark', 10.00, 1, False, True),
+    'ATUALIZAR_ESTOQUE': (1, 50),
+    'ATUALIZAR_PONTO_REPOSICAO': (10, 1),
+    'SELECIONAR_PRODUTO_POR_ID': (1,),
+    'LISTAR_PRODUTOS_PAGINA': (0, 100),
+    'PRECOS_PRODUTOS_ATIVOS': ([1, 2, 3],),
+    'ATUALIZAR_PRODUTO': ('Vitamina A', 'Suplemento vitamínico', 50.00, 2, False, 1),
+    'ATUALIZAR_PRODUTOS_EM_LOTE': ((1, 'Vitamina A', 'Suplemento vitamínico', 50.00, 2, False,
+                                    'Vitamina A', 'Suplemento vitamínico', 45.00, 2, False),),
+    'PREVIA_REAJUSTE_PRECOS': (2, None, None, None, 'percentual', 10, 'final_90'),
+    'REAJUSTAR_PRECOS': (2, None, None, None, 'percentual', 10, 'final_90'),
+    'CHAMAR_EFETIVAR_COMPRA': (1, 1, 'PIX', json.dumps([{'produto_id': 1, 'quantidade': 1, 'preco_unitario': 50.00}]), 'Confirmado'),
+    'DETALHAR_ITENS_PEDIDO_CLIENTE': (1, datetime(2025, 9, 25, 10, 0)),
+    'REMOVER_PRODUTO': (1,),
+    'CONSULTAR_ESTOQUE_PRODUTO': (1,),
+}
+
+# Queries que começam com SELECT mas alteram dados (chamadas de procedures)
+QUERIES_COM_ESCRITA = {'CHAMAR_EFETIVAR_COMPRA', 'PREPARAR_CONCILIACAO', 'CONCILIAR_EXTRATO', 'REAJUSTAR_PRECOS'}
+
+
+def listar_queries(modulos=None):
+    """Retorna uma lista de (modulo, nome, sql) com todas as constantes SQL dos módulos de queries."""
+    encontradas = []
+    for nome_modulo, modulo in MODULOS_QUERIES.items():
+        if modulos and nome_modulo not in modulos:
+            continue
+        for nome, valor in vars(modulo).items():
+            if nome.isupper() and isinstance(valor, str):
+                encontradas.append((nome_modulo, nome, valor))
+    return encontradas
+
+
+def parametros_para(nome, sql):
+    """Retorna os parâmetros representativos da query, () se ela não tiver parâmetros ou None se faltar no catálogo."""
+    if nome in PARAMETROS_EXEMPLO:
+        return PARAMETROS_EXEMPLO[nome]
+    if '%s' not in sql:
+        return ()
+    return None
+
+
+def eh_leitura(nome, sql):
+    """Indica se a query apenas lê dados (pode ser executada sem efeitos colaterais)."""
+    inicio = sql.lstrip().split(None, 1)[0].upper()
+    return inicio in ('SELECT', 'WITH') and nome not in QUERIES_COM_ESCRITA
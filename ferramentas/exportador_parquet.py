@@ -0,0 +1,353 @@
+# Exportação incremental de vendas, itens de venda, consultas e pagamentos para Parquet.
+#
+# Cada execução exporta, por tabela, apenas as linhas inseridas, alteradas ou removidas desde a
+# execução anterior (registradas por trigger em manutencao.log_exportacao), então o tempo depende
+# das alterações do dia e não do tamanho das tabelas. A primeira exportação de cada tabela (ou a
+# primeira depois de um TRUNCATE) é completa.
+#
+# Arquivos gerados, particionados pelo dia da linha:
+#   <destino>/<tabela>/dia=AAAA-MM-DD/completa-<xid>.parquet
+#   <destino>/<tabela>/dia=AAAA-MM-DD/alteracoes-<xid início>-<xid fim>.parquet
+#   <destino>/<tabela>/_exportacoes.jsonl    (uma linha por janela exportada, em ordem)
+# A coluna "operacao" vale 'U' (estado atual da linha, nova ou alterada) ou 'D' (linha removida; só a
+# chave e a data vêm preenchidas). Para reconstruir a tabela, aplique as janelas do manifesto em ordem,
+# por chave; uma janela 'completa' substitui tudo o que veio antes dela.
+#
+# As linhas são lidas por cursor do lado do servidor e gravadas em grupos de TAMANHO_GRUPO, então a
+# memória usada não depende do volume exportado. Se a execução cair no meio, a próxima refaz a mesma
+# janela (registrada em manutencao.exportacoes antes de começar) e sobrescreve os mesmos arquivos.
+#
+# Uso:
+#   python -m ferramentas.exportador_parquet --banco clinica_carga --destino exportacao/
+#   python -m ferramentas.exportador_parquet --destino exportacao/ --tabelas clinico.consultas financeiro.pagamentos
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+from psycopg2 import sql
+
+from db_config import DB_SETTINGS
+
+# Tabela -> (coluna de data que define o dia do arquivo, colunas da chave, colunas exportadas)
+TABELAS = {
+    'vendas.vendas': ('data', ('id', 'data'),
+                      ('id', 'cliente_id', 'vendedor_id', 'data', 'total_bruto', 'desconto_aplicado',
+                       'total_liquido', 'forma_pagamento', 'status_pagamento')),
+    'vendas.itens_venda': ('data_venda', ('id', 'data_venda'),
+                           ('id', 'venda_id', 'data_venda', 'produto_id', 'quantidade', 'preco_unitario')),
+    'clinico.consultas': ('data', ('id', 'data'),
+                          ('id', 'paciente_id', 'medico_id', 'funcionario_id', 'data', 'duracao_minutos',
+                           'motivo', 'diagnostico', 'status')),
+    'financeiro.pagamentos': ('data_consulta', ('id',),
+                              ('id', 'consulta_id', 'data_consulta', 'valor', 'metodo', 'pago', 'data_pagamento')),
+}
+
+TAMANHO_GRUPO = 50_000
+
+# Tipos do PostgreSQL (OID) -> tipos do Arrow; numeric usa a precisão/escala declarada na coluna
+TIPOS_ARROW = {
+    16: pa.bool_(), 20: pa.int64(), 21: pa.int16(), 23: pa.int32(), 701: pa.float64(),
+    25: pa.string(), 1042: pa.string(), 1043: pa.string(),
+    1082: pa.date32(), 1114: pa.timestamp('us'), 1184: pa.timestamp('us', tz='UTC'),
+}
+
+
+def tipo_arrow(oid, typmod):
+    if oid == 1700:
+        if typmod < 0:
+            return pa.string()  # numeric sem precisão declarada não cabe em um decimal fixo
+        return pa.decimal128(((typmod - 4) >> 16) & 0xFFFF, (typmod - 4) & 0xFFFF)
+    return TIPOS_ARROW.get(oid, pa.string())
+
+
+def tipos_colunas(conn, tabela, colunas):
+    """
+    Tipos das colunas lidos do catálogo: {coluna: (tipo SQL, tipo Arrow)}. O schema dos arquivos vem
+    daqui, e não do cursor, para ser o mesmo nas exportações completas e incrementais (em que as
+    colunas das linhas removidas são NULL).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT attname, format_type(atttypid, atttypmod), atttypid, atttypmod FROM pg_attribute "
+                    "WHERE attrelid = %s::regclass AND attname = ANY(%s) AND NOT attisdropped;", (tabela, list(colunas)))
+        tipos = {nome: (tipo_sql, tipo_arrow(oid, typmod)) for nome, tipo_sql, oid, typmod in cur.fetchall()}
+    conn.commit()
+    return tipos
+
+
+def schema_arrow(tipos, colunas):
+    # O dia só define a pasta; não é gravado como coluna
+    return pa.schema([('operacao', pa.string())] + [(c, tipos[c][1]) for c in colunas])
+
+
+class EscritorPorDia:
+    """
+    Grava linhas já ordenadas por dia em um arquivo Parquet por dia (<diretorio>/dia=AAAA-MM-DD/<nome>).
+    Cada arquivo é escrito com sufixo .tmp e renomeado ao terminar o dia, então nunca fica pela metade.
+    """
+
+    def __init__(self, diretorio, nome, schema):
+        self.diretorio = diretorio
+        self.nome = nome
+        self.schema = schema
+        self.dia = None
+        self.writer = None
+        self.pendentes = []
+        self.arquivos = 0
+        self.linhas = 0
+
+    def _caminho(self, dia):
+        return os.path.join(self.diretorio, f"dia={dia.isoformat()}", self.nome)
+
+    def _gravar_pendentes(self):
+        if not self.pendentes:
+            return
+        colunas = list(zip(*self.pendentes))
+        self.writer.write_batch(pa.RecordBatch.from_arrays(
+            [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, self.schema)], schema=self.schema))
+        self.linhas += len(self.pendentes)
+        self.pendentes = []
+
+    def _fechar_dia(self):
+        if self.writer is None:
+            return
+        self._gravar_pendentes()
+        self.writer.close()
+        caminho = self._caminho(self.dia)
+        os.replace(caminho + '.tmp', caminho)
+        self.writer = None
+        self.arquivos += 1
+
+    def escrever(self, dia, linhas):
+        if dia != self.dia:
+            self._fechar_dia()
+            self.dia = dia
+            os.makedirs(os.path.dirname(self._caminho(dia)), exist_ok=True)
+            self.writer = pq.ParquetWriter(self._caminho(dia) + '.tmp', self.schema)
+        self.pendentes.extend(linhas)
+        if len(self.pendentes) >= TAMANHO_GRUPO:
+            self._gravar_pendentes()
+
+    def fechar(self):
+        self._fechar_dia()
+
+
+def consulta_completa(tabela, coluna_dia, colunas):
+    return sql.SQL("SELECT {dia}::date AS dia, 'U'::text AS operacao, {colunas} FROM {tabela} ORDER BY {dia}").format(
+        dia=sql.Identifier(coluna_dia),
+        colunas=sql.SQL(', ').join(map(sql.Identifier, colunas)),
+        tabela=sql.Identifier(*tabela.split('.')))
+
+
+def consulta_incremental(tabela, coluna_dia, chave, colunas, tipos):
+    """
+    Estado atual das linhas cujas chaves aparecem no log dentro da janela ('U'), mais as chaves
+    que não existem mais ('D'). Só lê as linhas alteradas, pelas chaves primárias.
+    """
+    mesma_chave = sql.SQL(' AND ').join(
+        sql.SQL("t.{} = k.{}").format(sql.Identifier(c), sql.Identifier('id' if c == 'id' else 'data')) for c in chave)
+    colunas_removidas = sql.SQL(', ').join(
+        sql.SQL('k.id') if c == 'id' else sql.SQL('k.data') if c == coluna_dia
+        else sql.SQL('NULL::{}').format(sql.SQL(tipos[c][0])) for c in colunas)
+    return sql.SQL("""
+        WITH chaves AS (
+            SELECT DISTINCT id, data FROM manutencao.log_exportacao
+            WHERE tabela = %(tabela)s AND transacao >= %(inicio)s::xid8 AND transacao < %(fim)s::xid8
+        )
+        SELECT t.{dia}::date AS dia, 'U'::text AS operacao, {colunas}
+        FROM {tabela} t
+        WHERE EXISTS (SELECT 1 FROM chaves k WHERE {mesma_chave})
+        UNION ALL
+        SELECT k.data::date, 'D', {colunas_removidas}
+        FROM chaves k
+        WHERE NOT EXISTS (SELECT 1 FROM {tabela} t WHERE {mesma_chave})
+        ORDER BY 1
+    """).format(
+        dia=sql.Identifier(coluna_dia),
+        colunas=sql.SQL(', ').join(sql.SQL("t.{}").format(sql.Identifier(c)) for c in colunas),
+        tabela=sql.Identifier(*tabela.split('.')),
+        mesma_chave=mesma_chave,
+        colunas_removidas=colunas_removidas)
+
+
+def abrir_janela(conn, tabela):
+    """
+    Retorna a janela (tipo, transacao_inicio, transacao_fim) a exportar: a pendente, se a execução
+    anterior não terminou; senão uma nova, do fim da anterior até o xmin atual (ou completa, se a
+    tabela nunca foi exportada).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT concluida FROM manutencao.exportacoes WHERE tabela = %s;", (tabela,))
+        linha = cur.fetchone()
+        if linha is None:
+            # A partir do COMMIT os triggers registram as alterações; transacao_inicio é definido depois
+            # dele, em iniciar_janela_completa
+            cur.execute("INSERT INTO manutencao.exportacoes (tabela, tipo, transacao_inicio) "
+                        "VALUES (%s, 'completa', pg_snapshot_xmax(pg_current_snapshot()));", (tabela,))
+        elif linha[0]:
+            cur.execute("UPDATE manutencao.exportacoes SET tipo = 'incremental', transacao_inicio = transacao_fim, "
+                        "transacao_fim = pg_snapshot_xmin(pg_current_snapshot()), concluida = FALSE, "
+                        "atualizada_em = CURRENT_TIMESTAMP WHERE tabela = %s;", (tabela,))
+        cur.execute("SELECT tipo, transacao_inicio::text, transacao_fim::text FROM manutencao.exportacoes WHERE tabela = %s;",
+                    (tabela,))
+        janela = cur.fetchone()
+    conn.commit()
+    return janela
+
+
+def iniciar_janela_completa(conn, tabela):
+    """
+    Grava em transacao_inicio o xmax de um snapshot tirado depois do COMMIT do registro da tabela:
+    toda transação com identificador a partir dele já vê o registro ao executar o trigger e loga as
+    suas alterações, e esperar_transacoes aguarda as anteriores, que a carga completa então inclui.
+    """
+    with conn.cursor() as cur:
+        cur.execute("UPDATE manutencao.exportacoes SET transacao_inicio = pg_snapshot_xmax(pg_current_snapshot()), "
+                    "atualizada_em = CURRENT_TIMESTAMP WHERE tabela = %s RETURNING transacao_inicio::text;", (tabela,))
+        inicio = cur.fetchone()[0]
+    conn.commit()
+    return inicio
+
+
+def remover_restos(diretorio, nome):
+    """Remove os arquivos de uma tentativa anterior da mesma janela."""
+    for caminho in glob.glob(os.path.join(diretorio, 'dia=*', nome + '*')):
+        os.remove(caminho)
+
+
+def registrar_no_manifesto(diretorio, entrada, substituidos=()):
+    """
+    Acrescenta a janela ao manifesto, substituindo uma entrada anterior do mesmo arquivo ou dos
+    `substituidos` (a execução que caiu entre gravar o manifesto e concluir a janela a refaz). A troca
+    do arquivo é atômica.
+    """
+    descartar = {entrada['arquivo'], *substituidos}
+    caminho = os.path.join(diretorio, '_exportacoes.jsonl')
+    linhas = []
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as manifesto:
+            linhas = [linha for linha in manifesto if linha.strip() and json.loads(linha)['arquivo'] not in descartar]
+    linhas.append(json.dumps(entrada) + '\n')
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as manifesto:
+        manifesto.writelines(linhas)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def esperar_transacoes(conn, transacao):
+    """Espera até que todas as transações anteriores a `transacao` tenham terminado."""
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot()) >= %s::xid8;", (transacao,))
+            pronto = cur.fetchone()[0]
+        conn.rollback()
+        if pronto:
+            return
+        time.sleep(1)
+
+
+def exportar_tabela(conn, destino, tabela):
+    """Exporta a janela pendente (ou uma nova) de uma tabela. Retorna (tipo, arquivos, linhas)."""
+    coluna_dia, chave, colunas = TABELAS[tabela]
+    diretorio = os.path.join(destino, tabela)
+
+    with conn.cursor() as cur:
+        # Um exportador por tabela de cada vez
+        cur.execute("SELECT pg_try_advisory_lock(hashtext('exportacao:' || %s));", (tabela,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            raise RuntimeError(f"Outra exportação de {tabela} está em andamento.")
+    conn.commit()
+
+    try:
+        tipos = tipos_colunas(conn, tabela, colunas)
+        tipo, inicio, fim = abrir_janela(conn, tabela)
+        substituidos = ()
+        if tipo == 'completa':
+            # Uma tentativa anterior desta carga usou o transacao_inicio gravado até aqui
+            substituidos = (f"completa-{inicio}.parquet",)
+            remover_restos(diretorio, substituidos[0])
+            inicio = iniciar_janela_completa(conn, tabela)
+            esperar_transacoes(conn, inicio)
+            nome = f"completa-{inicio}.parquet"
+            with conn.cursor() as cur:
+                # A carga completa e a marca d'água saem do mesmo snapshot
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+                cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text;")
+                fim = cur.fetchone()[0]
+            consulta, params = consulta_completa(tabela, coluna_dia, colunas), None
+        else:
+            nome = f"alteracoes-{inicio}-{fim}.parquet"
+            consulta = consulta_incremental(tabela, coluna_dia, chave, colunas, tipos)
+            params = {'tabela': tabela, 'inicio': inicio, 'fim': fim}
+
+        remover_restos(diretorio, nome)
+
+        escritor = EscritorPorDia(diretorio, nome, schema_arrow(tipos, colunas))
+        with conn.cursor(name=f"exportacao_{tabela.replace('.', '_')}") as cur:
+            cur.itersize = TAMANHO_GRUPO
+            cur.execute(consulta, params)
+            while True:
+                lote = cur.fetchmany(TAMANHO_GRUPO)
+                if not lote:
+                    break
+                for dia, linhas in itertools.groupby(lote, key=lambda linha: linha[0]):
+                    escritor.escrever(dia, [linha[1:] for linha in linhas])
+        escritor.fechar()
+        arquivos, linhas = escritor.arquivos, escritor.linhas
+
+        os.makedirs(diretorio, exist_ok=True)
+        registrar_no_manifesto(diretorio, {'tipo': tipo, 'transacao_inicio': inicio, 'transacao_fim': fim, 'arquivo': nome,
+                                           'arquivos': arquivos, 'linhas': linhas,
+                                           'exportada_em': datetime.now().isoformat(timespec='seconds')},
+                               substituidos)
+
+        with conn.cursor() as cur:
+            cur.execute("UPDATE manutencao.exportacoes SET transacao_fim = %s::xid8, concluida = TRUE, "
+                        "atualizada_em = CURRENT_TIMESTAMP WHERE tabela = %s;", (fim, tabela))
+            cur.execute("DELETE FROM manutencao.log_exportacao WHERE tabela = %s AND transacao < %s::xid8;", (tabela, fim))
+        conn.commit()
+        return tipo, arquivos, linhas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(hashtext('exportacao:' || %s));", (tabela,))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta incrementalmente vendas, consultas e pagamentos para Parquet.")
+    parser.add_argument('--banco', help="Banco de origem (padrão: o de db_config.py).")
+    parser.add_argument('--destino', required=True, help="Diretório raiz dos arquivos Parquet.")
+    parser.add_argument('--tabelas', nargs='+', choices=TABELAS.keys(), default=list(TABELAS),
+                        help="Tabelas a exportar (padrão: todas).")
+    args = parser.parse_args()
+
+    settings = dict(DB_SETTINGS, dbname=args.banco) if args.banco else DB_SETTINGS
+    conn = psycopg2.connect(**settings)
+    falhas = 0
+    for tabela in args.tabelas:
+        inicio = time.perf_counter()
+        try:
+            tipo, arquivos, linhas = exportar_tabela(conn, args.destino, tabela)
+        except (psycopg2.Error, pa.ArrowException, OSError, RuntimeError) as e:
+            print(f"  {tabela:<24} falhou: {e}")
+            falhas += 1
+            continue
+        print(f"  {tabela:<24} {tipo:<12} {linhas:>12,} linha(s) em {arquivos:>5} arquivo(s) "
+              f"({time.perf_counter() - inicio:.1f}s)")
+    conn.close()
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,497 @@
+# Gerador de dados sintéticos para testes de carga.
+#
+# Preenche cadastros, clinico, financeiro e vendas com dados referencialmente consistentes
+# em escalas de produção (10 mil, 1 milhão ou 10 milhões de pacientes). A geração é
+# determinística: a mesma semente e a mesma escala produzem exatamente os mesmos dados,
+# independentemente do número de processos usados.
+#
+# A carga é feita em duas fases, ambas divididas em lotes carregados via COPY por processos
+# trabalhadores: primeiro os pacientes com suas vendas e itens; depois a agenda dos médicos
+# (consultas, receitas e pagamentos). As consultas são geradas por médico, em horários
+# distintos de cada dia, para respeitar a restrição de exclusão que impede conflitos de
+# agenda. Os IDs são derivados do ID do paciente ou do médico, então lotes diferentes nunca
+# colidem e não precisam se coordenar.
+#
+# ATENÇÃO: os dados existentes nas tabelas do banco de destino são apagados.
+#
+# Uso:
+#   psql -U seu_usuario_aqui -d clinica_carga -f schema_clinica.sql
+#   python -m ferramentas.gerador_dados --banco clinica_carga --escala 1m --trabalhadores 8
+
+import argparse
+import csv
+import io
+import math
+import multiprocessing
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import psycopg2
+
+from db_config import DB_SETTINGS
+
+ESCALAS = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+TAMANHO_LOTE = 10_000
+TAMANHO_LOTE_MEDICOS = 10
+
+# Agenda: consultas de 30 minutos das 08:00 às 18:00, em média CONSULTAS_POR_PACIENTE por paciente
+VAGAS_POR_DIA = 20
+DURACAO_CONSULTA = 30
+CONSULTAS_POR_PACIENTE = 3.0
+
+# Limites por entidade, usados para derivar IDs únicos a partir do ID "pai"
+# (ex: as vendas do paciente p recebem os IDs (p - 1) * MAX_VENDAS + 1 ... + MAX_VENDAS).
+# As consultas de cada médico usam VAGAS_POR_DIA * (dias do período) IDs.
+MAX_RECEITAS_POR_CONSULTA = 4
+MAX_VENDAS_POR_PACIENTE = 16
+MAX_ITENS_POR_VENDA = 8
+
+NOMES = ['Ana', 'Maria', 'João', 'José', 'Pedro', 'Paulo', 'Lucas', 'Gabriel', 'Rafael', 'Mariana', 'Juliana',
+         'Fernanda', 'Beatriz', 'Carlos', 'Bruno', 'Larissa', 'Camila', 'Thiago', 'Felipe', 'Amanda', 'Letícia',
+         'Rodrigo', 'Gustavo', 'Patrícia', 'Aline', 'Vitória', 'Heitor', 'Helena', 'Arthur', 'Alice', 'Davi',
+         'Laura', 'Miguel', 'Valentina', 'Bernardo', 'Sofia', 'Enzo', 'Isabela', 'Lorena', 'Sérgio']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira',
+              'Barbosa', 'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado',
+              'Mendes', 'Freitas', 'Cardoso', 'Ramos', 'Araújo', 'Cavalcanti', 'Medeiros', 'Brito']
+CIDADES = [('João Pessoa', 'PB', '83'), ('Campina Grande', 'PB', '83'), ('Sousa', 'PB', '83'), ('Mari', 'PB', '83'),
+           ('Recife', 'PE', '81'), ('Natal', 'RN', '84'), ('Fortaleza', 'CE', '85'), ('Salvador', 'BA', '71'),
+           ('Rio de Janeiro', 'RJ', '21'), ('São Paulo', 'SP', '11'), ('Belo Horizonte', 'MG', '31')]
+PESOS_CIDADES = [30, 12, 4, 2, 12, 6, 6, 6, 10, 10, 2]
+
+# Especialidades em ordem de demanda: o peso segue uma distribuição de Zipf (poucas concentram a maioria)
+ESPECIALIDADES = ['Clínica Geral', 'Cardiologia', 'Dermatologia', 'Ortopedia', 'Pediatria', 'Ginecologia',
+                  'Oftalmologia', 'Fisioterapia', 'Medicina Esportiva', 'Nutrição Esportiva', 'Endocrinologia',
+                  'Psiquiatria', 'Neurologia', 'Otorrinolaringologia', 'Urologia', 'Gastroenterologia',
+                  'Pneumologia', 'Reumatologia', 'Geriatria', 'Infectologia']
+PESOS_ESPECIALIDADES = [1 / (i + 1) ** 1.1 for i in range(len(ESPECIALIDADES))]
+VALOR_BASE_CONSULTA = [180, 350, 300, 320, 250, 280, 260, 150, 300, 200, 330, 400, 380, 270, 300, 320, 300, 310, 290, 310]
+
+MOTIVOS = ['Consulta de rotina', 'Dor persistente', 'Retorno', 'Avaliação de exames', 'Check-up anual',
+           'Dor no peito', 'Lesão durante treino', 'Manchas na pele', 'Febre e cansaço', 'Dor de cabeça frequente',
+           'Acompanhamento de tratamento', 'Renovação de receita']
+DIAGNOSTICOS = ['Sem alterações', 'Quadro viral leve', 'Hipertensão controlada', 'Tendinite', 'Dermatite de contato',
+                'Ansiedade leve', 'Deficiência de vitamina D', 'Entorse leve', 'Enxaqueca', 'Gastrite',
+                'Infecção urinária', 'Rinite alérgica']
+MEDICAMENTOS = [('Dipirona', '500mg'), ('Paracetamol', '750mg'), ('Ibuprofeno', '400mg'), ('Amoxicilina', '500mg'),
+                ('Losartana', '50mg'), ('Omeprazol', '20mg'), ('Vitamina D', '2000UI'), ('Loratadina', '10mg'),
+                ('Sertralina', '50mg'), ('Diclofenaco', '50mg')]
+INSTRUCOES = ['Tomar 1 comprimido a cada 8 horas por 5 dias.', 'Tomar 1 comprimido ao dia, pela manhã.',
+              'Tomar em caso de dor, no máximo 4 vezes ao dia.', 'Uso contínuo, reavaliar em 90 dias.']
+METODOS_PAGAMENTO = ['Dinheiro', 'Cartão', 'Transferência', 'Seguro']
+PESOS_METODOS_PAGAMENTO = [10, 45, 15, 30]
+FORMAS_PAGAMENTO_VENDA = ['Dinheiro', 'Cartão', 'Boleto', 'PIX', 'Berries']
+PESOS_FORMAS_VENDA = [10, 40, 5, 44, 1]
+
+CATEGORIAS = ['Dermocosméticos', 'Suplementos', 'Higiene Pessoal', 'Ortopédicos', 'Primeiros Socorros',
+              'Nutrição', 'Bem-estar', 'Infantil']
+PERFIS = [('Administrador', 'Acesso total ao sistema.'),
+          ('Recepção', 'Acesso a agendamentos e cadastros de pacientes.'),
+          ('Faturamento', 'Acesso a relatórios e gestão de pagamentos.'),
+          ('Corpo Técnico', 'Acesso a prontuários e agendamentos clínicos.'),
+          ('Vendedor', 'Acesso ao módulo de vendas e estoque.')]
+
+# Ordem de carga (respeita as chaves estrangeiras) e colunas enviadas no COPY
+COLUNAS = {
+    'cadastros.perfis_acesso': ('id', 'nome', 'descricao'),
+    'cadastros.especialidades': ('id', 'nome', 'especialidade_ativa'),
+    'cadastros.funcionarios': ('id', 'nome', 'telefone', 'email', 'salario', 'data_admissao', 'cargo',
+                               'tipo_contrato', 'perfil_acesso_id', 'cidade', 'sigla_estado'),
+    'cadastros.medicos': ('id', 'nome', 'telefone', 'email', 'crm', 'salario', 'data_admissao', 'especialidade_id',
+                          'cidade', 'sigla_estado'),
+    'vendas.categorias': ('id', 'nome'),
+    'vendas.produtos': ('id', 'nome', 'descricao', 'preco', 'categoria_id', 'fabricado_em_mari', 'ativo'),
+    'vendas.estoque': ('produto_id', 'quantidade', 'ponto_reposicao'),
+    'cadastros.pacientes': ('id', 'nome', 'sexo', 'email', 'cpf', 'data_registo', 'telefone', 'cidade',
+                            'sigla_estado', 'cep', 'torce_flamengo', 'assiste_one_piece', 'nasceu_sousa'),
+    'clinico.consultas': ('id', 'paciente_id', 'medico_id', 'funcionario_id', 'data', 'duracao_minutos', 'motivo',
+                          'diagnostico', 'status'),
+    'clinico.receitas': ('id', 'consulta_id', 'data_consulta', 'medicamento', 'dosagem', 'instrucoes'),
+    'financeiro.pagamentos': ('id', 'consulta_id', 'data_consulta', 'valor', 'metodo', 'pago', 'data_pagamento'),
+    'vendas.vendas': ('id', 'cliente_id', 'vendedor_id', 'data', 'total_bruto', 'desconto_aplicado',
+                      'total_liquido', 'forma_pagamento', 'status_pagamento'),
+    'vendas.itens_venda': ('id', 'venda_id', 'data_venda', 'produto_id', 'quantidade', 'preco_unitario'),
+}
+
+SEQUENCIAS = {
+    'cadastros.perfis_acesso': 'cadastros.perfis_acesso_id_seq',
+    'cadastros.especialidades': 'cadastros.especialidades_id_seq',
+    'cadastros.funcionarios': 'cadastros.funcionarios_id_seq',
+    'cadastros.medicos': 'cadastros.medicos_id_seq',
+    'cadastros.pacientes': 'cadastros.pacientes_id_seq',
+    'vendas.categorias': 'vendas.categorias_id_seq',
+    'vendas.produtos': 'vendas.produtos_id_seq',
+    'clinico.consultas': 'clinico.consultas_id_seq',
+    'clinico.receitas': 'clinico.receitas_id_seq',
+    'financeiro.pagamentos': 'financeiro.pagamentos_id_seq',
+    'vendas.vendas': 'vendas.vendas_id_seq',
+    'vendas.itens_venda': 'vendas.itens_venda_id_seq',
+}
+
+
+# --- Utilitários de geração ---
+
+def gerar_cpf(numero):
+    """Gera um CPF válido (com dígitos verificadores) e único a partir de um número sequencial."""
+    base = [int(d) for d in f"{numero % 1_000_000_000:09d}"]
+    for tamanho in (9, 10):
+        soma = sum(d * peso for d, peso in zip(base, range(tamanho + 1, 1, -1)))
+        resto = soma * 10 % 11
+        base.append(0 if resto == 10 else resto)
+    return ''.join(map(str, base))
+
+
+def nome_aleatorio(rng):
+    return f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+
+
+def pesos_sazonais(inicio, fim, domingo_fechado):
+    """
+    Retorna (dias, pesos acumulados) entre inicio e fim com sazonalidade anual:
+    mais movimento em dezembro/janeiro e julho, menos em fevereiro; sábados têm metade do
+    movimento e, se domingo_fechado, domingos não recebem registros.
+    """
+    dias, acumulados, total = [], [], 0.0
+    dia = inicio
+    while dia <= fim:
+        peso = 1.0 + 0.30 * math.cos(2 * math.pi * (dia.month - 12.5) / 12) + (0.15 if dia.month == 7 else 0.0)
+        if dia.weekday() == 5:
+            peso *= 0.5
+        elif dia.weekday() == 6:
+            peso = 0.0 if domingo_fechado else peso * 0.3
+        total += peso
+        dias.append(dia)
+        acumulados.append(total)
+        dia += timedelta(days=1)
+    return dias, acumulados
+
+
+def quantidade_geometrica(rng, media, maximo):
+    """Sorteia uma contagem com distribuição geométrica (muitos valores baixos, cauda longa)."""
+    if media <= 0:
+        return 0
+    p = 1.0 / (1.0 + media)
+    u = 1.0 - rng.random()
+    return min(maximo, int(math.log(u) / math.log(1.0 - p)))
+
+
+def quantidade_poisson(rng, media, maximo):
+    """Sorteia uma contagem com distribuição de Poisson (método de Knuth; adequado a médias pequenas)."""
+    limite, k, produto = math.exp(-media), 0, rng.random()
+    while produto > limite and k < maximo:
+        k += 1
+        produto *= rng.random()
+    return k
+
+
+class BufferCopy:
+    """Acumula linhas em CSV por tabela para envio via COPY."""
+
+    def __init__(self):
+        self.buffers = {tabela: io.StringIO() for tabela in COLUNAS}
+        self.writers = {tabela: csv.writer(buf) for tabela, buf in self.buffers.items()}
+        self.contagens = {tabela: 0 for tabela in COLUNAS}
+
+    def adicionar(self, tabela, linha):
+        self.writers[tabela].writerow(['' if valor is None else valor for valor in linha])
+        self.contagens[tabela] += 1
+
+    def enviar(self, cur):
+        for tabela, colunas in COLUNAS.items():
+            buf = self.buffers[tabela]
+            if not self.contagens[tabela]:
+                continue
+            buf.seek(0)
+            cur.copy_expert(f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+# --- Dimensões (geradas no processo principal) ---
+
+def gerar_dimensoes(config):
+    """Gera as tabelas pequenas (perfis, especialidades, funcionários, médicos, categorias, produtos)."""
+    rng = random.Random(config['semente'])
+    buf = BufferCopy()
+    n_pacientes = config['pacientes']
+
+    for i, (nome, descricao) in enumerate(PERFIS, start=1):
+        buf.adicionar('cadastros.perfis_acesso', (i, nome, descricao))
+
+    for i, nome in enumerate(ESPECIALIDADES, start=1):
+        buf.adicionar('cadastros.especialidades', (i, nome, True))
+
+    n_funcionarios = max(10, n_pacientes // 5000)
+    vendedores = []
+    for i in range(1, n_funcionarios + 1):
+        cidade, uf, ddd = rng.choices(CIDADES, PESOS_CIDADES)[0]
+        # Cerca de 40% dos funcionários são vendedores (perfil 5); o primeiro sempre é
+        perfil = 5 if i == 1 or rng.random() < 0.4 else rng.randint(1, 4)
+        if perfil == 5:
+            vendedores.append(i)
+        cargo = {1: 'Administrador', 2: 'Recepcionista', 3: 'Analista Financeiro', 4: 'Enfermeiro(a)', 5: 'Vendedor'}[perfil]
+        buf.adicionar('cadastros.funcionarios', (
+            i, nome_aleatorio(rng), f"{ddd}7{i:08d}", f"funcionario{i}@clinica.com",
+            round(rng.uniform(1800, 9000), 2), config['inicio'] - timedelta(days=rng.randint(0, 3650)), cargo,
+            rng.choices(['CLT', 'PJ', 'Estágio'], [70, 25, 5])[0], perfil, cidade, uf))
+
+    n_medicos = max(len(ESPECIALIDADES), n_pacientes // 2000)
+    medicos_por_especialidade = {i: [] for i in range(1, len(ESPECIALIDADES) + 1)}
+    for i in range(1, n_medicos + 1):
+        # Garante ao menos um médico por especialidade; o restante segue a demanda de cada uma
+        if i <= len(ESPECIALIDADES):
+            especialidade = i
+        else:
+            especialidade = rng.choices(range(1, len(ESPECIALIDADES) + 1), PESOS_ESPECIALIDADES)[0]
+        medicos_por_especialidade[especialidade].append(i)
+        cidade, uf, ddd = rng.choices(CIDADES, PESOS_CIDADES)[0]
+        buf.adicionar('cadastros.medicos', (
+            i, f"Dr(a). {nome_aleatorio(rng)}", f"{ddd}8{i:08d}", f"medico{i}@clinica.com", f"CRM-{uf} {100000 + i}",
+            round(rng.uniform(12000, 35000), 2), config['inicio'] - timedelta(days=rng.randint(0, 3650)),
+            especialidade, cidade, uf))
+
+    for i, nome in enumerate(CATEGORIAS, start=1):
+        buf.adicionar('vendas.categorias', (i, nome))
+
+    n_produtos = max(50, min(5000, n_pacientes // 200))
+    precos = {}
+    for i in range(1, n_produtos + 1):
+        categoria = rng.randint(1, len(CATEGORIAS))
+        preco = round(rng.lognormvariate(3.6, 0.7), 2)
+        precos[i] = preco
+        buf.adicionar('vendas.produtos', (
+            i, f"{CATEGORIAS[categoria - 1]} {i}", f"Produto sintético {i}", preco, categoria,
+            rng.random() < 0.15, rng.random() < 0.97))
+        buf.adicionar('vendas.estoque', (i, rng.randint(0, 5000), rng.choice((5, 10, 20, 50))))
+
+    contexto = {
+        'vendedores': vendedores,
+        'n_medicos': n_medicos,
+        'especialidade_do_medico': {m: e for e, medicos in medicos_por_especialidade.items() for m in medicos},
+        'n_funcionarios': n_funcionarios,
+        'precos': precos,
+    }
+    return buf, contexto
+
+
+# --- Lotes (gerados e carregados nos processos trabalhadores) ---
+
+_conexao_trabalhador = None
+
+
+def _iniciar_trabalhador(settings):
+    global _conexao_trabalhador
+    _conexao_trabalhador = psycopg2.connect(**settings)
+
+
+def gerar_lote_pacientes(config, contexto, primeiro_id, ultimo_id):
+    """Gera os pacientes [primeiro_id, ultimo_id] e o histórico de vendas deles."""
+    # A semente depende apenas do lote, garantindo o mesmo resultado com qualquer número de processos
+    rng = random.Random(config['semente'] * 1_000_003 + primeiro_id)
+    buf = BufferCopy()
+    dias_consulta, pesos_consulta = config['calendario_consultas']
+    dias_venda, pesos_venda = config['calendario_vendas']
+    produtos = list(contexto['precos'].keys())
+
+    for paciente_id in range(primeiro_id, ultimo_id + 1):
+        cidade, uf, ddd = rng.choices(CIDADES, PESOS_CIDADES)[0]
+        sexo = rng.choices(['F', 'M', 'O'], [52, 47, 1])[0]
+        flamengo, one_piece, sousa = rng.random() < 0.12, rng.random() < 0.06, uf == 'PB' and cidade == 'Sousa'
+        tem_desconto = flamengo or one_piece or sousa
+        data_registo = datetime.combine(rng.choices(dias_consulta, cum_weights=pesos_consulta)[0],
+                                        datetime.min.time()) - timedelta(days=rng.randint(0, 365))
+        buf.adicionar('cadastros.pacientes', (
+            paciente_id, nome_aleatorio(rng), sexo, f"paciente{paciente_id}@exemplo.com", gerar_cpf(paciente_id),
+            data_registo, f"{ddd}9{paciente_id:08d}", cidade, uf, f"{rng.randint(10000, 99999)}000",
+            flamengo, one_piece, sousa))
+
+        # Vendas: a maioria dos clientes compra pouco ou nada
+        n_vendas = quantidade_geometrica(rng, 1.2, MAX_VENDAS_POR_PACIENTE)
+        if paciente_id == 1:
+            n_vendas = max(n_vendas, 1)  # o paciente 1 é usado como exemplo pelas ferramentas
+        for j in range(n_vendas):
+            venda_id = (paciente_id - 1) * MAX_VENDAS_POR_PACIENTE + j + 1
+            dia = rng.choices(dias_venda, cum_weights=pesos_venda)[0]
+            data = datetime(dia.year, dia.month, dia.day, rng.randint(8, 19), rng.randint(0, 59), rng.randint(0, 59))
+            itens = rng.sample(produtos, min(len(produtos), 1 + quantidade_geometrica(rng, 1.0, MAX_ITENS_POR_VENDA - 1)))
+            total_bruto = 0.0
+            linhas_itens = []
+            for k, produto_id in enumerate(itens):
+                quantidade = 1 + quantidade_geometrica(rng, 0.5, 5)
+                preco = contexto['precos'][produto_id]
+                total_bruto += quantidade * preco
+                linhas_itens.append(((venda_id - 1) * MAX_ITENS_POR_VENDA + k + 1, venda_id, data, produto_id,
+                                     quantidade, preco))
+            total_bruto = round(total_bruto, 2)
+            desconto = round(total_bruto * 0.10, 2) if tem_desconto else 0.0
+            forma = rng.choices(FORMAS_PAGAMENTO_VENDA, PESOS_FORMAS_VENDA)[0]
+            status_pag = 'Confirmado' if forma in ('Dinheiro', 'Cartão', 'PIX') else rng.choice(['Pendente', 'Confirmado'])
+            buf.adicionar('vendas.vendas', (
+                venda_id, paciente_id, rng.choice(contexto['vendedores']), data, total_bruto, desconto,
+                round(total_bruto - desconto, 2), forma, status_pag))
+            for linha in linhas_itens:
+                buf.adicionar('vendas.itens_venda', linha)
+
+    return buf
+
+
+def gerar_lote_medicos(config, contexto, primeiro_id, ultimo_id):
+    """
+    Gera a agenda dos médicos [primeiro_id, ultimo_id] (consultas, receitas e pagamentos).
+    Cada consulta ocupa uma vaga distinta do dia do médico, então não há conflitos de horário.
+    """
+    rng = random.Random(f"consultas:{config['semente']}:{primeiro_id}")
+    buf = BufferCopy()
+    referencia = config['referencia']
+    n_pacientes = config['pacientes']
+    dias_consulta, pesos_consulta = config['calendario_consultas']
+    max_consultas_por_medico = VAGAS_POR_DIA * len(dias_consulta)
+    # Pesos diários (os do calendário são acumulados) e média de consultas por médico por unidade de peso
+    pesos_diarios = [b - a for a, b in zip([0.0] + pesos_consulta[:-1], pesos_consulta)]
+    taxa = CONSULTAS_POR_PACIENTE * n_pacientes / (contexto['n_medicos'] * pesos_consulta[-1])
+
+    for medico_id in range(primeiro_id, ultimo_id + 1):
+        especialidade = contexto['especialidade_do_medico'][medico_id]
+        popularidade = rng.lognormvariate(0.0, 0.4)
+        k = 0
+        for dia, peso in zip(dias_consulta, pesos_diarios):
+            n_consultas = quantidade_poisson(rng, taxa * peso * popularidade, VAGAS_POR_DIA) if peso else 0
+            if medico_id == 1 and k == 0 and peso:
+                n_consultas = max(n_consultas, 1)  # a consulta 1 (do paciente 1) é usada como exemplo
+            for vaga in sorted(rng.sample(range(VAGAS_POR_DIA), n_consultas)):
+                consulta_id = (medico_id - 1) * max_consultas_por_medico + k + 1
+                # Pacientes de ID baixo concentram mais consultas (crônicos)
+                paciente_id = 1 if consulta_id == 1 else 1 + int(n_pacientes * rng.random() ** 1.5)
+                data = datetime(dia.year, dia.month, dia.day, 8) + timedelta(minutes=vaga * DURACAO_CONSULTA)
+                k += 1
+                if data.date() > referencia:
+                    status, diagnostico = 'Agendada', None
+                else:
+                    status = 'Cancelada' if rng.random() < 0.12 else 'Realizada'
+                    diagnostico = rng.choice(DIAGNOSTICOS) if status == 'Realizada' else None
+                buf.adicionar('clinico.consultas', (
+                    consulta_id, paciente_id, medico_id, rng.randint(1, contexto['n_funcionarios']), data,
+                    DURACAO_CONSULTA, rng.choice(MOTIVOS), diagnostico, status))
+
+                if status != 'Realizada':
+                    continue
+                for r in range(quantidade_geometrica(rng, 0.8, MAX_RECEITAS_POR_CONSULTA - 1)):
+                    medicamento, dosagem = rng.choice(MEDICAMENTOS)
+                    buf.adicionar('clinico.receitas', (
+                        (consulta_id - 1) * MAX_RECEITAS_POR_CONSULTA + r + 1, consulta_id, data,
+                        medicamento, dosagem, rng.choice(INSTRUCOES)))
+
+                if rng.random() < 0.95:
+                    dias_desde = (referencia - data.date()).days
+                    pago = rng.random() < (0.97 if dias_desde > 60 else 0.55)
+                    data_pagamento = data + timedelta(days=rng.randint(0, 30), hours=rng.randint(0, 8)) if pago else None
+                    valor = round(VALOR_BASE_CONSULTA[especialidade - 1] * rng.uniform(0.9, 1.2), 2)
+                    buf.adicionar('financeiro.pagamentos', (
+                        consulta_id, consulta_id, data, valor,
+                        rng.choices(METODOS_PAGAMENTO, PESOS_METODOS_PAGAMENTO)[0], pago, data_pagamento))
+
+    return buf
+
+
+def processar_lote(argumentos):
+    """Executado nos trabalhadores: gera um lote e o carrega via COPY em uma transação."""
+    gerar, config, contexto, primeiro_id, ultimo_id = argumentos
+    buf = gerar(config, contexto, primeiro_id, ultimo_id)
+    with _conexao_trabalhador.cursor() as cur:
+        buf.enviar(cur)
+    _conexao_trabalhador.commit()
+    return buf.contagens
+
+
+# --- Orquestração ---
+
+def preparar_banco(conn, config):
+    """Apaga os dados atuais e garante as partições mensais de todo o período gerado."""
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE " + ", ".join(COLUNAS) + " RESTART IDENTITY CASCADE;")
+        for tabela in ('vendas.vendas', 'vendas.itens_venda', 'clinico.consultas'):
+            cur.execute("SELECT manutencao.criar_particoes_mensais(%s::regclass, %s, %s);",
+                        (tabela, config['inicio'], config['fim']))
+    conn.commit()
+
+
+def finalizar_banco(conn):
+    """Ajusta as sequências para depois dos IDs gerados e atualiza as estatísticas do planejador."""
+    with conn.cursor() as cur:
+        for tabela, sequencia in SEQUENCIAS.items():
+            cur.execute(f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {tabela}), 0) + 1, false);", (sequencia,))
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        # Inclui os indicadores diários, preenchidos pelos triggers durante a carga
+        for tabela in (*COLUNAS, 'clinico.indicadores_diarios'):
+            cur.execute(f"ANALYZE {tabela};")
+    conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos em escala de produção para testes de carga.")
+    parser.add_argument('--banco', required=True,
+                        help="Banco de destino (já criado com schema_clinica.sql). Os dados atuais serão apagados.")
+    parser.add_argument('--escala', choices=ESCALAS.keys(), default='10k', help="Número de pacientes (padrão: 10k).")
+    parser.add_argument('--pacientes', type=int, help="Número exato de pacientes (substitui --escala).")
+    parser.add_argument('--semente', type=int, default=42, help="Semente da geração (padrão: 42).")
+    parser.add_argument('--trabalhadores', type=int, default=multiprocessing.cpu_count(),
+                        help="Processos de carga em paralelo (padrão: número de CPUs).")
+    parser.add_argument('--inicio', type=date.fromisoformat, default=date(2023, 1, 1),
+                        help="Primeiro dia do histórico (padrão: 2023-01-01).")
+    parser.add_argument('--fim', type=date.fromisoformat, default=date(2025, 12, 31),
+                        help="Último dia com consultas agendadas (padrão: 2025-12-31).")
+    parser.add_argument('--referencia', type=date.fromisoformat, default=date(2025, 10, 15),
+                        help="\"Hoje\" dos dados: consultas depois dessa data ficam como Agendadas (padrão: 2025-10-15).")
+    args = parser.parse_args()
+
+    config = {
+        'pacientes': args.pacientes or ESCALAS[args.escala],
+        'semente': args.semente,
+        'inicio': args.inicio,
+        'fim': args.fim,
+        'referencia': args.referencia,
+        'calendario_consultas': pesos_sazonais(args.inicio, args.fim, domingo_fechado=True),
+        'calendario_vendas': pesos_sazonais(args.inicio, args.referencia, domingo_fechado=False),
+    }
+    settings = dict(DB_SETTINGS, dbname=args.banco)
+
+    print(f"Gerando {config['pacientes']:,} pacientes no banco '{args.banco}' "
+          f"(semente {args.semente}, {args.trabalhadores} processos)...")
+    inicio = time.perf_counter()
+
+    conn = psycopg2.connect(**settings)
+    preparar_banco(conn, config)
+    dimensoes, contexto = gerar_dimensoes(config)
+    with conn.cursor() as cur:
+        dimensoes.enviar(cur)
+    conn.commit()
+
+    # As consultas referenciam os pacientes, então a agenda só é gerada depois de todos eles
+    fases = [
+        ('pacientes', gerar_lote_pacientes, config['pacientes'], TAMANHO_LOTE),
+        ('agendas', gerar_lote_medicos, contexto['n_medicos'], TAMANHO_LOTE_MEDICOS),
+    ]
+    totais = dict(dimensoes.contagens)
+    with multiprocessing.Pool(args.trabalhadores, initializer=_iniciar_trabalhador, initargs=(settings,)) as pool:
+        for rotulo, gerar, total, tamanho in fases:
+            lotes = [(gerar, config, contexto, primeiro, min(primeiro + tamanho - 1, total))
+                     for primeiro in range(1, total + 1, tamanho)]
+            for n, contagens in enumerate(pool.imap_unordered(processar_lote, lotes), start=1):
+                for tabela, quantidade in contagens.items():
+                    totais[tabela] += quantidade
+                print(f"\r  Lotes de {rotulo} carregados: {n}/{len(lotes)}", end='', flush=True)
+            print()
+
+    print("Ajustando sequências e estatísticas...")
+    finalizar_banco(conn)
+    conn.close()
+
+    print(f"\nConcluído em {time.perf_counter() - inicio:.1f}s:")
+    for tabela, quantidade in totais.items():
+        print(f"  {tabela:<26} {quantidade:>12,}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,25 @@
 # Arquivo principal para executar exemplos
 
+import argparse
+import contextlib
+import json
 import os
+import shlex
+import sys
+import time
+from collections import deque
+from datetime import date, timedelta
+import psycopg2
 from db_manager import DatabaseManager
-from queries import cadastros_queries, clinico_queries, financeiro_queries
+from conciliacao import conciliar_arquivo
+from queries import cadastros_queries, clinico_queries, financeiro_queries, manutencao_queries
+
+TAMANHO_PAGINA_BUSCA = 10
+TAMANHO_PAGINA_RELATORIO = 20
+TAMANHO_PAGINA_LISTAGEM = 50
+HISTORICO_PAGINAS = 20     # Páginas da listagem mantidas em memória para voltar
+LARGURA_MAXIMA_COLUNA = 40 # Valores mais largos são cortados na listagem paginada
+JANELA_RELATORIO_DIAS = 30  # Janela padrão do relatório de consultas: 30 dias antes e depois de hoje
 
 MENU_CONFIG = {
     'cadastros': {
@@ -12,6 +29,7 @@ MENU_CONFIG = {
                 'nome': 'Pacientes',
                 'queries': {
                     'listar': cadastros_queries.LISTAR_TODOS_PACIENTES,
+                    'listar_desconto': cadastros_queries.LISTAR_CLIENTES_COM_DESCONTO,
                     'exibir_um': cadastros_queries.SELECIONAR_PACIENTE_POR_ID,
                     'pesquisar_nome': cadastros_queries.PESQUISAR_PACIENTE_POR_NOME,
                     'remover': cadastros_queries.REMOVER_PACIENTE,
@@ -24,7 +42,8 @@ MENU_CONFIG = {
                     {'opcao': '3', 'nome': 'Inserir Novo', 'handler': 'inserir'},
                     {'opcao': '4', 'nome': 'Alterar Telefone', 'handler': 'alterar', 'key': 'alterar_telefone'},
                     {'opcao': '5', 'nome': 'Pesquisar por Nome', 'handler': 'pesquisar', 'key': 'pesquisar_nome'},
-                    {'opcao': '6', 'nome': 'Remover por ID', 'handler': 'remover'}
+                    {'opcao': '6', 'nome': 'Remover por ID', 'handler': 'remover'},
+                    {'opcao': '7', 'nome': 'Listar Elegíveis a Desconto', 'handler': 'listar', 'key': 'listar_desconto'}
                 ],
                 'insert_fields': ['Nome', 'Sexo (M/F/O)', 'Email', 'CPF', 'Telefone', 'Logradouro', 'Número', 'Complemento', 'Bairro', 'Cidade', 'Estado (UF)', 'CEP'],
                 'prompts': {
@@ -145,7 +164,9 @@ MENU_CONFIG = {
                     'inserir': clinico_queries.INSERIR_CONSULTA,
                     'remover': clinico_queries.REMOVER_CONSULTA,
                     'alterar_status': clinico_queries.ATUALIZAR_CONSULTA,
-                    'pesquisar_paciente': clinico_queries.PESQUISAR_CONSULTA_POR_NOME_PACIENTE
+                    'pesquisar_paciente': clinico_queries.PESQUISAR_CONSULTA_POR_NOME_PACIENTE,
+                    'horarios_livres': clinico_queries.BUSCAR_HORARIOS_LIVRES,
+                    'busca_textual': clinico_queries.BUSCAR_TEXTO_CLINICO
                 },
                 'menu_ops': [
                     {'opcao': '1', 'nome': 'Listar Todas', 'handler': 'listar'},
@@ -153,7 +174,9 @@ MENU_CONFIG = {
                     {'opcao': '3', 'nome': 'Agendar Nova Consulta', 'handler': 'inserir_consulta_interativo'},
                     {'opcao': '4', 'nome': 'Atualizar Status/Diagnóstico', 'handler': 'alterar_consulta_status'},
                     {'opcao': '5', 'nome': 'Pesquisar por Nome do Paciente', 'handler': 'pesquisar', 'key': 'pesquisar_paciente'},
-                    {'opcao': '6', 'nome': 'Remover/Cancelar Consulta', 'handler': 'remover_consulta_seguro'}
+                    {'opcao': '6', 'nome': 'Remover/Cancelar Consulta', 'handler': 'remover_consulta_seguro'},
+                    {'opcao': '7', 'nome': 'Buscar Horários Livres por Especialidade', 'handler': 'buscar_horarios_livres_interativo'},
+                    {'opcao': '8', 'nome': 'Busca Textual (sintomas, diagnósticos, medicamentos)', 'handler': 'busca_textual_interativa'}
                 ],
                 'delete_warning': 'Ao remover esta consulta, as receitas associadas serão PERMANENTEMENTE apagadas.',
                 'prompts': {
@@ -178,7 +201,8 @@ MENU_CONFIG = {
         'relatorios': {
             'detalhes_consultas': {
                 'nome': 'Relatório Detalhado de Consultas',
-                'query': clinico_queries.DETALHES_CONSULTAS
+                'query': clinico_queries.DETALHES_CONSULTAS,
+                'handler': 'relatorio_consultas_interativo'
             }
         }
     },
@@ -199,7 +223,8 @@ MENU_CONFIG = {
                     {'opcao': '2', 'nome': 'Exibir Um por ID', 'handler': 'exibir_um'},
                     {'opcao': '3', 'nome': 'Lançar Novo Pagamento', 'handler': 'inserir_pagamento_interativo'},
                     {'opcao': '4', 'nome': "Marcar como 'Pago'", 'handler': 'marcar_como_pago'},
-                    {'opcao': '5', 'nome': 'Pesquisar por Nome do Paciente', 'handler': 'pesquisar', 'key': 'pesquisar_paciente'}
+                    {'opcao': '5', 'nome': 'Pesquisar por Nome do Paciente', 'handler': 'pesquisar', 'key': 'pesquisar_paciente'},
+                    {'opcao': '6', 'nome': 'Conciliar Arquivo de Liquidação (CSV)', 'handler': 'conciliar_arquivo_interativo'}
                 ],
                 'prompts': {
                     'pesquisar_paciente': 'Digite o nome do paciente'
@@ -218,35 +243,87 @@ def limpar_tela():
 def pausar():
     input("\nPressione Enter para continuar...")
 
+def formatar_linha(celulas, larguras):
+    """Formata uma linha já convertida para texto, cortando (com '…') o que passar da largura."""
+    return " | ".join(
+        f"{c:<{w}}" if len(c) <= w else c[:w - 1] + "…"
+        for c, w in zip(celulas, larguras)
+    )
+
+def formatar_cabecalho(colunas, larguras):
+    return formatar_linha([col.upper() for col in colunas], larguras) + "\n" + "-+-".join("-" * w for w in larguras)
+
 def formatar_resultados(resultados, cursor_description):
     if not resultados: return "Nenhum resultado encontrado."
     
     colunas = [desc[0] for desc in cursor_description]
-    larguras = [len(col) for col in colunas]
-    for linha in resultados:
-        for i, item in enumerate(linha):
-            larguras[i] = max(larguras[i], len(str(item)))
-    
-    cabecalho = " | ".join(f"{col.upper():<{larguras[i]}}" for i, col in enumerate(colunas))
-    separador = "-+-".join("-" * w for w in larguras)
-    
-    linhas_dados = []
-    for linha in resultados:
-        linhas_dados.append(" | ".join(f"{str(item):<{larguras[i]}}" for i, item in enumerate(linha)))
-        
-    return "\n".join([cabecalho, separador] + linhas_dados)
+    celulas = [[str(item) for item in linha] for linha in resultados]
+    larguras = [max([len(col)] + [len(linha[i]) for linha in celulas]) for i, col in enumerate(colunas)]
+    return "\n".join([formatar_cabecalho(colunas, larguras)] + [formatar_linha(linha, larguras) for linha in celulas])
+
+def exibir_paginado(db, query, params=None, tamanho_pagina=TAMANHO_PAGINA_LISTAGEM):
+    """
+    Mostra o resultado da query à medida que as linhas chegam de um cursor no servidor, uma
+    página por vez, sem carregar a tabela inteira. As larguras das colunas vêm da primeira
+    página (limitadas a LARGURA_MAXIMA_COLUNA). Com a saída redirecionada, imprime tudo sem pausas.
+    """
+    interativo = sys.stdin.isatty() and sys.stdout.isatty()
+    paginas = deque(maxlen=HISTORICO_PAGINAS)  # (número da primeira linha, texto) das últimas páginas
+    cabecalho = None
+    total = 0
+
+    lotes = db.stream_query(query, params, tamanho_pagina)
+    try:
+        for description, linhas in lotes:
+            celulas = [[str(item) for item in linha] for linha in linhas]
+            if cabecalho is None:
+                colunas = [desc[0] for desc in description]
+                larguras = [min(max([len(col)] + [len(linha[i]) for linha in celulas]), LARGURA_MAXIMA_COLUNA)
+                            for i, col in enumerate(colunas)]
+                cabecalho = formatar_cabecalho(colunas, larguras)
+                if not interativo:
+                    print(cabecalho)
+
+            paginas.append((total + 1, "\n".join(formatar_linha(linha, larguras) for linha in celulas)))
+            total += len(linhas)
+            if not interativo:
+                print(paginas[-1][1])
+                continue
+
+            posicao = len(paginas) - 1
+            while True:
+                primeira, texto = paginas[posicao]
+                print(cabecalho)
+                print(texto)
+                ultima = primeira + texto.count("\n")
+                escolha = input(f"\n-- linhas {primeira}-{ultima} -- [Enter] próxima | [a] anterior | [s] sair: ").strip().lower()
+                if escolha == 's':
+                    return
+                if escolha == 'a':
+                    if posicao > 0:
+                        posicao -= 1
+                    else:
+                        print("Não há página anterior em memória.")
+                elif posicao < len(paginas) - 1:
+                    posicao += 1
+                else:
+                    break  # busca a próxima página no servidor
+    finally:
+        lotes.close()
+
+    print("Nenhum resultado encontrado." if total == 0 else f"\nFim da listagem: {total} linha(s).")
 
 
 # --- Funções Genéricas de CRUD ---
 
 def listar_registros(db, config, **kwargs):
     print(f"\n--- LISTANDO: {config['nome']} ---")
-    query = config['queries'].get('listar')
+    # Relatórios trazem a query direto em 'query'; tabelas, no dicionário 'queries'
+    query = config.get('query') or config['queries'].get(kwargs.get('key', 'listar'))
     if not query:
         print("Operação não configurada.")
         return
-    resultados, description = db.fetch_query(query)
-    print(formatar_resultados(resultados, description))
+    exibir_paginado(db, query)
 
 def exibir_um_registro(db, config, **kwargs):
     print(f"\n--- EXIBINDO UM: {config['nome']} ---")
@@ -483,16 +560,112 @@ def inserir_consulta_interativo(db, config, **kwargs):
 
     # 3. Pede os dados restantes
     data = input("Data e Hora da consulta (YYYY-MM-DD HH:MM): ")
+    try:
+        duracao = int(input("Duração em minutos (Enter para 30): ") or 30)
+    except ValueError:
+        print("Erro: duração inválida.")
+        return
     motivo = input("Motivo da consulta: ")
     status = "Agendada"
 
-    nova_consulta = (paciente_id, medico_id, data, motivo, status)
+    nova_consulta = (paciente_id, medico_id, data, duracao, motivo, status)
     resultado = db.execute_and_fetch_one(config['queries']['inserir'], nova_consulta)
     
     if resultado:
         print(f"\nConsulta agendada com sucesso! ID: {resultado[0]}")
     else:
-        print("\nFalha ao agendar consulta.")
+        print("\nFalha ao agendar consulta. O médico já pode ter outra consulta nesse horário (use a opção 7).")
+
+def buscar_horarios_livres_interativo(db, config, **kwargs):
+    """Handler especializado para listar os primeiros horários livres de uma especialidade."""
+    print(f"\n--- BUSCAR HORÁRIOS LIVRES ---")
+    resultados, description = db.fetch_query(cadastros_queries.LISTAR_TODAS_ESPECIALIDADES)
+    print(formatar_resultados(resultados, description))
+
+    try:
+        especialidade_id = int(input("\nDigite o ID da Especialidade: "))
+        inicio = input("A partir de (YYYY-MM-DD HH:MM): ")
+        fim = input("Até (YYYY-MM-DD HH:MM): ")
+        duracao = int(input("Duração em minutos (Enter para 30): ") or 30)
+    except ValueError:
+        print("Erro: valor inválido.")
+        return
+
+    resultados, description = db.fetch_query(config['queries']['horarios_livres'], (especialidade_id, inicio, fim, duracao, 10))
+    if resultados:
+        print(formatar_resultados(resultados, description))
+    else:
+        print("\nNenhum horário livre encontrado nessa janela.")
+
+def busca_textual_interativa(db, config, **kwargs):
+    """Handler especializado para a busca textual em consultas e receitas, com paginação."""
+    print(f"\n--- BUSCA TEXTUAL CLÍNICA ---")
+    termos = input("Termos da busca (ex: dor de cabeça -febre): ").strip()
+    if not termos:
+        return print("Nenhum termo informado.")
+
+    pagina = 0
+    while True:
+        # Pede um resultado a mais para saber se existe próxima página
+        resultados, _ = db.fetch_query(config['queries']['busca_textual'], (termos, TAMANHO_PAGINA_BUSCA + 1, pagina * TAMANHO_PAGINA_BUSCA))
+        if resultados is None:
+            return print("\nFalha ao executar a busca.")
+        if not resultados:
+            return print("\nNenhum resultado encontrado.")
+
+        tem_proxima = len(resultados) > TAMANHO_PAGINA_BUSCA
+        print(f"\n--- Página {pagina + 1} ---")
+        for tipo, consulta_id, receita_id, data, paciente, medico, relevancia, trecho in resultados[:TAMANHO_PAGINA_BUSCA]:
+            origem = f"Receita {receita_id} (consulta {consulta_id})" if receita_id else f"Consulta {consulta_id}"
+            print(f"\n[{origem}] {data:%d/%m/%Y %H:%M} | {paciente} | {medico} | relevância {relevancia:.3f}")
+            print(f"    {trecho}")
+
+        opcoes = (["p = próxima"] if tem_proxima else []) + (["a = anterior"] if pagina else []) + ["Enter = sair"]
+        escolha = input(f"\n({', '.join(opcoes)}): ").strip().lower()
+        if escolha == 'p' and tem_proxima:
+            pagina += 1
+        elif escolha == 'a' and pagina:
+            pagina -= 1
+        else:
+            break
+
+def relatorio_consultas_interativo(db, config, **kwargs):
+    """Handler do relatório de consultas: filtros opcionais e paginação da mais recente para a mais antiga."""
+    print(f"\n--- {config['nome'].upper()} ---")
+    hoje = date.today()
+    try:
+        inicio = date.fromisoformat(input(f"Data inicial (Enter para {hoje - timedelta(days=JANELA_RELATORIO_DIAS):%Y-%m-%d}): ").strip()
+                                    or str(hoje - timedelta(days=JANELA_RELATORIO_DIAS)))
+        fim = date.fromisoformat(input(f"Data final (Enter para {hoje + timedelta(days=JANELA_RELATORIO_DIAS):%Y-%m-%d}): ").strip()
+                                 or str(hoje + timedelta(days=JANELA_RELATORIO_DIAS)))
+        status = input("Status (Agendada, Realizada, Cancelada; Enter para todos): ").strip().capitalize() or None
+        medico_id = int(input("ID do médico (Enter para todos): ") or 0) or None
+        especialidade_id = int(input("ID da especialidade (Enter para todas): ") or 0) or None
+    except ValueError:
+        return print("Erro: valor inválido.")
+
+    # Cursor (data, id) do início de cada página visitada, para poder voltar
+    cursores = [(None, None)]
+    while True:
+        resultados, description = db.fetch_query(config['query'], (inicio, fim, status, medico_id, especialidade_id, *cursores[-1], TAMANHO_PAGINA_RELATORIO + 1))
+        if resultados is None:
+            return print("\nFalha ao gerar o relatório.")
+        if not resultados:
+            return print("\nNenhuma consulta encontrada.")
+
+        tem_proxima = len(resultados) > TAMANHO_PAGINA_RELATORIO
+        resultados = resultados[:TAMANHO_PAGINA_RELATORIO]
+        print(f"\n--- Página {len(cursores)} ---")
+        print(formatar_resultados(resultados, description))
+
+        opcoes = (["p = próxima"] if tem_proxima else []) + (["a = anterior"] if len(cursores) > 1 else []) + ["Enter = sair"]
+        escolha = input(f"\n({', '.join(opcoes)}): ").strip().lower()
+        if escolha == 'p' and tem_proxima:
+            cursores.append((resultados[-1][1], resultados[-1][0]))
+        elif escolha == 'a' and len(cursores) > 1:
+            cursores.pop()
+        else:
+            break
 
 def alterar_consulta_status(db, config, **kwargs):
     """Handler especializado para alterar o status e diagnóstico de uma consulta."""
@@ -556,6 +729,30 @@ def marcar_como_pago(db, config, **kwargs):
     else:
         print("\nFalha ao atualizar o pagamento. Verifique se o ID existe.")
 
+def conciliar_arquivo_interativo(db, config, **kwargs):
+    """Handler especializado para quitar em lote os pagamentos de um arquivo de liquidação."""
+    print(f"\n--- CONCILIAÇÃO DE PAGAMENTOS EM LOTE ---")
+    print("O arquivo deve ser um CSV com cabeçalho: consulta_id, valor, data_pagamento e, opcionalmente, metodo.")
+    caminho = input("Caminho do arquivo: ").strip()
+    delimitador = input("Separador (Enter para ','): ") or ','
+    try:
+        dias_antecedencia = int(input("Aceitar liquidações até quantos dias antes da consulta? (Enter para 30): ") or 30)
+    except ValueError:
+        return print("Erro: número de dias inválido.")
+
+    try:
+        with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+            linhas_lidas, nao_conciliadas, description = conciliar_arquivo(db, arquivo, dias_antecedencia, delimitador)
+    except OSError as e:
+        return print(f"Erro ao abrir o arquivo: {e}")
+
+    if linhas_lidas is None:
+        return print("\nFalha na conciliação. Nenhum pagamento foi alterado.")
+    print(f"\n{linhas_lidas - len(nao_conciliadas)} de {linhas_lidas} linha(s) conciliada(s).")
+    if nao_conciliadas:
+        print("\nLinhas não conciliadas:")
+        print(formatar_resultados(nao_conciliadas, description))
+
 def inserir_medico_interativo(db, config, **kwargs):
     """Handler especializado para inserir um novo médico de forma interativa."""
     print(f"\n--- INSERINDO NOVO MÉDICO ---")
@@ -657,9 +854,13 @@ CRUD_HANDLERS = {
     'exibir_um_perfil_interativo': exibir_um_perfil_interativo,
     'remover_consulta_seguro': remover_consulta_seguro,
     'inserir_consulta_interativo': inserir_consulta_interativo,
+    'buscar_horarios_livres_interativo': buscar_horarios_livres_interativo,
+    'busca_textual_interativa': busca_textual_interativa,
+    'relatorio_consultas_interativo': relatorio_consultas_interativo,
     'alterar_consulta_status': alterar_consulta_status,
     'inserir_pagamento_interativo': inserir_pagamento_interativo, 
     'marcar_como_pago': marcar_como_pago,
+    'conciliar_arquivo_interativo': conciliar_arquivo_interativo,
     'inserir_medico_interativo': inserir_medico_interativo,
     'inserir_funcionario_interativo': inserir_funcionario_interativo,
 }
@@ -726,8 +927,9 @@ def menu_tabelas(db, schema_key):
             try:
                 idx = int(escolha[1:]) - 1
                 if 0 <= idx < len(opcoes_relatorio):
-                    key = opcoes_relatorio[idx]
-                    listar_registros(db, relatorios[key]) # Reutiliza a função de listar
+                    relatorio = relatorios[opcoes_relatorio[idx]]
+                    # Relatórios com filtros/paginação têm handler próprio; os demais reutilizam a função de listar
+                    CRUD_HANDLERS.get(relatorio.get('handler'), listar_registros)(db, relatorio)
                     pausar()
             except (ValueError, IndexError):
                 print("Opção de relatório inválida!"); pausar()
@@ -763,9 +965,142 @@ def menu_principal(db):
         except ValueError: print("Opção inválida!"); pausar()
     print("Saindo do sistema...")
 
+
+# --- Modo Script (não interativo) ---
+
+def resolver_operacao(nome):
+    """
+    Traduz 'tabela.operacao' (ex: pacientes.alterar_telefone) ou 'relatorios.<relatório>'
+    para a query correspondente do MENU_CONFIG; retorna None se não existir.
+    """
+    tabela, _, operacao = nome.partition('.')
+    for config_schema in MENU_CONFIG.values():
+        if tabela == 'relatorios' and operacao in config_schema.get('relatorios', {}):
+            return config_schema['relatorios'][operacao]['query']
+        config_tabela = config_schema.get('tabelas', {}).get(tabela)
+        if config_tabela and operacao in config_tabela['queries']:
+            return config_tabela['queries'][operacao]
+    return None
+
+def ler_operacoes(arquivo):
+    """
+    Lê uma operação por linha: 'tabela.operacao parametro1 parametro2 ...', com os parâmetros na
+    ordem dos %s da query (aspas para textos com espaço, NULL para nulo). Linhas vazias e
+    comentários (#) são ignorados. Gera (número da linha, operação, query, parâmetros, erro).
+    """
+    for numero, linha in enumerate(arquivo, start=1):
+        linha = linha.strip()
+        if not linha or linha.startswith('#'):
+            continue
+        try:
+            nome, *parametros = shlex.split(linha)
+        except ValueError as e:
+            yield numero, linha, None, None, f"Linha inválida: {e}"
+            continue
+        parametros = tuple(None if p == 'NULL' else p for p in parametros)
+        query = resolver_operacao(nome)
+        if query is None:
+            yield numero, nome, None, None, "Operação desconhecida."
+        elif query.count('%s') != len(parametros):
+            yield numero, nome, None, None, f"A operação espera {query.count('%s')} parâmetro(s), recebeu {len(parametros)}."
+        else:
+            yield numero, nome, query, parametros, None
+
+def executar_script(db, arquivo, operacoes_por_transacao=100, parar_no_erro=False, saida=sys.stdout):
+    """
+    Executa as operações de um arquivo de script em uma única conexão, agrupadas em transações de
+    até operacoes_por_transacao operações. Um erro desfaz a transação inteira em que ocorreu
+    (as demais operações dela são marcadas como 'desfeita'); as transações seguintes continuam,
+    a menos que parar_no_erro. Operações inválidas (desconhecidas ou com o número errado de
+    parâmetros) são rejeitadas sem ir ao banco e sem afetar a transação. Escreve um resultado
+    JSON por operação em saida (na ordem em que cada transação termina) e retorna o número de
+    operações que falharam ou foram desfeitas.
+    """
+    contagem = {'ok': 0, 'erro': 0, 'desfeita': 0}
+    pendentes = []  # resultados da transação aberta, emitidos só após o COMMIT/ROLLBACK
+    inicio = time.perf_counter()
+
+    def emitir(resultado):
+        contagem[resultado['status']] += 1
+        saida.write(json.dumps(resultado, ensure_ascii=False, default=str) + "\n")
+
+    def encerrar_transacao(erro=None):
+        if erro is None:
+            db.conn.commit()
+        else:
+            db.conn.rollback()
+        for resultado in pendentes:
+            if erro is not None:
+                resultado = {**resultado, 'status': 'desfeita'}
+                resultado.pop('linhas', None)
+            emitir(resultado)
+        pendentes.clear()
+
+    with db.conn.cursor() as cur:
+        for numero, nome, query, parametros, erro in ler_operacoes(arquivo):
+            if erro:
+                emitir({'linha': numero, 'operacao': nome, 'status': 'erro', 'erro': erro})
+                if parar_no_erro:
+                    break
+                continue
+            try:
+                cur.execute(query, parametros)
+            except psycopg2.Error as e:
+                encerrar_transacao(erro=e)
+                emitir({'linha': numero, 'operacao': nome, 'status': 'erro', 'erro': str(e).strip()})
+                if parar_no_erro:
+                    break
+                continue
+
+            resultado = {'linha': numero, 'operacao': nome, 'status': 'ok', 'linhas_afetadas': cur.rowcount}
+            if cur.description:
+                colunas = [d[0] for d in cur.description]
+                resultado['linhas'] = [dict(zip(colunas, linha)) for linha in cur.fetchall()]
+            pendentes.append(resultado)
+            if len(pendentes) >= operacoes_por_transacao:
+                encerrar_transacao()
+        if pendentes:
+            encerrar_transacao()
+
+    print(f"{sum(contagem.values())} operação(ões) em {time.perf_counter() - inicio:.1f}s: "
+          f"{contagem['ok']} ok, {contagem['erro']} com erro, {contagem['desfeita']} desfeita(s).", file=sys.stderr)
+    return contagem['erro'] + contagem['desfeita']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sistema de Gestão da Clínica (console).")
+    parser.add_argument('--script', metavar='ARQUIVO',
+                        help="Executa as operações do arquivo (ou '-' para a entrada padrão) sem menus, "
+                             "uma por linha, e escreve um resultado JSON por operação.")
+    parser.add_argument('--transacao', type=int, default=100,
+                        help="Operações por transação no modo script (padrão: 100).")
+    parser.add_argument('--parar-no-erro', action='store_true',
+                        help="No modo script, interrompe na primeira operação com erro.")
+    args = parser.parse_args()
+
+    if not args.script:
+        db = DatabaseManager()
+        db.connect()
+        if db.conn:
+            db.execute_query(manutencao_queries.GARANTIR_PARTICOES)
+            menu_principal(db)
+            db.disconnect()
+        return
+
+    # No modo script a saída padrão é só dos resultados JSON; as mensagens vão para stderr
+    db = DatabaseManager(cache_entidades=False)
+    with contextlib.redirect_stdout(sys.stderr):
+        db.connect()
+        if not db.conn:
+            sys.exit(2)
+        db.execute_query(manutencao_queries.GARANTIR_PARTICOES)
+    try:
+        with (sys.stdin if args.script == '-' else open(args.script, encoding='utf-8')) as arquivo:
+            falhas = executar_script(db, arquivo, max(args.transacao, 1), args.parar_no_erro)
+    finally:
+        with contextlib.redirect_stdout(sys.stderr):
+            db.disconnect()
+    sys.exit(1 if falhas else 0)
+
 if __name__ == "__main__":
-    db = DatabaseManager()
-    db.connect()
-    if db.conn:
-        menu_principal(db)
-        db.disconnect()
\ No newline at end of file
+    main()
\ No newline at end of file
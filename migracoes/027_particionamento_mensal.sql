@@ -0,0 +1,446 @@
+-- =============================================================================
+-- MIGRAÇÃO: PARTICIONAMENTO MENSAL DE VENDAS E CONSULTAS
+-- Descrição: Converte um banco criado com a versão anterior de schema_clinica.sql
+--            (vendas.vendas, vendas.itens_venda e clinico.consultas sem partições)
+--            para o particionamento mensal por data, preservando todos os dados.
+--            Bancos novos não precisam desta migração: basta executar schema_clinica.sql.
+-- Uso: psql -U seu_usuario_aqui -d clinica_db -f migracoes/027_particionamento_mensal.sql
+-- =============================================================================
+
+BEGIN;
+
+-- 0. PRÉ-REQUISITO: ELEGIBILIDADE AO DESCONTO USADA POR efetivar_compra (recriada no passo 10)
+
+ALTER TABLE cadastros.pacientes
+    ADD COLUMN IF NOT EXISTS tem_desconto BOOLEAN GENERATED ALWAYS AS (
+        COALESCE(torce_flamengo, FALSE) OR COALESCE(assiste_one_piece, FALSE) OR COALESCE(nasceu_sousa, FALSE)
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_pacientes_com_desconto ON cadastros.pacientes(id) INCLUDE (nome, email, telefone) WHERE tem_desconto;
+
+CREATE OR REPLACE FUNCTION cadastros.cliente_tem_desconto(
+    p_cliente_id INTEGER
+)
+RETURNS BOOLEAN
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE((SELECT tem_desconto FROM cadastros.pacientes WHERE id = p_cliente_id), FALSE);
+$$;
+
+-- 1. SCHEMA E FUNÇÕES DE MANUTENÇÃO DAS PARTIÇÕES
+
+CREATE SCHEMA IF NOT EXISTS manutencao;
+COMMENT ON SCHEMA manutencao IS 'Schema para rotinas de manutenção do banco, como a criação das partições mensais.';
+
+CREATE OR REPLACE FUNCTION manutencao.criar_particoes_mensais(
+    p_tabela REGCLASS,
+    p_inicio DATE,
+    p_fim DATE
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_schema TEXT;
+    v_nome TEXT;
+    v_coluna TEXT;
+    v_padrao REGCLASS;
+    v_mes DATE := date_trunc('month', p_inicio)::date;
+    v_proximo DATE;
+    v_particao TEXT;
+    v_ocupado BOOLEAN;
+    v_criadas INTEGER := 0;
+BEGIN
+    SELECT n.nspname, c.relname INTO v_schema, v_nome
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = p_tabela;
+
+    -- Coluna usada como chave de partição (data ou data_venda)
+    SELECT a.attname INTO v_coluna
+    FROM pg_partitioned_table pt
+    JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+    WHERE pt.partrelid = p_tabela;
+
+    v_padrao := to_regclass(format('%I.%I', v_schema, v_nome || '_padrao'));
+
+    WHILE v_mes <= date_trunc('month', p_fim)::date LOOP
+        v_proximo := (v_mes + INTERVAL '1 month')::date;
+        v_particao := v_nome || '_' || to_char(v_mes, 'YYYY_MM');
+
+        IF to_regclass(format('%I.%I', v_schema, v_particao)) IS NULL THEN
+            -- Se a partição padrão já recebeu linhas deste mês, o PostgreSQL não permite criar a partição.
+            -- Nesse caso as linhas continuam na partição padrão e o mês é apenas sinalizado.
+            v_ocupado := FALSE;
+            IF v_padrao IS NOT NULL THEN
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %s WHERE %I >= %L AND %I < %L)',
+                               v_padrao, v_coluna, v_mes, v_coluna, v_proximo)
+                INTO v_ocupado;
+            END IF;
+
+            IF v_ocupado THEN
+                RAISE NOTICE 'Partição % não criada: a partição padrão já contém linhas deste mês.', v_particao;
+            ELSE
+                EXECUTE format('CREATE TABLE %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                               v_schema, v_particao, p_tabela, v_mes, v_proximo);
+                v_criadas := v_criadas + 1;
+            END IF;
+        END IF;
+
+        v_mes := v_proximo;
+    END LOOP;
+
+    RETURN v_criadas;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION manutencao.garantir_particoes(
+    p_inicio DATE DEFAULT CURRENT_DATE,
+    p_meses_a_frente INTEGER DEFAULT 12
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_tabela REGCLASS;
+    v_fim DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => p_meses_a_frente))::date;
+    v_criadas INTEGER := 0;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY['vendas.vendas', 'vendas.itens_venda', 'clinico.consultas']::REGCLASS[] LOOP
+        v_criadas := v_criadas + manutencao.criar_particoes_mensais(v_tabela, p_inicio, v_fim);
+    END LOOP;
+    RETURN v_criadas;
+END;
+$$;
+
+
+-- 2. REMOVE OS OBJETOS QUE DEPENDEM DAS TABELAS ANTIGAS
+
+DROP VIEW IF EXISTS vendas.vendas_por_vendedor_mes;
+
+ALTER TABLE vendas.itens_venda
+    DROP CONSTRAINT IF EXISTS fk_itens_venda_venda,
+    DROP CONSTRAINT IF EXISTS itens_venda_venda_id_fkey;
+
+ALTER TABLE clinico.receitas
+    DROP CONSTRAINT IF EXISTS fk_receitas_consulta,
+    DROP CONSTRAINT IF EXISTS receitas_consulta_id_fkey;
+
+ALTER TABLE financeiro.pagamentos
+    DROP CONSTRAINT IF EXISTS fk_pagamentos_consulta,
+    DROP CONSTRAINT IF EXISTS pagamentos_consulta_id_fkey;
+
+-- 3. RENOMEIA AS TABELAS ANTIGAS (os dados são copiados e elas são removidas no passo 7)
+
+ALTER TABLE vendas.itens_venda RENAME TO itens_venda_antiga;
+ALTER TABLE vendas.vendas RENAME TO vendas_antiga;
+ALTER TABLE clinico.consultas RENAME TO consultas_antiga;
+
+ALTER INDEX vendas.itens_venda_pkey RENAME TO itens_venda_antiga_pkey;
+ALTER INDEX vendas.vendas_pkey RENAME TO vendas_antiga_pkey;
+ALTER INDEX clinico.consultas_pkey RENAME TO consultas_antiga_pkey;
+
+DROP INDEX IF EXISTS vendas.idx_vendas_cliente, vendas.idx_vendas_vendedor, vendas.idx_vendas_data,
+    vendas.idx_itens_venda_venda, vendas.idx_itens_venda_produto,
+    clinico.idx_consultas_paciente, clinico.idx_consultas_medico,
+    clinico.idx_consultas_funcionario, clinico.idx_consultas_data;
+
+-- As sequências continuam as mesmas, para que os próximos ids sigam a numeração atual
+ALTER SEQUENCE vendas.itens_venda_id_seq OWNED BY NONE;
+ALTER SEQUENCE vendas.vendas_id_seq OWNED BY NONE;
+ALTER SEQUENCE clinico.consultas_id_seq OWNED BY NONE;
+
+-- 4. CRIA AS TABELAS PARTICIONADAS (mesma estrutura de schema_clinica.sql)
+
+CREATE TABLE clinico.consultas (
+    id INTEGER NOT NULL DEFAULT nextval('clinico.consultas_id_seq'),
+    paciente_id INTEGER NOT NULL REFERENCES cadastros.pacientes(id) ON DELETE CASCADE,
+    medico_id INTEGER NOT NULL REFERENCES cadastros.medicos(id) ON DELETE RESTRICT,
+    funcionario_id INTEGER REFERENCES cadastros.funcionarios(id) ON DELETE SET NULL,
+    data TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    motivo TEXT,
+    diagnostico TEXT,
+    status VARCHAR(20) DEFAULT 'Agendada' CHECK (status IN ('Agendada', 'Realizada', 'Cancelada')),
+    PRIMARY KEY (id, data)
+) PARTITION BY RANGE (data);
+
+CREATE TABLE vendas.vendas (
+    id INTEGER NOT NULL DEFAULT nextval('vendas.vendas_id_seq'),
+    cliente_id INTEGER NOT NULL REFERENCES cadastros.pacientes(id) ON DELETE RESTRICT,
+    vendedor_id INTEGER NOT NULL REFERENCES cadastros.funcionarios(id) ON DELETE RESTRICT,
+    data TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    total_bruto NUMERIC(12,2) NOT NULL CHECK (total_bruto >= 0),
+    desconto_aplicado NUMERIC(12,2) NOT NULL CHECK (desconto_aplicado >= 0),
+    total_liquido NUMERIC(12,2) NOT NULL CHECK (total_liquido >= 0),
+    forma_pagamento VARCHAR(30) NOT NULL CHECK (forma_pagamento IN ('Dinheiro','Cartão','Boleto','PIX','Berries')),
+    status_pagamento VARCHAR(30) NOT NULL DEFAULT 'Pendente' CHECK (status_pagamento IN ('Pendente','Confirmado','Falhado')),
+    PRIMARY KEY (id, data)
+) PARTITION BY RANGE (data);
+
+CREATE TABLE vendas.itens_venda (
+    id INTEGER NOT NULL DEFAULT nextval('vendas.itens_venda_id_seq'),
+    venda_id INTEGER NOT NULL,
+    data_venda TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    produto_id INTEGER NOT NULL REFERENCES vendas.produtos(id) ON DELETE RESTRICT,
+    quantidade INTEGER NOT NULL CHECK (quantidade > 0),
+    preco_unitario NUMERIC(12,2) NOT NULL CHECK (preco_unitario >= 0),
+    PRIMARY KEY (id, data_venda)
+) PARTITION BY RANGE (data_venda);
+
+ALTER SEQUENCE clinico.consultas_id_seq OWNED BY clinico.consultas.id;
+ALTER SEQUENCE vendas.vendas_id_seq OWNED BY vendas.vendas.id;
+ALTER SEQUENCE vendas.itens_venda_id_seq OWNED BY vendas.itens_venda.id;
+
+CREATE TABLE vendas.vendas_padrao PARTITION OF vendas.vendas DEFAULT;
+CREATE TABLE vendas.itens_venda_padrao PARTITION OF vendas.itens_venda DEFAULT;
+CREATE TABLE clinico.consultas_padrao PARTITION OF clinico.consultas DEFAULT;
+
+-- Partições mensais desde o registro mais antigo até 12 meses à frente
+SELECT manutencao.garantir_particoes(LEAST(
+    (SELECT MIN(data)::date FROM vendas.vendas_antiga),
+    (SELECT MIN(data)::date FROM clinico.consultas_antiga),
+    CURRENT_DATE
+));
+
+-- 5. COPIA OS DADOS (cada linha é direcionada para a partição do seu mês)
+
+INSERT INTO clinico.consultas (id, paciente_id, medico_id, funcionario_id, data, motivo, diagnostico, status)
+SELECT id, paciente_id, medico_id, funcionario_id, data, motivo, diagnostico, status
+FROM clinico.consultas_antiga;
+
+INSERT INTO vendas.vendas (id, cliente_id, vendedor_id, data, total_bruto, desconto_aplicado, total_liquido, forma_pagamento, status_pagamento)
+SELECT id, cliente_id, vendedor_id, data, total_bruto, desconto_aplicado, total_liquido, forma_pagamento, status_pagamento
+FROM vendas.vendas_antiga;
+
+INSERT INTO vendas.itens_venda (id, venda_id, data_venda, produto_id, quantidade, preco_unitario)
+SELECT iv.id, iv.venda_id, v.data, iv.produto_id, iv.quantidade, iv.preco_unitario
+FROM vendas.itens_venda_antiga iv
+JOIN vendas.vendas_antiga v ON v.id = iv.venda_id;
+
+-- 6. RECEITAS E PAGAMENTOS PASSAM A GUARDAR A DATA DA CONSULTA (parte da chave estrangeira)
+
+ALTER TABLE clinico.receitas ADD COLUMN IF NOT EXISTS data_consulta TIMESTAMP WITHOUT TIME ZONE;
+UPDATE clinico.receitas r SET data_consulta = c.data
+FROM clinico.consultas_antiga c
+WHERE c.id = r.consulta_id;
+ALTER TABLE clinico.receitas ALTER COLUMN data_consulta SET NOT NULL;
+
+ALTER TABLE financeiro.pagamentos ADD COLUMN IF NOT EXISTS data_consulta TIMESTAMP WITHOUT TIME ZONE;
+UPDATE financeiro.pagamentos pg SET data_consulta = c.data
+FROM clinico.consultas_antiga c
+WHERE c.id = pg.consulta_id;
+ALTER TABLE financeiro.pagamentos ALTER COLUMN data_consulta SET NOT NULL;
+
+-- 7. REMOVE AS TABELAS ANTIGAS
+
+DROP TABLE vendas.itens_venda_antiga;
+DROP TABLE vendas.vendas_antiga;
+DROP TABLE clinico.consultas_antiga;
+
+-- 8. ÍNDICES E CHAVES ESTRANGEIRAS (mesmos nomes de schema_clinica.sql)
+
+CREATE INDEX idx_vendas_cliente ON vendas.vendas(cliente_id);
+CREATE INDEX idx_vendas_vendedor ON vendas.vendas(vendedor_id);
+CREATE INDEX idx_vendas_data ON vendas.vendas(data);
+
+CREATE INDEX idx_itens_venda_venda ON vendas.itens_venda(venda_id);
+CREATE INDEX idx_itens_venda_produto ON vendas.itens_venda(produto_id);
+
+CREATE INDEX idx_consultas_paciente ON clinico.consultas(paciente_id);
+CREATE INDEX idx_consultas_medico ON clinico.consultas(medico_id);
+CREATE INDEX idx_consultas_funcionario ON clinico.consultas(funcionario_id);
+CREATE INDEX idx_consultas_data ON clinico.consultas(data);
+
+ALTER TABLE vendas.itens_venda
+ADD CONSTRAINT fk_itens_venda_venda FOREIGN KEY (venda_id, data_venda)
+REFERENCES vendas.vendas(id, data)
+ON DELETE CASCADE ON UPDATE CASCADE;
+
+ALTER TABLE clinico.receitas
+ADD CONSTRAINT fk_receitas_consulta FOREIGN KEY (consulta_id, data_consulta)
+REFERENCES clinico.consultas(id, data)
+ON DELETE CASCADE ON UPDATE CASCADE;
+
+ALTER TABLE financeiro.pagamentos
+ADD CONSTRAINT fk_pagamentos_consulta FOREIGN KEY (consulta_id, data_consulta)
+REFERENCES clinico.consultas(id, data)
+ON DELETE RESTRICT ON UPDATE CASCADE;
+
+-- 9. TRIGGERS QUE PREENCHEM data_consulta
+
+CREATE OR REPLACE FUNCTION clinico.preencher_data_consulta()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.data_consulta IS NULL
+       OR (TG_OP = 'UPDATE' AND NEW.consulta_id IS DISTINCT FROM OLD.consulta_id) THEN
+        SELECT c.data INTO NEW.data_consulta
+        FROM clinico.consultas c
+        WHERE c.id = NEW.consulta_id;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER trg_receitas_data_consulta
+BEFORE INSERT OR UPDATE OF consulta_id ON clinico.receitas
+FOR EACH ROW EXECUTE FUNCTION clinico.preencher_data_consulta();
+
+CREATE TRIGGER trg_pagamentos_data_consulta
+BEFORE INSERT OR UPDATE OF consulta_id ON financeiro.pagamentos
+FOR EACH ROW EXECUTE FUNCTION clinico.preencher_data_consulta();
+
+-- 10. RECRIA A VIEW E AS FUNÇÕES QUE USAM AS TABELAS PARTICIONADAS
+
+CREATE OR REPLACE FUNCTION vendas.consultar_vendas_cliente(
+    p_cliente_id INTEGER
+)
+RETURNS TABLE(
+    venda_id INTEGER,
+    data_venda TIMESTAMP,
+    total_bruto NUMERIC,
+    desconto_aplicado NUMERIC,
+    total_liquido NUMERIC,
+    forma_pagamento VARCHAR,
+    status_pagamento VARCHAR,
+    itens JSONB
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT 
+        v.id AS venda_id,
+        v.data AS data_venda,
+        v.total_bruto,
+        v.desconto_aplicado,
+        v.total_liquido,
+        v.forma_pagamento,
+        v.status_pagamento,
+        (
+            SELECT jsonb_agg(
+                jsonb_build_object(
+                    'produto_id', iv.produto_id,
+                    'nome_produto', p.nome,
+                    'quantidade', iv.quantidade,
+                    'preco_unitario', iv.preco_unitario
+                )
+            )
+            FROM vendas.itens_venda iv
+            JOIN vendas.produtos p ON p.id = iv.produto_id
+            WHERE iv.venda_id = v.id AND iv.data_venda = v.data
+        ) AS itens
+    FROM vendas.vendas v
+    WHERE v.cliente_id = p_cliente_id
+    ORDER BY v.data DESC;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE VIEW vendas.vendas_por_vendedor_mes AS
+SELECT
+    date_trunc('month', v.data)::date AS mes,
+    f.nome AS vendedor,
+    COUNT(DISTINCT v.id) AS total_vendas,
+    SUM(iv.quantidade) AS total_produtos_vendidos,
+    SUM(v.total_liquido) AS valor_total_vendido,
+    -- Calcula o Ticket Médio (valor total / número de vendas)
+    (SUM(v.total_liquido) / COUNT(DISTINCT v.id)) AS ticket_medio
+FROM
+    vendas.vendas v
+JOIN
+    cadastros.funcionarios f ON v.vendedor_id = f.id
+LEFT JOIN 
+    vendas.itens_venda iv ON v.id = iv.venda_id AND iv.data_venda = v.data
+GROUP BY
+    mes, vendedor
+ORDER BY
+    mes DESC, valor_total_vendido DESC;
+
+CREATE OR REPLACE FUNCTION vendas.efetivar_compra(
+    p_cliente_id INTEGER,
+    p_vendedor_id INTEGER,
+    p_forma_pagamento VARCHAR,
+    p_itens JSONB,
+    p_status_pagamento VARCHAR
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    total_bruto_venda NUMERIC(12,2);
+    desconto_venda NUMERIC(12,2) := 0;
+    total_liquido_venda NUMERIC(12,2);
+    nova_venda_id INTEGER;
+    data_hora_venda TIMESTAMP := CURRENT_TIMESTAMP;
+    cliente_tem_desconto BOOLEAN;
+    produto_sem_estoque RECORD;
+BEGIN
+    -- 1. Cria uma tabela temporária para armazenar e manipular os itens do carrinho.
+    --    Esta tabela só existe durante esta transação.
+    CREATE TEMP TABLE itens_carrinho (
+        produto_id INTEGER,
+        quantidade INTEGER,
+        preco_unitario NUMERIC
+    ) ON COMMIT DROP;
+
+    -- 2. Insere os itens do JSON na tabela temporária.
+    INSERT INTO itens_carrinho (produto_id, quantidade, preco_unitario)
+    SELECT produto_id, quantidade, preco_unitario
+    FROM jsonb_to_recordset(p_itens) AS x(produto_id INTEGER, quantidade INTEGER, preco_unitario NUMERIC);
+
+    -- 3. Verifica o estoque de TODOS os produtos de uma só vez.
+    --    Se encontrar algum problema, armazena os detalhes e lança uma exceção.
+    SELECT
+        carrinho.produto_id,
+        carrinho.quantidade AS solicitado,
+        est.quantidade AS disponivel
+    INTO produto_sem_estoque
+    FROM itens_carrinho carrinho
+    LEFT JOIN vendas.estoque est ON carrinho.produto_id = est.produto_id
+    WHERE est.quantidade IS NULL OR est.quantidade < carrinho.quantidade
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION 'Produto ID % sem estoque suficiente. Disponível: %, Solicitado: %',
+            produto_sem_estoque.produto_id,
+            COALESCE(produto_sem_estoque.disponivel, 0),
+            produto_sem_estoque.solicitado;
+    END IF;
+
+    -- 4. Calcula o total bruto a partir da tabela temporária.
+    SELECT SUM(quantidade * preco_unitario) INTO total_bruto_venda FROM itens_carrinho;
+
+    -- 5. Verifica e aplica o desconto.
+    cliente_tem_desconto := cadastros.cliente_tem_desconto(p_cliente_id);
+
+    IF cliente_tem_desconto THEN
+        desconto_venda := total_bruto_venda * 0.10;
+    END IF;
+    total_liquido_venda := total_bruto_venda - desconto_venda;
+
+    -- 6. Insere o registro principal da venda.
+    INSERT INTO vendas.vendas (cliente_id, vendedor_id, data, total_bruto, desconto_aplicado, total_liquido, forma_pagamento, status_pagamento)
+    VALUES (p_cliente_id, p_vendedor_id, data_hora_venda, total_bruto_venda, desconto_venda, total_liquido_venda, p_forma_pagamento, p_status_pagamento)
+    RETURNING id INTO nova_venda_id;
+
+    -- 7. Insere os itens da venda a partir da tabela temporária (na mesma partição mensal da venda).
+    INSERT INTO vendas.itens_venda (venda_id, data_venda, produto_id, quantidade, preco_unitario)
+    SELECT nova_venda_id, data_hora_venda, produto_id, quantidade, preco_unitario FROM itens_carrinho;
+
+    -- 8. ATUALIZA O ESTOQUE de todos os produtos de uma só vez.
+    UPDATE vendas.estoque AS e
+    SET quantidade = e.quantidade - c.quantidade
+    FROM itens_carrinho AS c
+    WHERE e.produto_id = c.produto_id;
+
+    -- checar se todas as linhas foram atualizadas (número de linhas afetadas deve ser igual ao número de itens)
+    IF (SELECT COUNT(*) FROM itens_carrinho) <> (SELECT COUNT(*) FROM vendas.estoque e2 JOIN itens_carrinho c2 ON e2.produto_id = c2.produto_id) THEN
+        RAISE EXCEPTION 'Falha ao atualizar estoque para todos os itens da venda.';
+    END IF;
+
+    -- 9. Retorna o ID da nova venda.
+    RETURN nova_venda_id;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,238 @@
+# Classes para receber notificações do banco (LISTEN/NOTIFY) em segundo plano
+
+import json
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2 import sql
+from db_config import DB_SETTINGS
+from queries import vendas_queries
+
+CANAL_ESTOQUE_BAIXO = 'estoque_baixo'
+CANAL_ALTERACOES = 'alteracoes_tabelas'
+CANAL_PACIENTES = 'pacientes_alterados'
+
+
+class OuvinteNotificacoes:
+    """
+    Escuta canais do PostgreSQL em uma thread própria, com conexão exclusiva, e repassa
+    cada notificação aos callbacks registrados para o canal.
+    """
+
+    def __init__(self, settings=None, intervalo_reconexao=5):
+        self.settings = settings or DB_SETTINGS
+        self.intervalo_reconexao = intervalo_reconexao
+        self.callbacks = {}
+        self.callbacks_conexao = []
+        self.tarefas = []
+        self._parar = threading.Event()
+        self._thread = None
+
+    def registrar(self, canal, callback):
+        """Registra callback(payload) para um canal. Deve ser chamado antes de iniciar()."""
+        self.callbacks.setdefault(canal, []).append(callback)
+
+    def ao_conectar(self, callback):
+        """
+        Registra callback(conn), chamado após cada (re)conexão, já com os LISTEN ativos.
+        Notificações emitidas enquanto o ouvinte estava desconectado são perdidas, então é
+        aqui que os consumidores devem recarregar seu estado.
+        """
+        self.callbacks_conexao.append(callback)
+
+    def a_cada(self, segundos, callback):
+        """
+        Registra callback(conn), chamado na thread do ouvinte a cada `segundos` (a primeira vez logo
+        após conectar), para rotinas de manutenção que não devem depender de um agendador externo.
+        Deve ser chamado antes de iniciar().
+        """
+        self.tarefas.append([segundos, callback, 0.0])
+
+    def _executar_tarefas(self, conn):
+        agora = time.monotonic()
+        for tarefa in self.tarefas:
+            segundos, callback, proxima = tarefa
+            if agora >= proxima:
+                tarefa[2] = agora + segundos
+                self._chamar(callback, conn)
+
+    def iniciar(self):
+        """Inicia a thread do ouvinte (daemon: termina junto com o processo)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="ouvinte-db", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """Sinaliza a thread para encerrar e aguarda o término."""
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+
+    def _chamar(self, callback, *args):
+        # Um callback com erro não pode derrubar a thread do ouvinte
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Erro ao processar notificação: {e}")
+
+    def _executar(self):
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.settings)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    for canal in self.callbacks:
+                        cur.execute(sql.SQL("LISTEN {};").format(sql.Identifier(canal)))
+                for callback in self.callbacks_conexao:
+                    self._chamar(callback, conn)
+
+                while not self._parar.is_set():
+                    self._executar_tarefas(conn)
+                    # Espera até 1 s por dados na conexão para poder verificar o sinal de parada
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notificacao = conn.notifies.pop(0)
+                        for callback in self.callbacks.get(notificacao.channel, []):
+                            self._chamar(callback, notificacao.payload)
+            except (psycopg2.Error, OSError) as e:
+                print(f"Ouvinte de notificações desconectado: {e}. Nova tentativa em {self.intervalo_reconexao}s.")
+                self._parar.wait(self.intervalo_reconexao)
+            finally:
+                if conn:
+                    conn.close()
+
+
+class MonitorEstoqueBaixo:
+    """
+    Lista, em memória, dos produtos abaixo do ponto de reposição. É carregada uma vez por
+    conexão do ouvinte e depois mantida apenas pelas notificações do canal "estoque_baixo",
+    sem consultas periódicas ao banco.
+    """
+
+    def __init__(self, ouvinte):
+        self._produtos = {}
+        self._lock = threading.Lock()
+        ouvinte.registrar(CANAL_ESTOQUE_BAIXO, self._ao_notificar)
+        ouvinte.ao_conectar(self._recarregar)
+
+    def _recarregar(self, conn):
+        with conn.cursor() as cur:
+            cur.execute(vendas_queries.BUSCAR_PRODUTOS_ESTOQUE_BAIXO)
+            colunas = [d[0] for d in cur.description]
+            produtos = {linha[0]: dict(zip(colunas, linha)) for linha in cur.fetchall()}
+        with self._lock:
+            self._produtos = produtos
+
+    def _ao_notificar(self, payload):
+        produto = json.loads(payload)
+        abaixo = produto.pop('abaixo')
+        with self._lock:
+            if produto['id'] is None:
+                # Catálogo esvaziado (TRUNCATE)
+                self._produtos = {}
+            elif abaixo:
+                self._produtos[produto['id']] = produto
+            else:
+                self._produtos.pop(produto['id'], None)
+
+    def listar(self):
+        """Retorna os produtos em estoque baixo, do menor estoque para o maior."""
+        with self._lock:
+            return sorted(self._produtos.values(), key=lambda p: p['quantidade'])
+
+
+class InvalidadorCache:
+    """
+    Limpa caches quando as tabelas das quais dependem são alteradas, por este ou por
+    qualquer outro processo (Streamlit ou console), a partir das notificações do canal
+    "alteracoes_tabelas". Aceita qualquer objeto com método clear(), como as funções
+    decoradas com st.cache_data.
+    """
+
+    def __init__(self, ouvinte):
+        self._dependencias = {}
+        self._lock = threading.Lock()
+        ouvinte.registrar(CANAL_ALTERACOES, self._ao_notificar)
+        # Alterações feitas enquanto o ouvinte estava desconectado não são notificadas
+        ouvinte.ao_conectar(lambda conn: self.limpar_tudo())
+
+    def registrar(self, cache, tabelas):
+        """
+        Associa o cache às tabelas ('schema.tabela'). O registro é indexado pelo nome
+        qualificado do cache, então pode ser repetido a cada execução do script sem duplicar.
+        """
+        chave = f"{getattr(cache, '__module__', '')}.{getattr(cache, '__qualname__', repr(cache))}"
+        with self._lock:
+            for tabela in tabelas:
+                self._dependencias.setdefault(tabela, {})[chave] = cache
+
+    def _ao_notificar(self, tabela):
+        with self._lock:
+            caches = list(self._dependencias.get(tabela, {}).values())
+        for cache in caches:
+            cache.clear()
+
+    def limpar_tudo(self):
+        with self._lock:
+            caches = {id(c): c for deps in self._dependencias.values() for c in deps.values()}
+        for cache in caches.values():
+            cache.clear()
+
+
+class CachePorPaciente:
+    """
+    Cache em memória de dados de cada paciente (ex: páginas da linha do tempo). As entradas
+    de um paciente são descartadas quando o canal "pacientes_alterados" avisa que o histórico
+    dele mudou, sem afetar os demais; o aviso '*' descarta tudo. Guarda no máximo
+    max_pacientes pacientes, descartando os usados há mais tempo.
+    """
+
+    def __init__(self, ouvinte, max_pacientes=1000):
+        self.max_pacientes = max_pacientes
+        self._dados = OrderedDict()
+        self._versao = 0
+        self._lock = threading.Lock()
+        ouvinte.registrar(CANAL_PACIENTES, self._ao_notificar)
+        ouvinte.ao_conectar(lambda conn: self.clear())
+
+    def obter(self, paciente_id, chave, carregar):
+        """Retorna o valor de (paciente_id, chave), chamando carregar() se não estiver em cache."""
+        with self._lock:
+            entradas = self._dados.get(paciente_id)
+            if entradas is not None and chave in entradas:
+                self._dados.move_to_end(paciente_id)
+                return entradas[chave]
+            versao = self._versao
+
+        valor = carregar()
+        with self._lock:
+            # Se algo foi invalidado durante a carga, o valor pode já estar desatualizado
+            if versao == self._versao:
+                self._dados.setdefault(paciente_id, {})[chave] = valor
+                self._dados.move_to_end(paciente_id)
+                while len(self._dados) > self.max_pacientes:
+                    self._dados.popitem(last=False)
+        return valor
+
+    def _ao_notificar(self, payload):
+        if payload == '*':
+            self.clear()
+            return
+        with self._lock:
+            self._versao += 1
+            for paciente_id in json.loads(payload):
+                self._dados.pop(paciente_id, None)
+
+    def clear(self):
+        """Descarta todas as entradas (mesma interface dos caches do Streamlit)."""
+        with self._lock:
+            self._versao += 1
+            self._dados.clear()
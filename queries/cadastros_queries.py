@@ -14,6 +14,15 @@ ATUALIZAR_TELEFONE_PACIENTE = "" \
 "SET telefone = %s " \
 "WHERE id = %s;"
 
+# Em lote: um único UPDATE para todas as linhas (id, telefone, telefone original) editadas na tabela do app.
+# Só grava as linhas que ainda têm o valor original (sem edição de outro usuário no meio); retorna os ids gravados.
+ATUALIZAR_TELEFONES_PACIENTES_EM_LOTE = "" \
+"UPDATE cadastros.pacientes AS p " \
+"SET telefone = v.telefone::varchar " \
+"FROM (VALUES %s) AS v(id, telefone, telefone_original) " \
+"WHERE p.id = v.id::integer AND p.telefone IS NOT DISTINCT FROM v.telefone_original::varchar " \
+"RETURNING p.id;"
+
 # 3. Pesquisar por nome
 PESQUISAR_PACIENTE_POR_NOME = "" \
 "SELECT id, nome, email, telefone " \
@@ -31,6 +40,14 @@ LISTAR_TODOS_PACIENTES = "" \
 "FROM cadastros.pacientes " \
 "ORDER BY id;"
 
+# Página por chave (API): (último id recebido, limite)
+LISTAR_PACIENTES_PAGINA = "" \
+"SELECT id, nome, email, telefone " \
+"FROM cadastros.pacientes " \
+"WHERE id > %s " \
+"ORDER BY id " \
+"LIMIT %s;"
+
 # 6. Exibir um
 SELECIONAR_PACIENTE_POR_ID = "" \
 "SELECT * " \
@@ -39,7 +56,7 @@ SELECIONAR_PACIENTE_POR_ID = "" \
 
 # Consulta os dados cadastrais completos do cliente
 CONSULTAR_DADOS_CLIENTE = "" \
-"SELECT id, nome, sexo, email, cpf, telefone, cidade, sigla_estado, torce_flamengo, assiste_one_piece, nasceu_sousa " \
+"SELECT id, nome, sexo, email, cpf, telefone, cidade, sigla_estado, torce_flamengo, assiste_one_piece, nasceu_sousa, tem_desconto " \
 "FROM cadastros.pacientes " \
 "WHERE id = %s;"
 
@@ -50,7 +67,15 @@ CONSULTAR_PEDIDOS_CLIENTE = "" \
 "WHERE v.cliente_id = %s " \
 "ORDER BY v.data DESC;"
 
-VERIFICAR_DESCONTO_CLIENTE = "SELECT (torce_flamengo OR assiste_one_piece OR nasceu_sousa) FROM cadastros.pacientes WHERE id = %s;"
+# Usa a mesma função do banco chamada por vendas.efetivar_compra
+VERIFICAR_DESCONTO_CLIENTE = "SELECT cadastros.cliente_tem_desconto(%s);"
+
+# Lista os clientes elegíveis ao desconto (para campanhas), servida pelo índice parcial idx_pacientes_com_desconto
+LISTAR_CLIENTES_COM_DESCONTO = "" \
+"SELECT id, nome, email, telefone " \
+"FROM cadastros.pacientes " \
+"WHERE tem_desconto " \
+"ORDER BY id;"
 
 ATUALIZAR_CRITERIOS_DESCONTO_PACIENTE = "" \
 "UPDATE cadastros.pacientes " \
@@ -71,6 +96,20 @@ ATUALIZAR_SALARIO_MEDICO = "" \
 "SET salario = %s " \
 "WHERE id = %s;"
 
+# Em lote: linhas (id, salario, salario original); mesma verificação do lote de telefones
+ATUALIZAR_SALARIOS_MEDICOS_EM_LOTE = "" \
+"UPDATE cadastros.medicos AS m " \
+"SET salario = v.salario::numeric " \
+"FROM (VALUES %s) AS v(id, salario, salario_original) " \
+"WHERE m.id = v.id::integer AND m.salario IS NOT DISTINCT FROM v.salario_original::numeric " \
+"RETURNING m.id;"
+
+LISTAR_SALARIOS_MEDICOS = "" \
+"SELECT m.id, m.nome, m.crm, e.nome AS especialidade, m.salario " \
+"FROM cadastros.medicos m " \
+"LEFT JOIN cadastros.especialidades e ON m.especialidade_id = e.id " \
+"ORDER BY m.nome;"
+
 PESQUISAR_MEDICO_POR_NOME = "" \
 "SELECT id, nome, crm " \
 "FROM cadastros.medicos " \
@@ -100,6 +139,13 @@ LISTAR_TODOS_MEDICOS = "" \
 "FROM cadastros.medicos " \
 "ORDER BY id;"
 
+LISTAR_MEDICOS_PAGINA = "" \
+"SELECT id, nome, crm, email " \
+"FROM cadastros.medicos " \
+"WHERE id > %s " \
+"ORDER BY id " \
+"LIMIT %s;"
+
 LISTAR_MEDICOS_COM_ESPECIALIDADE = "" \
 "SELECT " \
 "    m.id, " \
@@ -186,6 +232,14 @@ ATUALIZAR_STATUS_ESPECIALIDADE = "" \
 "SET especialidade_ativa = %s " \
 "WHERE id = %s;"
 
+# Em lote: linhas (id, especialidade_ativa, especialidade_ativa original); mesma verificação do lote de telefones
+ATUALIZAR_STATUS_ESPECIALIDADES_EM_LOTE = "" \
+"UPDATE cadastros.especialidades AS e " \
+"SET especialidade_ativa = v.especialidade_ativa::boolean " \
+"FROM (VALUES %s) AS v(id, especialidade_ativa, especialidade_ativa_original) " \
+"WHERE e.id = v.id::integer AND e.especialidade_ativa IS NOT DISTINCT FROM v.especialidade_ativa_original::boolean " \
+"RETURNING e.id;"
+
 PESQUISAR_ESPECIALIDADE_POR_NOME = "" \
 "SELECT id, nome, especialidade_ativa " \
 "FROM cadastros.especialidades " \
@@ -4,31 +4,86 @@
 # Queries mais complexas que unem várias tabelas para gerar relatórios.
 
 
-DETALHES_CONSULTAS = """
-    SELECT
-        c.id AS consulta_id, c.data, p.nome AS nome_paciente,
-        m.nome AS nome_medico, e.nome AS especialidade, c.status
-    FROM
-        clinico.consultas AS c
-    JOIN
-        cadastros.pacientes AS p ON c.paciente_id = p.id
-    JOIN
-        cadastros.medicos AS m ON c.medico_id = m.id
-    JOIN
-        cadastros.especialidades AS e ON m.especialidade_id = e.id
-    ORDER BY
-        c.data DESC;
-"""
+# Relatório de consultas (ver clinico.detalhes_consultas): (data inicial, data final, status, medico_id,
+# especialidade_id, data da última consulta recebida, id da última consulta recebida, limite).
+# Filtros e cursor nulos são ignorados; a primeira página é a mais recente da janela.
+DETALHES_CONSULTAS = "" \
+"SELECT consulta_id, data, nome_paciente, nome_medico, especialidade, status " \
+"FROM clinico.detalhes_consultas(%s, %s, %s, %s, %s, %s, %s, %s);"
 
 # =============================================================================
 # OPERAÇÕES NA TABELA CONSULTAS
 # =============================================================================
 
+# Falha se o médico já tiver outra consulta (não cancelada) sobreposta ao horário
 INSERIR_CONSULTA = "" \
-"INSERT INTO clinico.consultas (paciente_id, medico_id, data, motivo, status) " \
-"VALUES (%s, %s, %s, %s, %s) " \
+"INSERT INTO clinico.consultas (paciente_id, medico_id, data, duracao_minutos, motivo, status) " \
+"VALUES (%s, %s, %s, %s, %s, %s) " \
 "RETURNING id;"
 
+# Primeiros horários livres: (especialidade_id, início da janela, fim da janela, duração em minutos, limite)
+BUSCAR_HORARIOS_LIVRES = "" \
+"SELECT medico_id, medico, inicio, fim " \
+"FROM clinico.buscar_horarios_livres(%s, %s, %s, %s, %s);"
+
+# Agenda de um médico em uma janela de datas: (medico_id, início, fim).
+# Lê apenas a janela pelo índice (medico_id, data), com poda das partições mensais.
+AGENDA_MEDICO_POR_PERIODO = "" \
+"SELECT c.id, c.data, c.duracao_minutos, c.status, p.nome AS nome_paciente " \
+"FROM clinico.consultas AS c " \
+"JOIN cadastros.pacientes AS p ON c.paciente_id = p.id " \
+"WHERE c.medico_id = %s AND c.data >= %s AND c.data < %s " \
+"ORDER BY c.data;"
+
+# Busca textual em motivos, diagnósticos e receitas: (termos, limite, deslocamento).
+# Os termos aceitam a sintaxe de buscadores web; o trecho vem com os termos encontrados entre **.
+BUSCAR_TEXTO_CLINICO = "" \
+"SELECT tipo, consulta_id, receita_id, data, paciente, medico, relevancia, trecho " \
+"FROM clinico.buscar_texto_clinico(%s, %s, %s);"
+
+# Linha do tempo do paciente em JSON (consultas, receitas, pagamentos e compras): (paciente_id, limite, deslocamento)
+LINHA_DO_TEMPO_PACIENTE = "SELECT clinico.linha_do_tempo_paciente(%s, %s, %s);"
+
+# Indicadores de um período (data inicial, data final), lidos só da tabela diária clinico.indicadores_diarios:
+# uma linha por médico, uma por especialidade e o total do período.
+INDICADORES_POR_PERIODO = """
+    WITH diarios AS (
+        SELECT i.medico_id, m.nome AS medico, COALESCE(e.nome, 'Sem especialidade') AS especialidade,
+               i.agendadas, i.realizadas, i.canceladas, i.valor_faturado, i.valor_recebido
+        FROM clinico.indicadores_diarios AS i
+        JOIN cadastros.medicos AS m ON m.id = i.medico_id
+        LEFT JOIN cadastros.especialidades AS e ON e.id = m.especialidade_id
+        WHERE i.dia BETWEEN %s AND %s
+    )
+    SELECT
+        CASE
+            WHEN GROUPING(medico_id) = 0 THEN 'Médico'
+            WHEN GROUPING(especialidade) = 0 THEN 'Especialidade'
+            ELSE 'Total'
+        END AS agrupamento,
+        CASE WHEN GROUPING(especialidade) = 0 THEN especialidade ELSE 'Total' END AS especialidade,
+        CASE WHEN GROUPING(medico_id) = 0 THEN medico END AS medico,
+        SUM(agendadas + realizadas + canceladas) AS consultas,
+        SUM(agendadas) AS agendadas,
+        SUM(realizadas) AS realizadas,
+        SUM(canceladas) AS canceladas,
+        ROUND(100.0 * SUM(canceladas) / NULLIF(SUM(agendadas + realizadas + canceladas), 0), 1) AS taxa_cancelamento,
+        SUM(valor_faturado) AS valor_faturado,
+        SUM(valor_recebido) AS valor_recebido
+    FROM diarios
+    GROUP BY GROUPING SETS ((especialidade, medico_id, medico), (especialidade), ())
+    ORDER BY agrupamento, valor_faturado DESC;
+"""
+
+# Totais por dia de um período (data inicial, data final), para o gráfico do painel de indicadores
+INDICADORES_SERIE_DIARIA = "" \
+"SELECT dia, SUM(agendadas + realizadas + canceladas) AS consultas, SUM(canceladas) AS canceladas, " \
+"       SUM(valor_faturado) AS valor_faturado, SUM(valor_recebido) AS valor_recebido " \
+"FROM clinico.indicadores_diarios " \
+"WHERE dia BETWEEN %s AND %s " \
+"GROUP BY dia " \
+"ORDER BY dia;"
+
 ATUALIZAR_CONSULTA = "" \
 "UPDATE clinico.consultas " \
 "SET status = %s, diagnostico = %s " \
@@ -26,6 +26,55 @@ PESQUISAR_PAGAMENTO_POR_NOME_PACIENTE = "" \
 "ORDER BY " \
 "    c.data DESC;"
 
+# Antiguidade dos recebíveis (pagamentos em aberto) na data de referência: (data_referencia,)
+# Uma única agregação com GROUPING SETS devolve os totais por paciente, por especialidade, por método
+# e o total geral (coluna agrupamento). Os dias contam a partir da data da consulta; consultas futuras
+# entram na faixa 0-30. Lê apenas o índice parcial idx_pagamentos_em_aberto.
+AGING_RECEBIVEIS = """
+    WITH abertos AS (
+        SELECT pg.valor, pg.metodo, c.paciente_id, p.nome AS paciente,
+               COALESCE(e.nome, 'Sem especialidade') AS especialidade,
+               %s::date - pg.data_consulta::date AS dias
+        FROM financeiro.pagamentos AS pg
+        JOIN clinico.consultas AS c ON c.id = pg.consulta_id AND c.data = pg.data_consulta
+        JOIN cadastros.pacientes AS p ON p.id = c.paciente_id
+        JOIN cadastros.medicos AS m ON m.id = c.medico_id
+        LEFT JOIN cadastros.especialidades AS e ON e.id = m.especialidade_id
+        WHERE pg.pago = FALSE
+    )
+    SELECT
+        CASE
+            WHEN GROUPING(paciente_id) = 0 THEN 'Paciente'
+            WHEN GROUPING(especialidade) = 0 THEN 'Especialidade'
+            WHEN GROUPING(metodo) = 0 THEN 'Método'
+            ELSE 'Total'
+        END AS agrupamento,
+        CASE
+            WHEN GROUPING(paciente_id) = 0 THEN paciente || ' (ID ' || paciente_id || ')'
+            WHEN GROUPING(especialidade) = 0 THEN especialidade
+            WHEN GROUPING(metodo) = 0 THEN COALESCE(metodo, 'Não informado')
+            ELSE 'Total'
+        END AS grupo,
+        COUNT(*) AS titulos,
+        COALESCE(SUM(valor) FILTER (WHERE dias <= 30), 0) AS dias_0_30,
+        COALESCE(SUM(valor) FILTER (WHERE dias BETWEEN 31 AND 60), 0) AS dias_31_60,
+        COALESCE(SUM(valor) FILTER (WHERE dias BETWEEN 61 AND 90), 0) AS dias_61_90,
+        COALESCE(SUM(valor) FILTER (WHERE dias > 90), 0) AS dias_90_mais,
+        SUM(valor) AS total,
+        MAX(dias) AS dias_mais_antigo
+    FROM abertos
+    GROUP BY GROUPING SETS ((paciente_id, paciente), (especialidade), (metodo), ())
+    ORDER BY agrupamento, total DESC;
+"""
+
+# Conciliação em lote (ver conciliacao.py): cria/limpa a área de carga temporária da transação...
+PREPARAR_CONCILIACAO = "SELECT financeiro.preparar_conciliacao();"
+
+# ...e, depois do COPY, quita os pagamentos conciliados e devolve as linhas não conciliadas: (dias_antecedencia,)
+CONCILIAR_EXTRATO = "" \
+"SELECT linha, consulta_id, valor, data_pagamento, motivo " \
+"FROM financeiro.conciliar_extrato(%s);"
+
 REMOVER_PAGAMENTO = "" \
 "DELETE FROM financeiro.pagamentos " \
 "WHERE id = %s;"
@@ -35,6 +84,14 @@ LISTAR_TODOS_PAGAMENTOS = "" \
 "FROM financeiro.pagamentos " \
 "ORDER BY id DESC;"
 
+# Página por chave (API): (último id recebido, limite)
+LISTAR_PAGAMENTOS_PAGINA = "" \
+"SELECT id, consulta_id, valor, metodo, pago, data_pagamento " \
+"FROM financeiro.pagamentos " \
+"WHERE id > %s " \
+"ORDER BY id " \
+"LIMIT %s;"
+
 SELECIONAR_PAGAMENTO_POR_ID = "" \
 "SELECT * " \
 "FROM financeiro.pagamentos " \
@@ -0,0 +1,22 @@
+# =============================================================================
+# ROTINAS DE MANUTENÇÃO DO BANCO
+# =============================================================================
+
+# Cria as partições mensais que faltam (do mês atual até 12 meses à frente)
+GARANTIR_PARTICOES = "SELECT manutencao.garantir_particoes();"
+
+# Refaz os indicadores clínicos diários de um período a partir das consultas e pagamentos: (data inicial, data final).
+# Datas nulas refazem todo o histórico. Só é necessário para bancos criados antes da tabela de indicadores
+# ou depois de cargas feitas com os triggers desabilitados; no uso normal, os triggers mantêm a tabela.
+RECALCULAR_INDICADORES = "SELECT clinico.recalcular_indicadores(%s, %s);"
+
+# Versões atuais das tabelas informadas ('schema.tabela'): a base consolidada mais as alterações confirmadas
+# desde a última compactação, registradas pelo trigger de notificação: (lista de tabelas). Usada para
+# validar resultados guardados em cache; a leitura é um único comando, então a compactação não a altera.
+VERSOES_TABELAS = "" \
+"SELECT v.tabela, v.versao + (SELECT count(*) FROM manutencao.alteracoes_tabelas a WHERE a.tabela = v.tabela) AS versao " \
+"FROM manutencao.versoes_tabelas v " \
+"WHERE v.tabela = ANY(%s);"
+
+# Consolida as alterações registradas na base das versões; o app e a API a executam a cada minuto
+COMPACTAR_VERSOES = "SELECT manutencao.compactar_versoes();"
@@ -1,14 +1,22 @@
-LISTAR_TODOS_PRODUTOS = "SELECT p.id, p.nome, p.descricao, p.preco, c.nome AS categoria, p.fabricado_em_mari, e.quantidade FROM vendas.produtos p LEFT JOIN vendas.categorias c ON p.categoria_id = c.id LEFT JOIN vendas.estoque e ON p.id = e.produto_id WHERE p.ativo = TRUE ORDER BY p.nome;"
+# Buscas do catálogo: leem o modelo de leitura vendas.catalogo_produtos (só produtos ativos, sem junções)
+LISTAR_TODOS_PRODUTOS = "SELECT produto_id AS id, nome, descricao, preco, categoria, fabricado_em_mari, quantidade FROM vendas.catalogo_produtos ORDER BY nome;"
 
-BUSCAR_PRODUTOS_POR_NOME = "SELECT p.id, p.nome, p.preco, c.nome AS categoria, e.quantidade FROM vendas.produtos p LEFT JOIN vendas.categorias c ON p.categoria_id = c.id LEFT JOIN vendas.estoque e ON p.id = e.produto_id WHERE lower(p.nome) LIKE lower(%s) AND p.ativo = TRUE ORDER BY p.nome;"
+BUSCAR_PRODUTOS_POR_NOME = "SELECT produto_id AS id, nome, preco, categoria, quantidade FROM vendas.catalogo_produtos WHERE lower(nome) LIKE lower(%s) ORDER BY nome;"
 
-BUSCAR_PRODUTOS_POR_FAIXA_PRECO = "SELECT p.id, p.nome, p.preco, c.nome AS categoria, e.quantidade FROM vendas.produtos p LEFT JOIN vendas.categorias c ON p.categoria_id = c.id LEFT JOIN vendas.estoque e ON p.id = e.produto_id WHERE p.preco BETWEEN %s AND %s AND p.ativo = TRUE ORDER BY p.preco;"
+BUSCAR_PRODUTOS_POR_FAIXA_PRECO = "SELECT produto_id AS id, nome, preco, categoria, quantidade FROM vendas.catalogo_produtos WHERE preco BETWEEN %s AND %s ORDER BY preco;"
 
-BUSCAR_PRODUTOS_POR_CATEGORIA = "SELECT p.id, p.nome, p.preco, e.quantidade FROM vendas.produtos p JOIN vendas.categorias c ON p.categoria_id = c.id LEFT JOIN vendas.estoque e ON p.id = e.produto_id WHERE c.nome = %s AND p.ativo = TRUE;"
+BUSCAR_PRODUTOS_POR_CATEGORIA = "SELECT produto_id AS id, nome, preco, quantidade FROM vendas.catalogo_produtos WHERE categoria = %s;"
 
-BUSCAR_PRODUTOS_FAB_MARI = "SELECT p.id, p.nome, p.preco, e.quantidade FROM vendas.produtos p LEFT JOIN vendas.estoque e ON p.id = e.produto_id WHERE p.fabricado_em_mari = TRUE AND p.ativo = TRUE;"
+BUSCAR_PRODUTOS_FAB_MARI = "SELECT produto_id AS id, nome, preco, quantidade FROM vendas.catalogo_produtos WHERE fabricado_em_mari;"
 
-BUSCAR_PRODUTOS_ESTOQUE_BAIXO = "SELECT p.id, p.nome, p.preco, e.quantidade FROM vendas.produtos p JOIN vendas.estoque e ON p.id = e.produto_id WHERE e.quantidade < 5 AND p.ativo = TRUE;"
+# Produtos abaixo do próprio ponto de reposição (índice parcial idx_catalogo_estoque_baixo)
+BUSCAR_PRODUTOS_ESTOQUE_BAIXO = "SELECT produto_id AS id, nome, preco, quantidade, ponto_reposicao FROM vendas.catalogo_produtos WHERE quantidade < ponto_reposicao ORDER BY quantidade;"
+
+# Página por chave (API): (último produto_id recebido, limite)
+LISTAR_PRODUTOS_PAGINA = "SELECT produto_id AS id, nome, descricao, preco, categoria, fabricado_em_mari, quantidade FROM vendas.catalogo_produtos WHERE produto_id > %s ORDER BY produto_id LIMIT %s;"
+
+# Preços atuais de uma lista de produtos ativos (array de ids); usados pela API para montar os itens da venda
+PRECOS_PRODUTOS_ATIVOS = "SELECT produto_id, preco FROM vendas.catalogo_produtos WHERE produto_id = ANY(%s);"
 
 LISTAR_CATEGORIAS = "SELECT id, nome FROM vendas.categorias ORDER BY nome;"
 
@@ -18,25 +26,68 @@ INSERIR_PRODUTO = "INSERT INTO vendas.produtos (nome, descricao, preco, categori
 
 ATUALIZAR_ESTOQUE = "INSERT INTO vendas.estoque (produto_id, quantidade) VALUES (%s, %s) ON CONFLICT (produto_id) DO UPDATE SET quantidade = EXCLUDED.quantidade;"
 
+ATUALIZAR_PONTO_REPOSICAO = "UPDATE vendas.estoque SET ponto_reposicao = %s WHERE produto_id = %s;"
+
 SELECIONAR_PRODUTO_POR_ID = "SELECT nome, descricao, preco, categoria_id, fabricado_em_mari FROM vendas.produtos WHERE id = %s;"
 
 ATUALIZAR_PRODUTO = "UPDATE vendas.produtos SET nome=%s, descricao=%s, preco=%s, categoria_id=%s, fabricado_em_mari=%s WHERE id=%s;"
 
+# Edição em lote no app: linhas (id, nome, descricao, preco, categoria_id, fabricado_em_mari, seguidas dos mesmos
+# cinco valores como estavam ao carregar a tabela) em um único UPDATE. Cada linha grava apenas as colunas que o
+# usuário mudou, e só se elas ainda têm o valor original no banco; edições de outros usuários nas demais colunas
+# são preservadas. Retorna os ids gravados.
+LISTAR_PRODUTOS_PARA_EDICAO = "SELECT id, nome, descricao, preco, categoria_id, fabricado_em_mari FROM vendas.produtos WHERE ativo = TRUE ORDER BY nome;"
+
+ATUALIZAR_PRODUTOS_EM_LOTE = "" \
+"UPDATE vendas.produtos AS p " \
+"SET nome = CASE WHEN v.nome IS DISTINCT FROM v.nome_original THEN v.nome ELSE p.nome END, " \
+"    descricao = CASE WHEN v.descricao IS DISTINCT FROM v.descricao_original THEN v.descricao ELSE p.descricao END, " \
+"    preco = CASE WHEN v.preco IS DISTINCT FROM v.preco_original THEN v.preco ELSE p.preco END, " \
+"    categoria_id = CASE WHEN v.categoria_id IS DISTINCT FROM v.categoria_id_original THEN v.categoria_id ELSE p.categoria_id END, " \
+"    fabricado_em_mari = CASE WHEN v.fabricado_em_mari IS DISTINCT FROM v.fabricado_em_mari_original " \
+"                             THEN v.fabricado_em_mari ELSE p.fabricado_em_mari END " \
+"FROM (" \
+"    SELECT id::integer AS id, nome::varchar AS nome, descricao::text AS descricao, preco::numeric AS preco, " \
+"           categoria_id::integer AS categoria_id, fabricado_em_mari::boolean AS fabricado_em_mari, " \
+"           nome_original::varchar AS nome_original, descricao_original::text AS descricao_original, " \
+"           preco_original::numeric AS preco_original, categoria_id_original::integer AS categoria_id_original, " \
+"           fabricado_em_mari_original::boolean AS fabricado_em_mari_original " \
+"    FROM (VALUES %s) AS t(id, nome, descricao, preco, categoria_id, fabricado_em_mari, " \
+"                          nome_original, descricao_original, preco_original, categoria_id_original, fabricado_em_mari_original)" \
+") AS v " \
+"WHERE p.id = v.id " \
+"  AND (v.nome IS NOT DISTINCT FROM v.nome_original OR p.nome IS NOT DISTINCT FROM v.nome_original) " \
+"  AND (v.descricao IS NOT DISTINCT FROM v.descricao_original OR p.descricao IS NOT DISTINCT FROM v.descricao_original) " \
+"  AND (v.preco IS NOT DISTINCT FROM v.preco_original OR p.preco IS NOT DISTINCT FROM v.preco_original) " \
+"  AND (v.categoria_id IS NOT DISTINCT FROM v.categoria_id_original OR p.categoria_id IS NOT DISTINCT FROM v.categoria_id_original) " \
+"  AND (v.fabricado_em_mari IS NOT DISTINCT FROM v.fabricado_em_mari_original " \
+"       OR p.fabricado_em_mari IS NOT DISTINCT FROM v.fabricado_em_mari_original) " \
+"RETURNING p.id;"
+
 # chamada a função (usar json.dumps para items em Python)
 CHAMAR_EFETIVAR_COMPRA = "SELECT * FROM vendas.efetivar_compra(%s, %s, %s, %s::jsonb, %s);"
 
 # Relatório mensal por vendedor (usando a view criada)
 REL_VENDAS_POR_VENDEDOR_MES = "SELECT * FROM vendas.vendas_por_vendedor_mes ORDER BY mes DESC;"
 
-# Detalhar itens de um pedido do cliente
+# Detalhar itens de um pedido do cliente (a data da venda restringe a busca a uma única partição mensal)
 DETALHAR_ITENS_PEDIDO_CLIENTE = "" \
 "SELECT iv.produto_id, p.nome AS produto, iv.quantidade, iv.preco_unitario " \
 "FROM vendas.itens_venda iv " \
 "JOIN vendas.produtos p ON iv.produto_id = p.id " \
-"WHERE iv.venda_id = %s;"
+"WHERE iv.venda_id = %s AND iv.data_venda = %s;"
 
 REMOVER_PRODUTO = "UPDATE vendas.produtos SET ativo = FALSE WHERE id = %s;"
 
+# Reajuste de preços em lote. Parâmetros, nas duas queries: (categoria_id, fabricado_em_mari, preco_min,
+# preco_max, tipo, valor, arredondamento); filtros NULL = todos os produtos ativos.
+PREVIA_REAJUSTE_PRECOS = "" \
+"SELECT produto_id, nome, categoria, preco_atual, preco_novo, preco_novo - preco_atual AS diferenca " \
+"FROM vendas.previa_reajuste_precos(%s, %s, %s, %s, %s, %s, %s) " \
+"ORDER BY nome;"
+
+REAJUSTAR_PRECOS = "SELECT vendas.reajustar_precos(%s, %s, %s, %s, %s, %s, %s);"
+
 CONSULTAR_ESTOQUE_PRODUTO = "SELECT quantidade FROM vendas.estoque WHERE produto_id = %s;"
 
 
@@ -9,6 +9,7 @@ DROP SCHEMA IF EXISTS financeiro CASCADE;
 DROP SCHEMA IF EXISTS clinico CASCADE;
 DROP SCHEMA IF EXISTS cadastros CASCADE;
 DROP SCHEMA IF EXISTS vendas CASCADE;
+DROP SCHEMA IF EXISTS manutencao CASCADE;
 
 -- 1. CRIAÇÃO DOS SCHEMAS 
 
@@ -24,6 +25,15 @@ COMMENT ON SCHEMA financeiro IS 'Schema para tabelas relacionadas a pagamentos e
 CREATE SCHEMA vendas;
 COMMENT ON SCHEMA vendas IS 'Schema para tabelas do módulo de vendas, como produtos, categorias, estoque, vendas, itens e pedidos.';
 
+CREATE SCHEMA manutencao;
+COMMENT ON SCHEMA manutencao IS 'Schema para rotinas de manutenção do banco, como a criação das partições mensais.';
+
+-- Extensões (distribuídas com o PostgreSQL)
+-- pg_trgm: índices de trigramas para buscas por trecho do nome (LIKE '%texto%')
+-- btree_gist: permite colunas comuns (ex: medico_id) em índices GiST junto com intervalos de tempo
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 
 -- 2. CRIAÇÃO DAS TABELAS
 
@@ -115,31 +125,60 @@ ALTER TABLE cadastros.pacientes
     ADD COLUMN IF NOT EXISTS assiste_one_piece BOOLEAN DEFAULT FALSE,
     ADD COLUMN IF NOT EXISTS nasceu_sousa BOOLEAN DEFAULT FALSE;
 
+-- Elegibilidade ao desconto pré-calculada pelo próprio banco (coluna gerada),
+-- para que os critérios não sejam reavaliados a cada compra.
+ALTER TABLE cadastros.pacientes
+    ADD COLUMN IF NOT EXISTS tem_desconto BOOLEAN GENERATED ALWAYS AS (
+        COALESCE(torce_flamengo, FALSE) OR COALESCE(assiste_one_piece, FALSE) OR COALESCE(nasceu_sousa, FALSE)
+    ) STORED;
+
+COMMENT ON COLUMN cadastros.pacientes.tem_desconto IS 'Indica se o paciente tem direito ao desconto de 10% (calculado a partir dos critérios).';
+
 -- Tabela de Consultas (Schema: clinico)
+-- Particionada por mês na coluna "data". A chave primária inclui a data por exigência do
+-- particionamento; a unicidade do id continua garantida pela sequência.
 CREATE TABLE clinico.consultas (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     paciente_id INTEGER NOT NULL REFERENCES cadastros.pacientes(id) ON DELETE CASCADE,
     medico_id INTEGER NOT NULL REFERENCES cadastros.medicos(id) ON DELETE RESTRICT,
     funcionario_id INTEGER REFERENCES cadastros.funcionarios(id) ON DELETE SET NULL,
     data TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    duracao_minutos INTEGER NOT NULL DEFAULT 30 CHECK (duracao_minutos BETWEEN 5 AND 480),
+    periodo TSRANGE GENERATED ALWAYS AS (tsrange(data, data + make_interval(mins => duracao_minutos))) STORED,
     motivo TEXT,
     diagnostico TEXT,
-    status VARCHAR(20) DEFAULT 'Agendada' CHECK (status IN ('Agendada', 'Realizada', 'Cancelada'))
-);
+    status VARCHAR(20) DEFAULT 'Agendada' CHECK (status IN ('Agendada', 'Realizada', 'Cancelada')),
+    busca TSVECTOR,
+    PRIMARY KEY (id, data),
+    -- A consulta começa e termina no mesmo dia, logo cabe sempre em uma única partição mensal
+    -- e a restrição de conflito de horário de cada partição (ver proteger_agenda_particao) vale para a tabela toda.
+    CONSTRAINT ck_consultas_mesmo_dia CHECK (
+        data::date = (data + make_interval(mins => duracao_minutos) - INTERVAL '1 microsecond')::date
+    )
+) PARTITION BY RANGE (data);
+
+COMMENT ON COLUMN clinico.consultas.periodo IS 'Intervalo [início, fim) ocupado na agenda do médico, calculado a partir de data e duracao_minutos.';
+COMMENT ON COLUMN clinico.consultas.busca IS 'Texto de diagnostico e motivo para busca textual em português, mantido por trigger.';
 
 -- Tabela de Receitas (Schema: clinico)
+-- data_consulta acompanha a chave da consulta particionada e é preenchida automaticamente por trigger
 CREATE TABLE clinico.receitas (
     id SERIAL PRIMARY KEY,
-    consulta_id INTEGER NOT NULL REFERENCES clinico.consultas(id) ON DELETE CASCADE,
+    consulta_id INTEGER NOT NULL,
+    data_consulta TIMESTAMP WITHOUT TIME ZONE NOT NULL,
     medicamento VARCHAR(200) NOT NULL,
     dosagem VARCHAR(100),
-    instrucoes TEXT
+    instrucoes TEXT,
+    busca TSVECTOR
 );
 
+COMMENT ON COLUMN clinico.receitas.busca IS 'Texto de medicamento e instrucoes para busca textual em português, mantido por trigger.';
+
 -- Tabela de Pagamentos (Schema: financeiro)
 CREATE TABLE financeiro.pagamentos (
     id SERIAL PRIMARY KEY,
-    consulta_id INTEGER NOT NULL REFERENCES clinico.consultas(id) ON DELETE RESTRICT,
+    consulta_id INTEGER NOT NULL,
+    data_consulta TIMESTAMP WITHOUT TIME ZONE NOT NULL,
     valor NUMERIC(10,2) NOT NULL,
     metodo VARCHAR(30) CHECK (metodo IN ('Dinheiro', 'Cartão', 'Transferência', 'Seguro')),
     pago BOOLEAN DEFAULT FALSE,
@@ -166,12 +205,16 @@ CREATE TABLE vendas.produtos (
 -- Tabela de Estoque (separado para permitir controle isolado, schema: vendas)
 CREATE TABLE vendas.estoque (
     produto_id INTEGER PRIMARY KEY REFERENCES vendas.produtos(id) ON DELETE CASCADE,
-    quantidade INTEGER NOT NULL CHECK (quantidade >= 0)
+    quantidade INTEGER NOT NULL CHECK (quantidade >= 0),
+    ponto_reposicao INTEGER NOT NULL DEFAULT 5 CHECK (ponto_reposicao >= 0)
 );
 
+COMMENT ON COLUMN vendas.estoque.ponto_reposicao IS 'Quantidade abaixo da qual o produto é considerado em estoque baixo e precisa ser reposto.';
+
 -- Tabela de Vendas (schema: vendas)
+-- Particionada por mês na coluna "data" (chave primária composta, como em clinico.consultas)
 CREATE TABLE vendas.vendas (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     cliente_id INTEGER NOT NULL REFERENCES cadastros.pacientes(id) ON DELETE RESTRICT,
     vendedor_id INTEGER NOT NULL REFERENCES cadastros.funcionarios(id) ON DELETE RESTRICT,
     data TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
@@ -179,17 +222,21 @@ CREATE TABLE vendas.vendas (
     desconto_aplicado NUMERIC(12,2) NOT NULL CHECK (desconto_aplicado >= 0),
     total_liquido NUMERIC(12,2) NOT NULL CHECK (total_liquido >= 0),
     forma_pagamento VARCHAR(30) NOT NULL CHECK (forma_pagamento IN ('Dinheiro','Cartão','Boleto','PIX','Berries')),
-    status_pagamento VARCHAR(30) NOT NULL DEFAULT 'Pendente' CHECK (status_pagamento IN ('Pendente','Confirmado','Falhado'))
-);
+    status_pagamento VARCHAR(30) NOT NULL DEFAULT 'Pendente' CHECK (status_pagamento IN ('Pendente','Confirmado','Falhado')),
+    PRIMARY KEY (id, data)
+) PARTITION BY RANGE (data);
 
 -- Tabela de Itens da Venda (schema: vendas)
+-- Particionada pelos mesmos meses da venda (data_venda repete vendas.vendas.data)
 CREATE TABLE vendas.itens_venda (
-    id SERIAL PRIMARY KEY,
-    venda_id INTEGER NOT NULL REFERENCES vendas.vendas(id) ON DELETE CASCADE,
+    id SERIAL,
+    venda_id INTEGER NOT NULL,
+    data_venda TIMESTAMP WITHOUT TIME ZONE NOT NULL,
     produto_id INTEGER NOT NULL REFERENCES vendas.produtos(id) ON DELETE RESTRICT,
     quantidade INTEGER NOT NULL CHECK (quantidade > 0),
-    preco_unitario NUMERIC(12,2) NOT NULL CHECK (preco_unitario >= 0)
-);
+    preco_unitario NUMERIC(12,2) NOT NULL CHECK (preco_unitario >= 0),
+    PRIMARY KEY (id, data_venda)
+) PARTITION BY RANGE (data_venda);
 
 
 -- ==========================================
@@ -211,6 +258,8 @@ CREATE INDEX idx_estoque_produto ON vendas.estoque(produto_id);
 -- Tabela cadastros.pacientes
 CREATE INDEX idx_pacientes_cpf ON cadastros.pacientes(cpf);
 CREATE INDEX idx_pacientes_email ON cadastros.pacientes(email);
+-- Índice parcial apenas com os clientes elegíveis ao desconto (listagem de campanhas sem varrer a tabela)
+CREATE INDEX idx_pacientes_com_desconto ON cadastros.pacientes(id) INCLUDE (nome, email, telefone) WHERE tem_desconto;
 
 -- Tabela cadastros.funcionarios
 CREATE INDEX idx_funcionarios_email ON cadastros.funcionarios(email);
@@ -219,6 +268,7 @@ CREATE INDEX idx_funcionarios_telefone ON cadastros.funcionarios(telefone);
 -- Tabela cadastros.medicos
 CREATE INDEX idx_medicos_crm ON cadastros.medicos(crm);
 CREATE INDEX idx_medicos_email ON cadastros.medicos(email);
+CREATE INDEX idx_medicos_especialidade ON cadastros.medicos(especialidade_id);
 
 -- Tabela vendas.produtos
 CREATE INDEX idx_produtos_nome ON vendas.produtos(nome);
@@ -226,16 +276,31 @@ CREATE INDEX idx_produtos_categoria ON vendas.produtos(categoria_id);
 
 -- Tabela clinico.consultas
 CREATE INDEX idx_consultas_paciente ON clinico.consultas(paciente_id);
-CREATE INDEX idx_consultas_medico ON clinico.consultas(medico_id);
+-- Agenda do médico por janela de datas (também atende a chave estrangeira medico_id).
+-- O INCLUDE permite montar a semana com Index Only Scan, sem visitar a tabela; o id na chave
+-- mantém a ordem (data, id) da paginação do relatório de consultas filtrado por médico.
+CREATE INDEX idx_consultas_medico_data ON clinico.consultas(medico_id, data, id)
+    INCLUDE (paciente_id, duracao_minutos, status);
 CREATE INDEX idx_consultas_funcionario ON clinico.consultas(funcionario_id);
-CREATE INDEX idx_consultas_data ON clinico.consultas(data);
+-- Relatório de consultas (clinico.detalhes_consultas): a página mais recente de uma janela é lida
+-- de trás para frente no índice, já na ordem (data, id) e sem visitar a tabela.
+CREATE INDEX idx_consultas_data ON clinico.consultas(data, id)
+    INCLUDE (paciente_id, medico_id, status);
 
 -- Tabela clinico.receitas
 CREATE INDEX idx_receitas_consulta ON clinico.receitas(consulta_id);
 
+-- Busca textual (clinico.buscar_texto_clinico)
+CREATE INDEX idx_consultas_busca ON clinico.consultas USING gin (busca);
+CREATE INDEX idx_receitas_busca ON clinico.receitas USING gin (busca);
+
 -- Tabela financeiro.pagamentos
 CREATE INDEX idx_pagamentos_consulta ON financeiro.pagamentos(consulta_id);
 CREATE INDEX idx_pagamentos_data ON financeiro.pagamentos(data_pagamento);
+-- Só os pagamentos em aberto: o relatório de antiguidade de recebíveis e a lista de pendentes
+-- não leem os já quitados, que são a grande maioria e só crescem.
+CREATE INDEX idx_pagamentos_em_aberto ON financeiro.pagamentos(data_consulta)
+    INCLUDE (consulta_id, valor, metodo) WHERE pago = FALSE;
 
 
 
@@ -260,9 +325,9 @@ REFERENCES vendas.produtos(id)
 ON DELETE RESTRICT;
 
 ALTER TABLE vendas.itens_venda
-ADD CONSTRAINT fk_itens_venda_venda FOREIGN KEY (venda_id)
-REFERENCES vendas.vendas(id)
-ON DELETE CASCADE;
+ADD CONSTRAINT fk_itens_venda_venda FOREIGN KEY (venda_id, data_venda)
+REFERENCES vendas.vendas(id, data)
+ON DELETE CASCADE ON UPDATE CASCADE;
 
 -- Estoque
 ALTER TABLE vendas.estoque
@@ -288,15 +353,15 @@ ON DELETE SET NULL;
 
 -- Receitas
 ALTER TABLE clinico.receitas
-ADD CONSTRAINT fk_receitas_consulta FOREIGN KEY (consulta_id)
-REFERENCES clinico.consultas(id)
-ON DELETE CASCADE;
+ADD CONSTRAINT fk_receitas_consulta FOREIGN KEY (consulta_id, data_consulta)
+REFERENCES clinico.consultas(id, data)
+ON DELETE CASCADE ON UPDATE CASCADE;
 
 -- Pagamentos
 ALTER TABLE financeiro.pagamentos
-ADD CONSTRAINT fk_pagamentos_consulta FOREIGN KEY (consulta_id)
-REFERENCES clinico.consultas(id)
-ON DELETE RESTRICT;
+ADD CONSTRAINT fk_pagamentos_consulta FOREIGN KEY (consulta_id, data_consulta)
+REFERENCES clinico.consultas(id, data)
+ON DELETE RESTRICT ON UPDATE CASCADE;
 
 -- Produtos e Categorias
 ALTER TABLE vendas.produtos
@@ -305,6 +370,1072 @@ REFERENCES vendas.categorias(id)
 ON DELETE SET NULL;
 
 
+-- ==========================================
+-- PARTICIONAMENTO MENSAL (vendas.vendas, vendas.itens_venda, clinico.consultas)
+-- ==========================================
+
+-- Cria as partições mensais de uma tabela particionada entre dois meses (inclusive).
+-- Partições já existentes são ignoradas, então a função pode ser chamada repetidamente.
+CREATE OR REPLACE FUNCTION manutencao.criar_particoes_mensais(
+    p_tabela REGCLASS,
+    p_inicio DATE,
+    p_fim DATE
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_schema TEXT;
+    v_nome TEXT;
+    v_coluna TEXT;
+    v_padrao REGCLASS;
+    v_mes DATE := date_trunc('month', p_inicio)::date;
+    v_proximo DATE;
+    v_particao TEXT;
+    v_ocupado BOOLEAN;
+    v_criadas INTEGER := 0;
+BEGIN
+    SELECT n.nspname, c.relname INTO v_schema, v_nome
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = p_tabela;
+
+    -- Coluna usada como chave de partição (data ou data_venda)
+    SELECT a.attname INTO v_coluna
+    FROM pg_partitioned_table pt
+    JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+    WHERE pt.partrelid = p_tabela;
+
+    v_padrao := to_regclass(format('%I.%I', v_schema, v_nome || '_padrao'));
+
+    WHILE v_mes <= date_trunc('month', p_fim)::date LOOP
+        v_proximo := (v_mes + INTERVAL '1 month')::date;
+        v_particao := v_nome || '_' || to_char(v_mes, 'YYYY_MM');
+
+        IF to_regclass(format('%I.%I', v_schema, v_particao)) IS NULL THEN
+            -- Se a partição padrão já recebeu linhas deste mês, o PostgreSQL não permite criar a partição.
+            -- Nesse caso as linhas continuam na partição padrão e o mês é apenas sinalizado.
+            v_ocupado := FALSE;
+            IF v_padrao IS NOT NULL THEN
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %s WHERE %I >= %L AND %I < %L)',
+                               v_padrao, v_coluna, v_mes, v_coluna, v_proximo)
+                INTO v_ocupado;
+            END IF;
+
+            IF v_ocupado THEN
+                RAISE NOTICE 'Partição % não criada: a partição padrão já contém linhas deste mês.', v_particao;
+            ELSE
+                EXECUTE format('CREATE TABLE %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                               v_schema, v_particao, p_tabela, v_mes, v_proximo);
+                -- Restrições que o PostgreSQL não permite declarar na tabela particionada
+                IF p_tabela = 'clinico.consultas'::regclass THEN
+                    PERFORM clinico.proteger_agenda_particao(format('%I.%I', v_schema, v_particao)::regclass);
+                END IF;
+                v_criadas := v_criadas + 1;
+            END IF;
+        END IF;
+
+        v_mes := v_proximo;
+    END LOOP;
+
+    RETURN v_criadas;
+END;
+$$;
+
+-- Garante as partições de todas as tabelas particionadas, desde p_inicio até p_meses_a_frente
+-- meses após o mês atual. Deve ser executada periodicamente (ex: cron mensal); a aplicação
+-- também a chama ao iniciar.
+CREATE OR REPLACE FUNCTION manutencao.garantir_particoes(
+    p_inicio DATE DEFAULT CURRENT_DATE,
+    p_meses_a_frente INTEGER DEFAULT 12
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_tabela REGCLASS;
+    v_fim DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => p_meses_a_frente))::date;
+    v_criadas INTEGER := 0;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY['vendas.vendas', 'vendas.itens_venda', 'clinico.consultas']::REGCLASS[] LOOP
+        v_criadas := v_criadas + manutencao.criar_particoes_mensais(v_tabela, p_inicio, v_fim);
+    END LOOP;
+    RETURN v_criadas;
+END;
+$$;
+
+-- Partições padrão: recebem datas fora da janela já criada (ex: agendamentos muito distantes),
+-- para que nenhuma inserção falhe por falta de partição.
+CREATE TABLE vendas.vendas_padrao PARTITION OF vendas.vendas DEFAULT;
+CREATE TABLE vendas.itens_venda_padrao PARTITION OF vendas.itens_venda DEFAULT;
+CREATE TABLE clinico.consultas_padrao PARTITION OF clinico.consultas DEFAULT;
+
+-- Impede dois atendimentos do mesmo médico com horários sobrepostos (consultas canceladas liberam o horário).
+-- Restrições de exclusão não podem ser declaradas na tabela particionada, então cada partição recebe a
+-- sua; como nenhuma consulta atravessa a meia-noite (ck_consultas_mesmo_dia), o conjunto cobre a tabela toda.
+-- O índice GiST criado pela restrição também atende à busca de horários livres.
+CREATE OR REPLACE FUNCTION clinico.proteger_agenda_particao(
+    p_particao REGCLASS
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_nome TEXT := (SELECT relname FROM pg_class WHERE oid = p_particao);
+BEGIN
+    EXECUTE format('ALTER TABLE %s ADD CONSTRAINT %I EXCLUDE USING gist (medico_id WITH =, periodo WITH &&) WHERE (status <> %L)',
+                   p_particao, v_nome || '_sem_conflito', 'Cancelada');
+END;
+$$;
+
+SELECT clinico.proteger_agenda_particao('clinico.consultas_padrao');
+
+-- Primeiros horários livres dos médicos de uma especialidade dentro de uma janela de datas.
+-- Expediente: segunda a sábado, das 08:00 às 18:00, com inícios a cada 30 minutos.
+-- Os dias são examinados em ordem e a busca para ao atingir p_limite horários; cada dia consulta
+-- apenas a partição do seu mês pelo índice GiST (medico_id, periodo), então o custo não cresce
+-- com o histórico de consultas.
+CREATE OR REPLACE FUNCTION clinico.buscar_horarios_livres(
+    p_especialidade_id INTEGER,
+    p_inicio TIMESTAMP,
+    p_fim TIMESTAMP,
+    p_duracao_minutos INTEGER DEFAULT 30,
+    p_limite INTEGER DEFAULT 10
+)
+RETURNS TABLE(medico_id INTEGER, medico VARCHAR, inicio TIMESTAMP, fim TIMESTAMP)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_duracao INTERVAL := make_interval(mins => p_duracao_minutos);
+    v_dia DATE := p_inicio::date;
+    v_restante INTEGER := p_limite;
+    v_encontrados INTEGER;
+BEGIN
+    WHILE v_dia <= p_fim::date AND v_restante > 0 LOOP
+        IF extract(isodow FROM v_dia) < 7 THEN
+            RETURN QUERY
+            SELECT m.id, m.nome, h.horario, h.horario + v_duracao
+            FROM generate_series(v_dia + TIME '08:00', v_dia + TIME '18:00' - v_duracao, INTERVAL '30 minutes') AS h(horario)
+            CROSS JOIN cadastros.medicos m
+            WHERE m.especialidade_id = p_especialidade_id
+              AND h.horario >= p_inicio
+              AND h.horario + v_duracao <= p_fim
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM clinico.consultas c
+                  WHERE c.medico_id = m.id
+                    AND c.status <> 'Cancelada'
+                    AND c.data >= v_dia AND c.data < v_dia + 1
+                    AND c.periodo && tsrange(h.horario, h.horario + v_duracao)
+              )
+            ORDER BY h.horario, m.id
+            LIMIT v_restante;
+
+            GET DIAGNOSTICS v_encontrados = ROW_COUNT;
+            v_restante := v_restante - v_encontrados;
+        END IF;
+        v_dia := v_dia + 1;
+    END LOOP;
+END;
+$$;
+
+-- Partições mensais desde o início dos dados de exemplo até 12 meses à frente
+SELECT manutencao.garantir_particoes(DATE '2025-01-01');
+
+-- Preenche a data da consulta em receitas e pagamentos a partir de consulta_id,
+-- mantendo as inserções existentes (INSERIR_RECEITA, INSERIR_PAGAMENTO) inalteradas.
+CREATE OR REPLACE FUNCTION clinico.preencher_data_consulta()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.data_consulta IS NULL
+       OR (TG_OP = 'UPDATE' AND NEW.consulta_id IS DISTINCT FROM OLD.consulta_id) THEN
+        SELECT c.data INTO NEW.data_consulta
+        FROM clinico.consultas c
+        WHERE c.id = NEW.consulta_id;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER trg_receitas_data_consulta
+BEFORE INSERT OR UPDATE OF consulta_id ON clinico.receitas
+FOR EACH ROW EXECUTE FUNCTION clinico.preencher_data_consulta();
+
+CREATE TRIGGER trg_pagamentos_data_consulta
+BEFORE INSERT OR UPDATE OF consulta_id ON financeiro.pagamentos
+FOR EACH ROW EXECUTE FUNCTION clinico.preencher_data_consulta();
+
+
+-- ==========================================
+-- RELATÓRIO DE CONSULTAS
+-- ==========================================
+
+-- Consultas de uma janela de datas [p_inicio, p_fim] (dias inclusivos), da mais recente para a mais antiga,
+-- com filtros opcionais (NULL = todos) e paginação por chave: a próxima página começa depois da última
+-- consulta recebida (p_antes_data, p_antes_id), sem OFFSET, então o custo de cada página não cresce com a posição.
+-- Por ser uma função SQL simples, é expandida na query chamadora: os filtros nulos desaparecem do plano
+-- e a página sai em ordem dos índices (data, id) ou (medico_id, data, id), sem ordenar a janela inteira.
+CREATE OR REPLACE FUNCTION clinico.detalhes_consultas(
+    p_inicio DATE,
+    p_fim DATE,
+    p_status VARCHAR DEFAULT NULL,
+    p_medico_id INTEGER DEFAULT NULL,
+    p_especialidade_id INTEGER DEFAULT NULL,
+    p_antes_data TIMESTAMP DEFAULT NULL,
+    p_antes_id INTEGER DEFAULT NULL,
+    p_limite INTEGER DEFAULT 50
+)
+RETURNS TABLE(consulta_id INTEGER, data TIMESTAMP, nome_paciente VARCHAR, nome_medico VARCHAR,
+              especialidade VARCHAR, status VARCHAR)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT pg.id, pg.data, p.nome, m.nome, e.nome, pg.status
+    FROM (
+        SELECT c.id, c.data, c.paciente_id, c.medico_id, c.status
+        FROM clinico.consultas c
+        WHERE (p_inicio IS NULL OR c.data >= p_inicio)
+          AND (p_fim IS NULL OR c.data < p_fim + 1)
+          AND (p_status IS NULL OR c.status = p_status)
+          AND (p_medico_id IS NULL OR c.medico_id = p_medico_id)
+          AND (p_especialidade_id IS NULL
+               OR c.medico_id IN (SELECT id FROM cadastros.medicos WHERE especialidade_id = p_especialidade_id))
+          AND (p_antes_data IS NULL OR (c.data, c.id) < (p_antes_data, p_antes_id))
+        ORDER BY c.data DESC, c.id DESC
+        LIMIT p_limite
+    ) pg
+    JOIN cadastros.pacientes p ON p.id = pg.paciente_id
+    JOIN cadastros.medicos m ON m.id = pg.medico_id
+    LEFT JOIN cadastros.especialidades e ON e.id = m.especialidade_id
+    ORDER BY pg.data DESC, pg.id DESC;
+$$;
+
+
+-- ==========================================
+-- BUSCA TEXTUAL CLÍNICA
+-- ==========================================
+
+-- Mantêm as colunas "busca" (configuração 'portuguese': sem stopwords e com radicais, então
+-- "dores" encontra "dor"). Diagnóstico e medicamento pesam mais (A) que motivo e instruções (B).
+CREATE OR REPLACE FUNCTION clinico.atualizar_busca_consulta()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.busca := setweight(to_tsvector('portuguese', coalesce(NEW.diagnostico, '')), 'A')
+              || setweight(to_tsvector('portuguese', coalesce(NEW.motivo, '')), 'B');
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION clinico.atualizar_busca_receita()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.busca := setweight(to_tsvector('portuguese', coalesce(NEW.medicamento, '')), 'A')
+              || setweight(to_tsvector('portuguese', coalesce(NEW.instrucoes, '')), 'B');
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER trg_consultas_busca
+BEFORE INSERT OR UPDATE OF motivo, diagnostico ON clinico.consultas
+FOR EACH ROW EXECUTE FUNCTION clinico.atualizar_busca_consulta();
+
+CREATE TRIGGER trg_receitas_busca
+BEFORE INSERT OR UPDATE OF medicamento, instrucoes ON clinico.receitas
+FOR EACH ROW EXECUTE FUNCTION clinico.atualizar_busca_receita();
+
+-- Busca em consultas e receitas com a sintaxe de buscadores web ("dor de cabeça" -febre, dipirona OR paracetamol),
+-- ordenada por relevância e paginada por p_limite/p_deslocamento.
+-- Só os tsvectors (pelos índices GIN) participam da ordenação; os textos originais, pacientes,
+-- médicos e os trechos destacados (ts_headline, o passo mais caro) são buscados apenas para a página pedida.
+CREATE OR REPLACE FUNCTION clinico.buscar_texto_clinico(
+    p_termos TEXT,
+    p_limite INTEGER DEFAULT 20,
+    p_deslocamento INTEGER DEFAULT 0
+)
+RETURNS TABLE(tipo TEXT, consulta_id INTEGER, receita_id INTEGER, data TIMESTAMP,
+              paciente VARCHAR, medico VARCHAR, relevancia REAL, trecho TEXT)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH termos AS (
+        SELECT websearch_to_tsquery('portuguese', p_termos) AS q
+    ),
+    pagina AS (
+        SELECT *
+        FROM (
+            SELECT 'Consulta'::text AS tipo, c.id AS consulta_id, NULL::integer AS receita_id, c.data,
+                   ts_rank(c.busca, t.q) AS relevancia
+            FROM clinico.consultas c, termos t
+            WHERE c.busca @@ t.q
+            UNION ALL
+            SELECT 'Receita', r.consulta_id, r.id, r.data_consulta, ts_rank(r.busca, t.q)
+            FROM clinico.receitas r, termos t
+            WHERE r.busca @@ t.q
+        ) encontrados
+        ORDER BY relevancia DESC, data DESC, consulta_id, receita_id
+        LIMIT p_limite OFFSET p_deslocamento
+    )
+    SELECT pg.tipo, pg.consulta_id, pg.receita_id, pg.data, p.nome, m.nome, pg.relevancia,
+           ts_headline('portuguese',
+                       CASE WHEN pg.receita_id IS NULL
+                            THEN concat_ws(' — ', c.diagnostico, c.motivo)
+                            ELSE concat_ws(' — ', r.medicamento, r.dosagem, r.instrucoes) END,
+                       t.q, 'StartSel="**", StopSel="**", MaxWords=25, MinWords=8, MaxFragments=2')
+    FROM pagina pg
+    CROSS JOIN termos t
+    JOIN clinico.consultas c ON c.id = pg.consulta_id AND c.data = pg.data
+    JOIN cadastros.pacientes p ON p.id = c.paciente_id
+    JOIN cadastros.medicos m ON m.id = c.medico_id
+    LEFT JOIN clinico.receitas r ON r.id = pg.receita_id
+    ORDER BY pg.relevancia DESC, pg.data DESC, pg.consulta_id, pg.receita_id;
+$$;
+
+
+-- ==========================================
+-- LINHA DO TEMPO DO PACIENTE
+-- ==========================================
+
+-- Histórico completo de um paciente (consultas, receitas, pagamentos e compras) em um único
+-- documento JSON, do evento mais recente para o mais antigo e paginado por p_limite/p_deslocamento:
+--   {"paciente": {...}, "total_eventos": N, "limite": L, "deslocamento": D, "eventos": [{"tipo": ..., "data": ..., ...}]}
+-- Tudo é localizado pelo ID (índices de paciente_id, consulta_id e cliente_id); os itens das
+-- compras só são buscados para os eventos da página.
+CREATE OR REPLACE FUNCTION clinico.linha_do_tempo_paciente(
+    p_paciente_id INTEGER,
+    p_limite INTEGER DEFAULT 50,
+    p_deslocamento INTEGER DEFAULT 0
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH consultas AS (
+        SELECT c.id, c.data, c.medico_id, c.duracao_minutos, c.status, c.motivo, c.diagnostico
+        FROM clinico.consultas c
+        WHERE c.paciente_id = p_paciente_id
+    ),
+    eventos AS (
+        SELECT 'consulta'::text AS tipo, c.data, c.id,
+               jsonb_build_object('consulta_id', c.id, 'medico', m.nome, 'especialidade', e.nome,
+                                  'duracao_minutos', c.duracao_minutos, 'status', c.status,
+                                  'motivo', c.motivo, 'diagnostico', c.diagnostico) AS detalhes
+        FROM consultas c
+        JOIN cadastros.medicos m ON m.id = c.medico_id
+        LEFT JOIN cadastros.especialidades e ON e.id = m.especialidade_id
+        UNION ALL
+        SELECT 'receita', r.data_consulta, r.id,
+               jsonb_build_object('receita_id', r.id, 'consulta_id', r.consulta_id, 'medicamento', r.medicamento,
+                                  'dosagem', r.dosagem, 'instrucoes', r.instrucoes)
+        FROM consultas c
+        JOIN clinico.receitas r ON r.consulta_id = c.id
+        UNION ALL
+        SELECT 'pagamento', COALESCE(pg.data_pagamento, pg.data_consulta), pg.id,
+               jsonb_build_object('pagamento_id', pg.id, 'consulta_id', pg.consulta_id, 'valor', pg.valor,
+                                  'metodo', pg.metodo, 'pago', pg.pago, 'data_pagamento', pg.data_pagamento)
+        FROM consultas c
+        JOIN financeiro.pagamentos pg ON pg.consulta_id = c.id
+        UNION ALL
+        SELECT 'compra', v.data, v.id,
+               jsonb_build_object('venda_id', v.id, 'total_bruto', v.total_bruto, 'desconto_aplicado', v.desconto_aplicado,
+                                  'total_liquido', v.total_liquido, 'forma_pagamento', v.forma_pagamento,
+                                  'status_pagamento', v.status_pagamento)
+        FROM vendas.vendas v
+        WHERE v.cliente_id = p_paciente_id
+    ),
+    pagina AS (
+        SELECT *
+        FROM eventos
+        ORDER BY data DESC, tipo, id
+        LIMIT p_limite OFFSET p_deslocamento
+    )
+    SELECT jsonb_build_object(
+        'paciente', (
+            SELECT jsonb_build_object('id', p.id, 'nome', p.nome, 'cpf', p.cpf, 'email', p.email, 'telefone', p.telefone,
+                                      'cidade', p.cidade, 'sigla_estado', p.sigla_estado, 'tem_desconto', p.tem_desconto)
+            FROM cadastros.pacientes p
+            WHERE p.id = p_paciente_id
+        ),
+        'total_eventos', (SELECT count(*) FROM eventos),
+        'limite', p_limite,
+        'deslocamento', p_deslocamento,
+        'eventos', COALESCE((
+            SELECT jsonb_agg(
+                       jsonb_build_object('tipo', pg.tipo, 'data', pg.data) || pg.detalhes
+                       || CASE WHEN pg.tipo = 'compra' THEN jsonb_build_object('itens', (
+                              SELECT jsonb_agg(jsonb_build_object('produto', pr.nome, 'quantidade', i.quantidade,
+                                                                  'preco_unitario', i.preco_unitario) ORDER BY i.id)
+                              FROM vendas.itens_venda i
+                              JOIN vendas.produtos pr ON pr.id = i.produto_id
+                              WHERE i.venda_id = pg.id AND i.data_venda = pg.data))
+                          ELSE '{}'::jsonb END
+                       ORDER BY pg.data DESC, pg.tipo, pg.id)
+            FROM pagina pg
+        ), '[]'::jsonb)
+    );
+$$;
+
+-- Avisa no canal "pacientes_alterados" quais pacientes tiveram o histórico alterado pelo comando
+-- (payload: lista JSON de IDs), para que as aplicações descartem apenas as linhas do tempo em cache
+-- desses pacientes. Comandos que afetam muitos pacientes (cargas em massa, TRUNCATE) enviam '*'.
+CREATE OR REPLACE FUNCTION clinico.notificar_pacientes_alterados()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_consulta TEXT;
+    v_ids INTEGER[] := '{}';
+    v_parcial INTEGER[];
+    v_transicao TEXT;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('pacientes_alterados', '*');
+        RETURN NULL;
+    END IF;
+
+    -- Como chegar ao paciente a partir das linhas alteradas de cada tabela
+    v_consulta := CASE TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME
+        WHEN 'cadastros.pacientes' THEN 'SELECT t.id FROM %I t'
+        WHEN 'clinico.consultas' THEN 'SELECT t.paciente_id FROM %I t'
+        WHEN 'vendas.vendas' THEN 'SELECT t.cliente_id FROM %I t'
+        WHEN 'vendas.itens_venda' THEN
+            'SELECT v.cliente_id FROM %I t JOIN vendas.vendas v ON v.id = t.venda_id AND v.data = t.data_venda'
+        ELSE
+            'SELECT c.paciente_id FROM %I t JOIN clinico.consultas c ON c.id = t.consulta_id AND c.data = t.data_consulta'
+    END;
+
+    FOREACH v_transicao IN ARRAY CASE TG_OP WHEN 'INSERT' THEN ARRAY['novas']
+                                             WHEN 'DELETE' THEN ARRAY['antigas']
+                                             ELSE ARRAY['novas', 'antigas'] END LOOP
+        EXECUTE format('SELECT array_agg(DISTINCT x) FROM (' || v_consulta || ') s(x)', v_transicao) INTO v_parcial;
+        v_ids := v_ids || COALESCE(v_parcial, '{}');
+    END LOOP;
+
+    v_ids := ARRAY(SELECT DISTINCT unnest(v_ids));
+    IF cardinality(v_ids) > 500 THEN
+        PERFORM pg_notify('pacientes_alterados', '*');
+    ELSIF cardinality(v_ids) > 0 THEN
+        PERFORM pg_notify('pacientes_alterados', array_to_json(v_ids)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Triggers por comando com tabelas de transição: uma notificação por comando, e não por linha
+DO $$
+DECLARE
+    v_tabela TEXT;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY['cadastros.pacientes', 'clinico.consultas', 'clinico.receitas',
+                                   'financeiro.pagamentos', 'vendas.vendas', 'vendas.itens_venda'] LOOP
+        EXECUTE format('CREATE TRIGGER trg_pacientes_alterados_insert AFTER INSERT ON %s
+                        REFERENCING NEW TABLE AS novas
+                        FOR EACH STATEMENT EXECUTE FUNCTION clinico.notificar_pacientes_alterados()', v_tabela);
+        EXECUTE format('CREATE TRIGGER trg_pacientes_alterados_update AFTER UPDATE ON %s
+                        REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+                        FOR EACH STATEMENT EXECUTE FUNCTION clinico.notificar_pacientes_alterados()', v_tabela);
+        EXECUTE format('CREATE TRIGGER trg_pacientes_alterados_delete AFTER DELETE ON %s
+                        REFERENCING OLD TABLE AS antigas
+                        FOR EACH STATEMENT EXECUTE FUNCTION clinico.notificar_pacientes_alterados()', v_tabela);
+        EXECUTE format('CREATE TRIGGER trg_pacientes_alterados_truncate AFTER TRUNCATE ON %s
+                        FOR EACH STATEMENT EXECUTE FUNCTION clinico.notificar_pacientes_alterados()', v_tabela);
+    END LOOP;
+END;
+$$;
+
+
+-- ==========================================
+-- INDICADORES CLÍNICOS DIÁRIOS
+-- ==========================================
+
+-- Consultas por status e valores faturados/recebidos por médico e por dia (o dia da consulta).
+-- Os painéis leem só esta tabela, então o custo depende do período exibido e não do tamanho do
+-- histórico. A especialidade vem do cadastro atual do médico, na leitura.
+CREATE TABLE clinico.indicadores_diarios (
+    dia DATE NOT NULL,
+    medico_id INTEGER NOT NULL,
+    agendadas INTEGER NOT NULL DEFAULT 0,
+    realizadas INTEGER NOT NULL DEFAULT 0,
+    canceladas INTEGER NOT NULL DEFAULT 0,
+    valor_faturado NUMERIC(12,2) NOT NULL DEFAULT 0,
+    valor_recebido NUMERIC(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, medico_id)
+);
+
+COMMENT ON TABLE clinico.indicadores_diarios IS 'Consultas por status e valores faturados/recebidos por médico e dia, mantidos por triggers.';
+
+-- Recalcula, a partir das tabelas de origem, as linhas (dia, médico) informadas. Cada chave custa
+-- uma leitura do índice (medico_id, data) de um dia, mais os pagamentos dessas consultas.
+-- As linhas são bloqueadas antes do recálculo, em ordem: transações concorrentes que alteram o mesmo
+-- médico no mesmo dia recalculam uma de cada vez, e cada uma enxerga o COMMIT da anterior.
+CREATE OR REPLACE FUNCTION clinico.atualizar_indicadores(p_dias DATE[], p_medicos INTEGER[])
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO clinico.indicadores_diarios (dia, medico_id)
+    SELECT DISTINCT k.dia, k.medico_id
+    FROM unnest(p_dias, p_medicos) AS k(dia, medico_id)
+    ORDER BY 1, 2
+    ON CONFLICT (dia, medico_id) DO NOTHING;
+
+    PERFORM 1
+    FROM clinico.indicadores_diarios i
+    JOIN (SELECT DISTINCT dia, medico_id FROM unnest(p_dias, p_medicos) AS k(dia, medico_id)) k
+      ON k.dia = i.dia AND k.medico_id = i.medico_id
+    ORDER BY i.dia, i.medico_id
+    FOR UPDATE OF i;
+
+    UPDATE clinico.indicadores_diarios i
+    SET agendadas = n.agendadas,
+        realizadas = n.realizadas,
+        canceladas = n.canceladas,
+        valor_faturado = n.valor_faturado,
+        valor_recebido = n.valor_recebido
+    FROM (
+        SELECT k.dia, k.medico_id,
+               COUNT(c.id) FILTER (WHERE COALESCE(c.status, 'Agendada') = 'Agendada') AS agendadas,
+               COUNT(c.id) FILTER (WHERE c.status = 'Realizada') AS realizadas,
+               COUNT(c.id) FILTER (WHERE c.status = 'Cancelada') AS canceladas,
+               COALESCE(SUM(pg.faturado), 0) AS valor_faturado,
+               COALESCE(SUM(pg.recebido), 0) AS valor_recebido
+        FROM (SELECT DISTINCT dia, medico_id FROM unnest(p_dias, p_medicos) AS k(dia, medico_id)) k
+        LEFT JOIN clinico.consultas c
+               ON c.medico_id = k.medico_id AND c.data >= k.dia AND c.data < k.dia + 1
+        LEFT JOIN LATERAL (
+            SELECT SUM(p.valor) AS faturado, SUM(p.valor) FILTER (WHERE p.pago) AS recebido
+            FROM financeiro.pagamentos p
+            WHERE p.consulta_id = c.id
+        ) pg ON TRUE
+        GROUP BY k.dia, k.medico_id
+    ) n
+    WHERE i.dia = n.dia AND i.medico_id = n.medico_id;
+
+    -- Dias sem nenhuma consulta do médico não ocupam espaço
+    DELETE FROM clinico.indicadores_diarios i
+    USING unnest(p_dias, p_medicos) AS k(dia, medico_id)
+    WHERE i.dia = k.dia AND i.medico_id = k.medico_id
+      AND i.agendadas = 0 AND i.realizadas = 0 AND i.canceladas = 0;
+END;
+$$;
+
+-- Consultas inseridas, removidas ou com data, médico ou status alterados: recalcula os dias afetados
+-- (no caso de mudança de data ou de médico, o de antes e o de depois, junto com os pagamentos da consulta).
+CREATE OR REPLACE FUNCTION clinico.indicadores_alteracao_consultas()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_dias DATE[];
+    v_medicos INTEGER[];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        TRUNCATE clinico.indicadores_diarios;
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT array_agg(dia), array_agg(medico_id) INTO v_dias, v_medicos
+        FROM (SELECT DISTINCT data::date, medico_id FROM novas) k(dia, medico_id);
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(dia), array_agg(medico_id) INTO v_dias, v_medicos
+        FROM (SELECT DISTINCT data::date, medico_id FROM antigas) k(dia, medico_id);
+    ELSE
+        -- Alterações de motivo e diagnóstico não mudam os indicadores
+        SELECT array_agg(dia), array_agg(medico_id) INTO v_dias, v_medicos
+        FROM (
+            SELECT u.dia, u.medico_id
+            FROM antigas a
+            JOIN novas n ON n.id = a.id
+            CROSS JOIN LATERAL (VALUES (a.data::date, a.medico_id), (n.data::date, n.medico_id)) u(dia, medico_id)
+            WHERE (a.data, a.medico_id, a.status) IS DISTINCT FROM (n.data, n.medico_id, n.status)
+            GROUP BY u.dia, u.medico_id
+        ) k;
+    END IF;
+
+    IF v_dias IS NOT NULL THEN
+        PERFORM clinico.atualizar_indicadores(v_dias, v_medicos);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Pagamentos inseridos, removidos ou com consulta, valor ou situação alterados. A mudança de
+-- data_consulta em cascata (consulta remarcada) já é tratada pelo trigger das consultas.
+CREATE OR REPLACE FUNCTION financeiro.indicadores_alteracao_pagamentos()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_consultas INTEGER[];
+    v_datas TIMESTAMP[];
+    v_dias DATE[];
+    v_medicos INTEGER[];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE clinico.indicadores_diarios SET valor_faturado = 0, valor_recebido = 0
+        WHERE valor_faturado <> 0 OR valor_recebido <> 0;
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT array_agg(consulta_id), array_agg(data_consulta) INTO v_consultas, v_datas
+        FROM (SELECT DISTINCT consulta_id, data_consulta FROM novas) x;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(consulta_id), array_agg(data_consulta) INTO v_consultas, v_datas
+        FROM (SELECT DISTINCT consulta_id, data_consulta FROM antigas) x;
+    ELSE
+        SELECT array_agg(consulta_id), array_agg(data_consulta) INTO v_consultas, v_datas
+        FROM (
+            SELECT u.consulta_id, u.data_consulta
+            FROM antigas a
+            JOIN novas n ON n.id = a.id
+            CROSS JOIN LATERAL (VALUES (a.consulta_id, a.data_consulta), (n.consulta_id, n.data_consulta)) u(consulta_id, data_consulta)
+            WHERE (a.consulta_id, a.valor, a.pago) IS DISTINCT FROM (n.consulta_id, n.valor, n.pago)
+            GROUP BY u.consulta_id, u.data_consulta
+        ) x;
+    END IF;
+
+    SELECT array_agg(dia), array_agg(medico_id) INTO v_dias, v_medicos
+    FROM (
+        SELECT DISTINCT c.data::date, c.medico_id
+        FROM unnest(v_consultas, v_datas) AS x(consulta_id, data_consulta)
+        JOIN clinico.consultas c ON c.id = x.consulta_id AND c.data = x.data_consulta
+    ) k(dia, medico_id);
+
+    IF v_dias IS NOT NULL THEN
+        PERFORM clinico.atualizar_indicadores(v_dias, v_medicos);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Triggers por comando: um único recálculo, com as chaves de todas as linhas alteradas pelo comando
+DO $$
+DECLARE
+    v_tabela TEXT;
+    v_funcao TEXT;
+BEGIN
+    FOR v_tabela, v_funcao IN
+        SELECT * FROM (VALUES ('clinico.consultas', 'clinico.indicadores_alteracao_consultas'),
+                              ('financeiro.pagamentos', 'financeiro.indicadores_alteracao_pagamentos')) t
+    LOOP
+        EXECUTE format('CREATE TRIGGER trg_indicadores_insert AFTER INSERT ON %s
+                        REFERENCING NEW TABLE AS novas
+                        FOR EACH STATEMENT EXECUTE FUNCTION %s()', v_tabela, v_funcao);
+        EXECUTE format('CREATE TRIGGER trg_indicadores_update AFTER UPDATE ON %s
+                        REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+                        FOR EACH STATEMENT EXECUTE FUNCTION %s()', v_tabela, v_funcao);
+        EXECUTE format('CREATE TRIGGER trg_indicadores_delete AFTER DELETE ON %s
+                        REFERENCING OLD TABLE AS antigas
+                        FOR EACH STATEMENT EXECUTE FUNCTION %s()', v_tabela, v_funcao);
+        EXECUTE format('CREATE TRIGGER trg_indicadores_truncate AFTER TRUNCATE ON %s
+                        FOR EACH STATEMENT EXECUTE FUNCTION %s()', v_tabela, v_funcao);
+    END LOOP;
+END;
+$$;
+
+-- Refaz os indicadores de um período (ou de todo o histórico, sem datas) a partir das tabelas de origem:
+-- carga inicial de bancos criados antes desta tabela, ou cargas feitas com os triggers desabilitados.
+-- O bloqueio espera as transações que já alteraram indicadores e segura as novas até o fim do recálculo.
+CREATE OR REPLACE FUNCTION clinico.recalcular_indicadores(
+    p_inicio DATE DEFAULT NULL,
+    p_fim DATE DEFAULT NULL
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_inicio DATE := COALESCE(p_inicio, '-infinity'::date);
+    v_fim DATE := COALESCE(p_fim + 1, 'infinity'::date);
+    v_total INTEGER;
+BEGIN
+    LOCK TABLE clinico.indicadores_diarios IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM clinico.indicadores_diarios WHERE dia >= v_inicio AND dia < v_fim;
+
+    INSERT INTO clinico.indicadores_diarios (dia, medico_id, agendadas, realizadas, canceladas, valor_faturado, valor_recebido)
+    SELECT c.data::date, c.medico_id,
+           COUNT(*) FILTER (WHERE COALESCE(c.status, 'Agendada') = 'Agendada'),
+           COUNT(*) FILTER (WHERE c.status = 'Realizada'),
+           COUNT(*) FILTER (WHERE c.status = 'Cancelada'),
+           COALESCE(SUM(pg.faturado), 0),
+           COALESCE(SUM(pg.recebido), 0)
+    FROM clinico.consultas c
+    LEFT JOIN (
+        SELECT consulta_id, SUM(valor) AS faturado, SUM(valor) FILTER (WHERE pago) AS recebido
+        FROM financeiro.pagamentos
+        WHERE data_consulta >= v_inicio AND data_consulta < v_fim
+        GROUP BY consulta_id
+    ) pg ON pg.consulta_id = c.id
+    WHERE c.data >= v_inicio AND c.data < v_fim
+    GROUP BY c.data::date, c.medico_id;
+
+    GET DIAGNOSTICS v_total = ROW_COUNT;
+    RETURN v_total;
+END;
+$$;
+
+
+-- ==========================================
+-- CONCILIAÇÃO DE PAGAMENTOS EM LOTE
+-- ==========================================
+
+-- Área de carga (temporária, da sessão) das linhas do arquivo de liquidação do banco/adquirente.
+-- É descartada no COMMIT, então cada conciliação roda em uma única transação:
+-- preparar_conciliacao -> COPY conciliacao_extrato FROM STDIN -> conciliar_extrato.
+CREATE OR REPLACE FUNCTION financeiro.preparar_conciliacao()
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS conciliacao_extrato (
+        linha INTEGER GENERATED ALWAYS AS IDENTITY,
+        consulta_id INTEGER,
+        valor NUMERIC(10,2),
+        data_pagamento TIMESTAMP WITHOUT TIME ZONE,
+        metodo VARCHAR(30),
+        pagamento_id INTEGER
+    ) ON COMMIT DROP;
+    TRUNCATE conciliacao_extrato;
+END;
+$$;
+
+-- Concilia as linhas carregadas em conciliacao_extrato com os pagamentos em aberto e devolve as que
+-- não foram conciliadas, com o motivo. Uma linha concilia um pagamento em aberto da mesma consulta e
+-- de mesmo valor, se a data de liquidação não for futura nem anterior à consulta em mais de
+-- p_dias_antecedencia dias. Várias linhas da mesma consulta e valor (parcelas) são pareadas uma a uma
+-- com os pagamentos, em ordem de data e de ID. Todos os pagamentos são quitados em um único UPDATE.
+CREATE OR REPLACE FUNCTION financeiro.conciliar_extrato(
+    p_dias_antecedencia INTEGER DEFAULT 30
+)
+RETURNS TABLE(linha INTEGER, consulta_id INTEGER, valor NUMERIC, data_pagamento TIMESTAMP, motivo TEXT)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF to_regclass('pg_temp.conciliacao_extrato') IS NULL THEN
+        PERFORM financeiro.preparar_conciliacao();
+    END IF;
+    -- Tabelas temporárias não são analisadas pelo autovacuum
+    ANALYZE conciliacao_extrato;
+
+    WITH candidatas AS (
+        SELECT e.linha, e.consulta_id, e.valor, e.data_pagamento, e.metodo,
+               ROW_NUMBER() OVER (PARTITION BY e.consulta_id, e.valor ORDER BY e.data_pagamento, e.linha) AS ordem
+        FROM conciliacao_extrato e
+        WHERE e.data_pagamento::date <= CURRENT_DATE
+          AND EXISTS (
+              SELECT 1
+              FROM financeiro.pagamentos pg
+              WHERE pg.consulta_id = e.consulta_id
+                AND pg.pago = FALSE
+                AND e.data_pagamento >= pg.data_consulta::date - p_dias_antecedencia
+          )
+    ),
+    abertos AS (
+        SELECT pg.id, pg.consulta_id, pg.valor,
+               ROW_NUMBER() OVER (PARTITION BY pg.consulta_id, pg.valor ORDER BY pg.id) AS ordem
+        FROM financeiro.pagamentos pg
+        WHERE pg.pago = FALSE
+          AND pg.consulta_id IN (SELECT e.consulta_id FROM conciliacao_extrato e)
+    ),
+    pares AS (
+        SELECT a.id AS pagamento_id, c.linha, c.data_pagamento, c.metodo
+        FROM candidatas c
+        JOIN abertos a ON a.consulta_id = c.consulta_id AND a.valor = c.valor AND a.ordem = c.ordem
+    ),
+    quitados AS (
+        UPDATE financeiro.pagamentos pg
+        SET pago = TRUE,
+            data_pagamento = p.data_pagamento,
+            metodo = CASE WHEN p.metodo IN ('Dinheiro', 'Cartão', 'Transferência', 'Seguro') THEN p.metodo ELSE pg.metodo END
+        FROM pares p
+        WHERE pg.id = p.pagamento_id
+        RETURNING pg.id, p.linha
+    )
+    UPDATE conciliacao_extrato e
+    SET pagamento_id = q.id
+    FROM quitados q
+    WHERE e.linha = q.linha;
+
+    RETURN QUERY
+    SELECT e.linha, e.consulta_id, e.valor::numeric, e.data_pagamento,
+           CASE
+               WHEN e.consulta_id IS NULL OR e.valor IS NULL OR e.data_pagamento IS NULL THEN 'Linha incompleta'
+               WHEN NOT EXISTS (SELECT 1 FROM financeiro.pagamentos pg WHERE pg.consulta_id = e.consulta_id)
+                   THEN 'Consulta sem pagamento lançado'
+               WHEN NOT EXISTS (SELECT 1 FROM financeiro.pagamentos pg WHERE pg.consulta_id = e.consulta_id AND pg.pago = FALSE)
+                   THEN 'Pagamento da consulta já quitado'
+               WHEN NOT EXISTS (SELECT 1 FROM financeiro.pagamentos pg
+                                WHERE pg.consulta_id = e.consulta_id AND pg.pago = FALSE AND pg.valor = e.valor)
+                   THEN 'Valor diferente do pagamento em aberto'
+               ELSE 'Data fora da janela da consulta ou linha duplicada'
+           END
+    FROM conciliacao_extrato e
+    WHERE e.pagamento_id IS NULL
+    ORDER BY e.linha;
+END;
+$$;
+
+-- ==========================================
+-- CATÁLOGO DE PRODUTOS (MODELO DE LEITURA)
+-- ==========================================
+
+-- Cópia desnormalizada de produtos + categorias + estoque, apenas com os produtos ativos.
+-- É mantida pelos triggers abaixo e atende a todas as buscas de produtos da aba Vendas
+-- sem junções; cada filtro tem um índice parcial/de cobertura próprio.
+CREATE TABLE vendas.catalogo_produtos (
+    produto_id INTEGER PRIMARY KEY,
+    nome VARCHAR(200) NOT NULL,
+    descricao TEXT,
+    preco NUMERIC(12,2) NOT NULL,
+    categoria_id INTEGER,
+    categoria VARCHAR(100),
+    fabricado_em_mari BOOLEAN NOT NULL DEFAULT FALSE,
+    quantidade INTEGER,
+    ponto_reposicao INTEGER
+);
+
+COMMENT ON TABLE vendas.catalogo_produtos IS 'Modelo de leitura do catálogo (produtos ativos com categoria e estoque), mantido por triggers.';
+
+CREATE INDEX idx_catalogo_nome ON vendas.catalogo_produtos(nome) INCLUDE (produto_id, preco, categoria, quantidade);
+CREATE INDEX idx_catalogo_nome_trgm ON vendas.catalogo_produtos USING gin (lower(nome) gin_trgm_ops);
+CREATE INDEX idx_catalogo_preco ON vendas.catalogo_produtos(preco) INCLUDE (produto_id, nome, categoria, quantidade);
+CREATE INDEX idx_catalogo_categoria ON vendas.catalogo_produtos(categoria) INCLUDE (produto_id, nome, preco, quantidade);
+CREATE INDEX idx_catalogo_fab_mari ON vendas.catalogo_produtos(produto_id) INCLUDE (nome, preco, quantidade)
+    WHERE fabricado_em_mari;
+CREATE INDEX idx_catalogo_estoque_baixo ON vendas.catalogo_produtos(quantidade) INCLUDE (produto_id, nome, preco, ponto_reposicao)
+    WHERE quantidade < ponto_reposicao;
+
+-- Produto inserido/alterado: atualiza a linha do catálogo (ou a remove se o produto ficou inativo)
+CREATE OR REPLACE FUNCTION vendas.sincronizar_catalogo_produto()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' OR NEW.ativo IS NOT TRUE THEN
+        DELETE FROM vendas.catalogo_produtos WHERE produto_id = OLD.id;
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO vendas.catalogo_produtos (produto_id, nome, descricao, preco, categoria_id, categoria, fabricado_em_mari, quantidade, ponto_reposicao)
+    SELECT NEW.id, NEW.nome, NEW.descricao, NEW.preco, NEW.categoria_id,
+           (SELECT c.nome FROM vendas.categorias c WHERE c.id = NEW.categoria_id),
+           COALESCE(NEW.fabricado_em_mari, FALSE),
+           e.quantidade, e.ponto_reposicao
+    FROM (SELECT 1) AS x
+    LEFT JOIN vendas.estoque e ON e.produto_id = NEW.id
+    ON CONFLICT (produto_id) DO UPDATE SET
+        nome = EXCLUDED.nome,
+        descricao = EXCLUDED.descricao,
+        preco = EXCLUDED.preco,
+        categoria_id = EXCLUDED.categoria_id,
+        categoria = EXCLUDED.categoria,
+        fabricado_em_mari = EXCLUDED.fabricado_em_mari,
+        quantidade = EXCLUDED.quantidade,
+        ponto_reposicao = EXCLUDED.ponto_reposicao;
+    RETURN NULL;
+END;
+$$;
+
+-- Estoque alterado (inclusive pela efetivar_compra): atualiza apenas a quantidade e o ponto de reposição
+CREATE OR REPLACE FUNCTION vendas.sincronizar_catalogo_estoque()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE vendas.catalogo_produtos SET quantidade = NULL, ponto_reposicao = NULL WHERE produto_id = OLD.produto_id;
+    ELSE
+        UPDATE vendas.catalogo_produtos SET quantidade = NEW.quantidade, ponto_reposicao = NEW.ponto_reposicao
+        WHERE produto_id = NEW.produto_id
+          AND (quantidade, ponto_reposicao) IS DISTINCT FROM (NEW.quantidade, NEW.ponto_reposicao);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Categoria renomeada. A remoção de uma categoria já chega pelo trigger de produtos
+-- (a chave estrangeira faz SET NULL em produtos.categoria_id).
+CREATE OR REPLACE FUNCTION vendas.sincronizar_catalogo_categoria()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE vendas.catalogo_produtos SET categoria = NEW.nome WHERE categoria_id = NEW.id;
+    RETURN NULL;
+END;
+$$;
+
+-- TRUNCATE em produtos (ex: ferramentas.gerador_dados) esvazia também o catálogo
+CREATE OR REPLACE FUNCTION vendas.limpar_catalogo_produtos()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE vendas.catalogo_produtos;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_catalogo_produto
+AFTER INSERT OR UPDATE OR DELETE ON vendas.produtos
+FOR EACH ROW EXECUTE FUNCTION vendas.sincronizar_catalogo_produto();
+
+CREATE TRIGGER trg_catalogo_produto_truncate
+AFTER TRUNCATE ON vendas.produtos
+FOR EACH STATEMENT EXECUTE FUNCTION vendas.limpar_catalogo_produtos();
+
+CREATE TRIGGER trg_catalogo_estoque
+AFTER INSERT OR UPDATE OF quantidade, ponto_reposicao OR DELETE ON vendas.estoque
+FOR EACH ROW EXECUTE FUNCTION vendas.sincronizar_catalogo_estoque();
+
+CREATE TRIGGER trg_catalogo_categoria
+AFTER UPDATE OF nome ON vendas.categorias
+FOR EACH ROW EXECUTE FUNCTION vendas.sincronizar_catalogo_categoria();
+
+-- Alerta de estoque baixo (canal "estoque_baixo"): disparado pelo catálogo, que só tem produtos ativos e
+-- já reflete estoque, nome e preço. Notifica quando um produto cruza o ponto de reposição em qualquer
+-- direção (inclusive ao ser desativado ou removido, com "abaixo" = false) e quando a quantidade, o ponto,
+-- o nome ou o preço mudam enquanto ele está abaixo. O TRUNCATE do catálogo envia "id" nulo (limpar tudo).
+-- A notificação só é entregue no COMMIT, então vendas desfeitas (ex: falta de estoque) não geram alertas.
+CREATE OR REPLACE FUNCTION vendas.notificar_estoque_baixo()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_abaixo_antes BOOLEAN := FALSE;
+    v_abaixo_agora BOOLEAN := FALSE;
+    v_produto vendas.catalogo_produtos;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('estoque_baixo', json_build_object('id', NULL, 'abaixo', FALSE)::text);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP <> 'INSERT' THEN
+        v_abaixo_antes := COALESCE(OLD.quantidade < OLD.ponto_reposicao, FALSE);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        v_abaixo_agora := COALESCE(NEW.quantidade < NEW.ponto_reposicao, FALSE);
+    END IF;
+
+    IF v_abaixo_antes = v_abaixo_agora
+       AND NOT (v_abaixo_agora AND (OLD.nome, OLD.preco, OLD.quantidade, OLD.ponto_reposicao)
+                                   IS DISTINCT FROM (NEW.nome, NEW.preco, NEW.quantidade, NEW.ponto_reposicao)) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        v_produto := OLD;
+    ELSE
+        v_produto := NEW;
+    END IF;
+
+    PERFORM pg_notify('estoque_baixo', json_build_object(
+        'id', v_produto.produto_id,
+        'nome', v_produto.nome,
+        'preco', v_produto.preco,
+        'quantidade', v_produto.quantidade,
+        'ponto_reposicao', v_produto.ponto_reposicao,
+        'abaixo', v_abaixo_agora
+    )::text);
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_estoque_baixo
+AFTER INSERT OR UPDATE OR DELETE ON vendas.catalogo_produtos
+FOR EACH ROW EXECUTE FUNCTION vendas.notificar_estoque_baixo();
+
+CREATE TRIGGER trg_estoque_baixo_truncate
+AFTER TRUNCATE ON vendas.catalogo_produtos
+FOR EACH STATEMENT EXECUTE FUNCTION vendas.notificar_estoque_baixo();
+
+
+-- ==========================================
+-- REAJUSTE DE PREÇOS EM LOTE
+-- ==========================================
+
+-- Novo preço de um produto: p_tipo 'percentual' (p_valor em %) ou 'valor' (p_valor em R$; ambos podem
+-- ser negativos), arredondado para 'centavos', 'inteiro' (real mais próximo) ou 'final_90' (o próximo
+-- x,90 acima). Tipo ou arredondamento desconhecidos resultam em NULL, que o UPDATE recusa (preco NOT NULL).
+CREATE OR REPLACE FUNCTION vendas.preco_reajustado(
+    p_preco NUMERIC,
+    p_tipo VARCHAR,
+    p_valor NUMERIC,
+    p_arredondamento VARCHAR DEFAULT 'centavos'
+)
+RETURNS NUMERIC
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE p_arredondamento
+               WHEN 'centavos' THEN round(novo, 2)
+               WHEN 'inteiro' THEN round(novo)
+               WHEN 'final_90' THEN ceil(novo - 0.90) + 0.90
+           END
+    FROM (SELECT CASE p_tipo
+                     WHEN 'percentual' THEN p_preco * (1 + p_valor / 100)
+                     WHEN 'valor' THEN p_preco + p_valor
+                 END AS novo) AS x;
+$$;
+
+-- Prévia do reajuste: produtos ativos que atendem aos filtros (NULL = todos), com o preço atual e o novo.
+-- É a mesma seleção usada por vendas.reajustar_precos, então a prévia mostra exatamente o que será gravado.
+CREATE OR REPLACE FUNCTION vendas.previa_reajuste_precos(
+    p_categoria_id INTEGER,
+    p_fabricado_em_mari BOOLEAN,
+    p_preco_min NUMERIC,
+    p_preco_max NUMERIC,
+    p_tipo VARCHAR,
+    p_valor NUMERIC,
+    p_arredondamento VARCHAR DEFAULT 'centavos'
+)
+RETURNS TABLE(produto_id INTEGER, nome VARCHAR, categoria VARCHAR, preco_atual NUMERIC, preco_novo NUMERIC)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT p.id, p.nome, c.nome, p.preco, vendas.preco_reajustado(p.preco, p_tipo, p_valor, p_arredondamento)
+    FROM vendas.produtos p
+    LEFT JOIN vendas.categorias c ON c.id = p.categoria_id
+    WHERE p.ativo = TRUE
+      AND (p_categoria_id IS NULL OR p.categoria_id = p_categoria_id)
+      AND (p_fabricado_em_mari IS NULL OR COALESCE(p.fabricado_em_mari, FALSE) = p_fabricado_em_mari)
+      AND (p_preco_min IS NULL OR p.preco >= p_preco_min)
+      AND (p_preco_max IS NULL OR p.preco <= p_preco_max);
+$$;
+
+-- Aplica o reajuste com um único UPDATE (tudo ou nada) e retorna quantos preços mudaram.
+-- Preços que ficariam negativos violam o CHECK de vendas.produtos e desfazem o reajuste inteiro.
+CREATE OR REPLACE FUNCTION vendas.reajustar_precos(
+    p_categoria_id INTEGER,
+    p_fabricado_em_mari BOOLEAN,
+    p_preco_min NUMERIC,
+    p_preco_max NUMERIC,
+    p_tipo VARCHAR,
+    p_valor NUMERIC,
+    p_arredondamento VARCHAR DEFAULT 'centavos'
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_alterados INTEGER;
+BEGIN
+    UPDATE vendas.produtos p
+    SET preco = r.preco_novo
+    FROM vendas.previa_reajuste_precos(p_categoria_id, p_fabricado_em_mari, p_preco_min, p_preco_max,
+                                       p_tipo, p_valor, p_arredondamento) r
+    WHERE p.id = r.produto_id
+      AND r.preco_novo IS DISTINCT FROM p.preco;
+    GET DIAGNOSTICS v_alterados = ROW_COUNT;
+    RETURN v_alterados;
+END;
+$$;
 
 -- === INSERÇÃO DE PRODUTOS DE EXEMPLO ===
 INSERT INTO vendas.produtos (nome, preco, categoria_id) VALUES
@@ -346,7 +1477,7 @@ BEGIN
             )
             FROM vendas.itens_venda iv
             JOIN vendas.produtos p ON p.id = iv.produto_id
-            WHERE iv.venda_id = v.id
+            WHERE iv.venda_id = v.id AND iv.data_venda = v.data
         ) AS itens
     FROM vendas.vendas v
     WHERE v.cliente_id = p_cliente_id
@@ -453,19 +1584,19 @@ ON CONFLICT (produto_id) DO UPDATE SET quantidade = EXCLUDED.quantidade;
 -- Venda 1: Para Gabriel Barbosa (cliente_id=1), com desconto de 10%
 INSERT INTO vendas.vendas (id, cliente_id, vendedor_id, data, total_bruto, desconto_aplicado, total_liquido, forma_pagamento, status_pagamento) VALUES
 (1, 1, 1, '2025-09-25 10:00:00', 100.00, 10.00, 90.00, 'Cartão', 'Confirmado')
-ON CONFLICT (id) DO NOTHING;
+ON CONFLICT (id, data) DO NOTHING;
 
-INSERT INTO vendas.itens_venda (venda_id, produto_id, quantidade, preco_unitario) VALUES
-(1, 3, 1, 100.00); -- 1 Protetor Solar
+INSERT INTO vendas.itens_venda (venda_id, data_venda, produto_id, quantidade, preco_unitario) VALUES
+(1, '2025-09-25 10:00:00', 3, 1, 100.00); -- 1 Protetor Solar
 
 -- Venda 2: Para Bruno Henrique (cliente_id=3), sem desconto e com múltiplos itens
 INSERT INTO vendas.vendas (id, cliente_id, vendedor_id, data, total_bruto, desconto_aplicado, total_liquido, forma_pagamento, status_pagamento) VALUES
 (2, 3, 1, '2025-09-28 15:30:00', 130.00, 0.00, 130.00, 'PIX', 'Confirmado')
-ON CONFLICT (id) DO NOTHING;
+ON CONFLICT (id, data) DO NOTHING;
 
-INSERT INTO vendas.itens_venda (venda_id, produto_id, quantidade, preco_unitario) VALUES
-(2, 1, 2, 50.00), -- 2 Vitaminas A
-(2, 2, 1, 30.00); -- 1 Produto Exemplo 2
+INSERT INTO vendas.itens_venda (venda_id, data_venda, produto_id, quantidade, preco_unitario) VALUES
+(2, '2025-09-28 15:30:00', 1, 2, 50.00), -- 2 Vitaminas A
+(2, '2025-09-28 15:30:00', 2, 1, 30.00); -- 1 Produto Exemplo 2
 
 -- Reseta a sequência da tabela de vendas para o próximo valor disponível
 SELECT setval('vendas.vendas_id_seq', (SELECT MAX(id) FROM vendas.vendas));
@@ -487,12 +1618,24 @@ FROM
 JOIN
     cadastros.funcionarios f ON v.vendedor_id = f.id
 LEFT JOIN 
-    vendas.itens_venda iv ON v.id = iv.venda_id
+    vendas.itens_venda iv ON v.id = iv.venda_id AND iv.data_venda = v.data
 GROUP BY
     mes, vendedor
 ORDER BY
     mes DESC, valor_total_vendido DESC;
 
+-- Função única de consulta da elegibilidade ao desconto.
+-- É usada tanto pela prévia do carrinho (VERIFICAR_DESCONTO_CLIENTE) quanto por efetivar_compra.
+CREATE OR REPLACE FUNCTION cadastros.cliente_tem_desconto(
+    p_cliente_id INTEGER
+)
+RETURNS BOOLEAN
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE((SELECT tem_desconto FROM cadastros.pacientes WHERE id = p_cliente_id), FALSE);
+$$;
+
 -- Stored Procedure para efetivar uma compra
 CREATE OR REPLACE FUNCTION vendas.efetivar_compra(
     p_cliente_id INTEGER,
@@ -509,6 +1652,7 @@ DECLARE
     desconto_venda NUMERIC(12,2) := 0;
     total_liquido_venda NUMERIC(12,2);
     nova_venda_id INTEGER;
+    data_hora_venda TIMESTAMP := CURRENT_TIMESTAMP;
     cliente_tem_desconto BOOLEAN;
     produto_sem_estoque RECORD;
 BEGIN
@@ -548,8 +1692,7 @@ BEGIN
     SELECT SUM(quantidade * preco_unitario) INTO total_bruto_venda FROM itens_carrinho;
 
     -- 5. Verifica e aplica o desconto.
-    SELECT (torce_flamengo OR assiste_one_piece OR nasceu_sousa) INTO cliente_tem_desconto
-    FROM cadastros.pacientes WHERE id = p_cliente_id;
+    cliente_tem_desconto := cadastros.cliente_tem_desconto(p_cliente_id);
 
     IF cliente_tem_desconto THEN
         desconto_venda := total_bruto_venda * 0.10;
@@ -558,12 +1701,12 @@ BEGIN
 
     -- 6. Insere o registro principal da venda.
     INSERT INTO vendas.vendas (cliente_id, vendedor_id, data, total_bruto, desconto_aplicado, total_liquido, forma_pagamento, status_pagamento)
-    VALUES (p_cliente_id, p_vendedor_id, CURRENT_TIMESTAMP, total_bruto_venda, desconto_venda, total_liquido_venda, p_forma_pagamento, p_status_pagamento)
+    VALUES (p_cliente_id, p_vendedor_id, data_hora_venda, total_bruto_venda, desconto_venda, total_liquido_venda, p_forma_pagamento, p_status_pagamento)
     RETURNING id INTO nova_venda_id;
 
-    -- 7. Insere os itens da venda a partir da tabela temporária.
-    INSERT INTO vendas.itens_venda (venda_id, produto_id, quantidade, preco_unitario)
-    SELECT nova_venda_id, produto_id, quantidade, preco_unitario FROM itens_carrinho;
+    -- 7. Insere os itens da venda a partir da tabela temporária (na mesma partição mensal da venda).
+    INSERT INTO vendas.itens_venda (venda_id, data_venda, produto_id, quantidade, preco_unitario)
+    SELECT nova_venda_id, data_hora_venda, produto_id, quantidade, preco_unitario FROM itens_carrinho;
 
     -- 8. ATUALIZA O ESTOQUE de todos os produtos de uma só vez.
     UPDATE vendas.estoque AS e
@@ -579,4 +1722,202 @@ BEGIN
     -- 9. Retorna o ID da nova venda.
     RETURN nova_venda_id;
 END;
-$$;
\ No newline at end of file
+$$;
+
+-- ==========================================
+-- EXPORTAÇÃO INCREMENTAL (ferramentas/exportador_parquet.py)
+-- ==========================================
+
+-- Marca d'água de cada tabela exportada. Em vez de id ou data (que podem ser confirmados fora de ordem),
+-- a marca é o xmin de um snapshot: todas as transações com identificador menor já terminaram, então
+-- cada alteração confirmada cai em exatamente uma janela [transacao_inicio, transacao_fim).
+-- A janela é gravada antes da exportação (concluida = FALSE): depois de uma queda, a próxima execução
+-- refaz a mesma janela, com os mesmos nomes de arquivo.
+CREATE TABLE manutencao.exportacoes (
+    tabela TEXT PRIMARY KEY,
+    tipo VARCHAR(12) NOT NULL CHECK (tipo IN ('completa', 'incremental')),
+    transacao_inicio XID8 NOT NULL,
+    transacao_fim XID8,
+    concluida BOOLEAN NOT NULL DEFAULT FALSE,
+    atualizada_em TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE manutencao.exportacoes IS 'Janela atual (ou a última concluída) da exportação incremental de cada tabela.';
+
+-- Chaves das linhas inseridas, alteradas ou removidas nas tabelas exportadas, com a transação que as alterou.
+-- data é a coluna de data da linha (dia do arquivo exportado). As entradas já exportadas são apagadas.
+CREATE TABLE manutencao.log_exportacao (
+    tabela TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    data TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    transacao XID8 NOT NULL DEFAULT pg_current_xact_id()
+);
+
+CREATE INDEX idx_log_exportacao ON manutencao.log_exportacao(tabela, transacao);
+
+-- TG_ARGV[0]: coluna de data da tabela. Enquanto a tabela não tiver sido exportada nenhuma vez
+-- (ex: durante a carga do ferramentas.gerador_dados), nada é registrado: a primeira exportação é completa.
+CREATE OR REPLACE FUNCTION manutencao.registrar_alteracoes_exportacao()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_tabela TEXT := TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME;
+    v_transicao TEXT;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        -- Sem as linhas removidas, a próxima exportação precisa ser completa
+        DELETE FROM manutencao.exportacoes WHERE tabela = v_tabela;
+        DELETE FROM manutencao.log_exportacao WHERE tabela = v_tabela;
+        RETURN NULL;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM manutencao.exportacoes WHERE tabela = v_tabela) THEN
+        RETURN NULL;
+    END IF;
+
+    FOREACH v_transicao IN ARRAY CASE TG_OP WHEN 'INSERT' THEN ARRAY['novas']
+                                             WHEN 'DELETE' THEN ARRAY['antigas']
+                                             ELSE ARRAY['novas', 'antigas'] END LOOP
+        EXECUTE format('INSERT INTO manutencao.log_exportacao (tabela, id, data) SELECT DISTINCT $1, id, %I FROM %I',
+                       TG_ARGV[0], v_transicao)
+        USING v_tabela;
+    END LOOP;
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+    v_tabela TEXT;
+    v_coluna TEXT;
+BEGIN
+    FOR v_tabela, v_coluna IN
+        SELECT * FROM (VALUES ('vendas.vendas', 'data'), ('vendas.itens_venda', 'data_venda'),
+                              ('clinico.consultas', 'data'), ('financeiro.pagamentos', 'data_consulta')) t
+    LOOP
+        EXECUTE format('CREATE TRIGGER trg_exportacao_insert AFTER INSERT ON %s
+                        REFERENCING NEW TABLE AS novas
+                        FOR EACH STATEMENT EXECUTE FUNCTION manutencao.registrar_alteracoes_exportacao(%L)', v_tabela, v_coluna);
+        EXECUTE format('CREATE TRIGGER trg_exportacao_update AFTER UPDATE ON %s
+                        REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+                        FOR EACH STATEMENT EXECUTE FUNCTION manutencao.registrar_alteracoes_exportacao(%L)', v_tabela, v_coluna);
+        EXECUTE format('CREATE TRIGGER trg_exportacao_delete AFTER DELETE ON %s
+                        REFERENCING OLD TABLE AS antigas
+                        FOR EACH STATEMENT EXECUTE FUNCTION manutencao.registrar_alteracoes_exportacao(%L)', v_tabela, v_coluna);
+        EXECUTE format('CREATE TRIGGER trg_exportacao_truncate AFTER TRUNCATE ON %s
+                        FOR EACH STATEMENT EXECUTE FUNCTION manutencao.registrar_alteracoes_exportacao(%L)', v_tabela, v_coluna);
+    END LOOP;
+END;
+$$;
+
+-- ==========================================
+-- NOTIFICAÇÃO DE ALTERAÇÕES (INVALIDAÇÃO DE CACHE ENTRE PROCESSOS)
+-- ==========================================
+
+-- Versão de cada tabela da aplicação. Quem guarda o resultado de uma query junto com as versões das
+-- tabelas lidas (app, API com ETag) só precisa reler as versões para saber se o resultado ainda vale.
+-- Cada comando que altera uma tabela insere uma linha em alteracoes_tabelas, na mesma transação, e a
+-- versão é a base consolidada mais as linhas já confirmadas: versão e dados ficam visíveis juntos, no
+-- COMMIT. Como só há inserções, escritores concorrentes não disputam nenhuma linha (nem se bloqueiam
+-- entre tabelas em ordens diferentes); compactar_versoes() consolida as linhas periodicamente.
+CREATE TABLE manutencao.versoes_tabelas (
+    tabela TEXT PRIMARY KEY,                -- 'schema.tabela'
+    versao BIGINT NOT NULL DEFAULT 0,       -- alterações já consolidadas
+    alterada_em TIMESTAMPTZ
+);
+
+CREATE TABLE manutencao.alteracoes_tabelas (
+    tabela TEXT NOT NULL,
+    alterada_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_alteracoes_tabelas_tabela ON manutencao.alteracoes_tabelas(tabela);
+
+-- Consolida as alterações na base de cada tabela. O DELETE e a soma usam o mesmo snapshot, então a
+-- versão lida (base + linhas restantes) não muda com a compactação; linhas de transações ainda em
+-- andamento não são vistas e ficam para a próxima execução. Retorna o número de linhas consolidadas.
+CREATE OR REPLACE FUNCTION manutencao.compactar_versoes()
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    WITH removidas AS (
+        DELETE FROM manutencao.alteracoes_tabelas RETURNING tabela, alterada_em
+    ), por_tabela AS (
+        SELECT tabela, count(*) AS alteracoes, max(alterada_em) AS alterada_em
+        FROM removidas
+        GROUP BY tabela
+    ), consolidadas AS (
+        INSERT INTO manutencao.versoes_tabelas AS v (tabela, versao, alterada_em)
+        SELECT tabela, alteracoes, alterada_em FROM por_tabela
+        ON CONFLICT (tabela) DO UPDATE
+            SET versao = v.versao + EXCLUDED.versao,
+                alterada_em = greatest(v.alterada_em, EXCLUDED.alterada_em)
+    )
+    -- Comandos de escrita no WITH sempre executam por completo, mesmo sem serem lidos
+    SELECT coalesce(sum(alteracoes), 0)::BIGINT FROM por_tabela;
+$$;
+
+-- Avisa no canal "alteracoes_tabelas" qual tabela foi alterada (payload: 'schema.tabela') e registra a
+-- alteração para a versão da tabela (exceto nas tabelas instaladas com o argumento 'sem_versao').
+-- É um trigger por comando, não por linha: um UPDATE de mil linhas gera uma única notificação e uma única
+-- linha de alteração, e notificações iguais na mesma transação são entregues uma só vez, no COMMIT.
+CREATE OR REPLACE FUNCTION manutencao.notificar_alteracao_tabela()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_tabela TEXT := TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME;
+BEGIN
+    IF TG_NARGS = 0 OR TG_ARGV[0] <> 'sem_versao' THEN
+        INSERT INTO manutencao.alteracoes_tabelas (tabela) VALUES (v_tabela);
+    END IF;
+    PERFORM pg_notify('alteracoes_tabelas', v_tabela);
+    RETURN NULL;
+END;
+$$;
+
+-- Instala o trigger de notificação (e versão) em todas as tabelas dos schemas da aplicação
+-- (tabelas particionadas recebem o trigger apenas na tabela raiz). Pode ser executada
+-- novamente sempre que novas tabelas forem criadas. Tabelas derivadas, mantidas por triggers a cada
+-- escrita em outras tabelas, só notificam: não são lidas por resultados versionados.
+CREATE OR REPLACE FUNCTION manutencao.instalar_notificacao_alteracoes()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_derivadas TEXT[] := ARRAY['clinico.indicadores_diarios'];
+    v_tabela REGCLASS;
+    v_nome TEXT;
+    v_total INTEGER := 0;
+BEGIN
+    FOR v_tabela, v_nome IN
+        SELECT c.oid::regclass, n.nspname || '.' || c.relname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname IN ('cadastros', 'clinico', 'financeiro', 'vendas')
+          AND c.relkind IN ('r', 'p')
+          AND NOT c.relispartition
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_notificar_alteracao ON %s', v_tabela);
+        IF v_nome = ANY(v_derivadas) THEN
+            EXECUTE format('CREATE TRIGGER trg_notificar_alteracao
+                            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s
+                            FOR EACH STATEMENT EXECUTE FUNCTION manutencao.notificar_alteracao_tabela(%L)',
+                           v_tabela, 'sem_versao');
+            DELETE FROM manutencao.versoes_tabelas WHERE tabela = v_nome;
+        ELSE
+            EXECUTE format('CREATE TRIGGER trg_notificar_alteracao
+                            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s
+                            FOR EACH STATEMENT EXECUTE FUNCTION manutencao.notificar_alteracao_tabela()', v_tabela);
+            -- Tabelas sem linha aqui não são versionadas (ex: views), e quem lê as versões não deve guardar cache delas
+            INSERT INTO manutencao.versoes_tabelas (tabela) VALUES (v_nome) ON CONFLICT (tabela) DO NOTHING;
+        END IF;
+        v_total := v_total + 1;
+    END LOOP;
+    RETURN v_total;
+END;
+$$;
+
+-- Mantenha esta chamada ao final do script, depois da criação de todas as tabelas
+SELECT manutencao.instalar_notificacao_alteracoes();